@@ -0,0 +1,83 @@
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+class AdmissionController:
+    SAFETY_MARGIN = 512 * 1024 * 1024
+    POLL_INTERVAL = 5.0
+    def __init__(self, safety_margin: int = SAFETY_MARGIN):
+        self.safety_margin = safety_margin
+        self._reservations: Dict[str, Dict[int, int]] = {}
+        self._condition = threading.Condition()
+    @staticmethod
+    def estimate_size(info: Dict[str, Any], postprocess_passes: int = 0) -> Tuple[int, int]:
+        formats = info.get('requested_formats') or [info]
+        final_size = 0
+        for fmt in formats:
+            size = fmt.get('filesize') or fmt.get('filesize_approx')
+            if not size:
+                tbr = fmt.get('tbr') or info.get('tbr')
+                duration = info.get('duration')
+                size = int(tbr * duration * 125) if tbr and duration else 0
+            final_size += int(size)
+        section_start = info.get('section_start') or 0
+        section_end = info.get('section_end') or info.get('duration')
+        if info.get('duration') and section_end and (section_start or info.get('section_end')):
+            final_size = int(final_size * min(1.0, max(0.0, section_end - section_start) / info['duration']))
+        passes = postprocess_passes + (1 if len(formats) > 1 else 0)
+        peak_size = final_size * (1 + passes)
+        return final_size, peak_size
+    def reserve(self, job_id: str, requirements: List[Tuple[str, int]],
+                cancel_check: Optional[Callable[[], bool]] = None,
+                on_hold: Optional[Callable[[str], None]] = None) -> None:
+        needed: Dict[int, Tuple[str, int]] = {}
+        for path, size in requirements:
+            device = os.stat(self._existing_path(path)).st_dev
+            if device not in needed or needed[device][1] < size:
+                needed[device] = (path, size)
+        notified = False
+        with self._condition:
+            while True:
+                if cancel_check and cancel_check():
+                    raise Exception("ダウンロードがキャンセルされました")
+                shortage = self._find_shortage(needed)
+                if shortage is None:
+                    self._reservations[job_id] = {device: size for device, (_, size) in needed.items()}
+                    return
+                path, missing, satisfiable = shortage
+                if not satisfiable:
+                    raise Exception(f"ディスク容量が不足しています: {path} (あと {missing / 1024 / 1024:.0f} MB 必要)")
+                if on_hold and not notified:
+                    on_hold(path)
+                    notified = True
+                self._condition.wait(self.POLL_INTERVAL)
+    def release(self, job_id: str) -> None:
+        with self._condition:
+            if self._reservations.pop(job_id, None) is not None:
+                self._condition.notify_all()
+    def release_all(self, prefix: str) -> None:
+        with self._condition:
+            for job_id in [j for j in self._reservations if j.startswith(f"{prefix}:")]:
+                del self._reservations[job_id]
+            self._condition.notify_all()
+    def reserved_bytes(self, device: int) -> int:
+        with self._condition:
+            return sum(r.get(device, 0) for r in self._reservations.values())
+    def _find_shortage(self, needed: Dict[int, Tuple[str, int]]) -> Optional[Tuple[str, int, bool]]:
+        for device, (path, size) in needed.items():
+            free = shutil.disk_usage(self._existing_path(path)).free
+            reserved = sum(r.get(device, 0) for r in self._reservations.values())
+            missing = size + reserved + self.safety_margin - free
+            if missing > 0:
+                return path, missing, size + self.safety_margin <= free + reserved
+        return None
+    @staticmethod
+    def _existing_path(path: str) -> str:
+        path = os.path.abspath(path)
+        while not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        return path
+admission_controller = AdmissionController()
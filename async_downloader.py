@@ -0,0 +1,97 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from downloader import YouTubeDownloader
+_DONE = object()
+class DownloadJob:
+    def __init__(self, task: "asyncio.Task", events: "asyncio.Queue"):
+        self.task = task
+        self._events = events
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            event = await self._events.get()
+        except asyncio.CancelledError:
+            await self.abort()
+            raise
+        if event is _DONE:
+            raise StopAsyncIteration
+        return event
+    def __await__(self):
+        return self.task.__await__()
+    def cancel(self) -> bool:
+        return self.task.cancel()
+    async def abort(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
+    def done(self) -> bool:
+        return self.task.done()
+class AsyncYouTubeDownloader:
+    MAX_CONCURRENCY = 4
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.max_concurrency = max_concurrency
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ytgrab-async")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    async def __aenter__(self) -> "AsyncYouTubeDownloader":
+        return self
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    async def aclose(self) -> None:
+        if self._own_executor:
+            await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self._executor.shutdown, wait=True))
+    async def _run(self, downloader: YouTubeDownloader, func: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+        async with self._semaphore:
+            job = self._executor.submit(func, *args)
+            future = asyncio.wrap_future(job)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                downloader.cancel()
+                if not job.cancel():
+                    try:
+                        await future
+                    except Exception:
+                        pass
+                raise
+    async def get_video_info(self, url: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        downloader = YouTubeDownloader()
+        return await self._run(downloader, downloader.get_video_info, url, options)
+    async def download(self, url: str, options: Dict[str, Any],
+                       progress: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        job = self.stream(url, options)
+        if progress is None:
+            return await job
+        try:
+            async for event in job:
+                result = progress(event)
+                if asyncio.iscoroutine(result):
+                    await result
+        except asyncio.CancelledError:
+            await job.abort()
+            raise
+        return await job
+    async def download_fanout(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        job = self.stream(url, options, fanout=True)
+        return await job
+    def stream(self, url: str, options: Dict[str, Any], fanout: bool = False) -> DownloadJob:
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue" = asyncio.Queue()
+        def publish(event: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, dict(event))
+        downloader = YouTubeDownloader(progress_callback=publish)
+        method = downloader.download_fanout if fanout else downloader.download
+        async def run() -> Dict[str, Any]:
+            try:
+                return await self._run(downloader, method, url, options)
+            finally:
+                events.put_nowait(_DONE)
+        return DownloadJob(loop.create_task(run()), events)
@@ -0,0 +1,321 @@
+import argparse
+import base64
+import cProfile
+import gzip
+import hashlib
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.networking.common import Response
+from yt_dlp.networking.exceptions import HTTPError, RequestError, TransportError
+from yt_dlp.utils import int_or_none
+MEDIA_TYPES = ('video/', 'audio/', 'application/octet-stream', 'application/vnd.apple.mpegurl', 'application/dash+xml')
+SYNTHETIC_PATTERN = bytes(range(256)) * 256
+class CassetteMiss(RequestError):
+    pass
+def _body_digest(data) -> Optional[str]:
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if not isinstance(data, (bytes, bytearray)):
+        return None
+    return hashlib.sha1(data).hexdigest()
+def _strip_query(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+def _keys(method: str, url: str, digest: Optional[str], byte_range: Optional[str]) -> List[Tuple]:
+    return [
+        ('exact', method, url, digest, byte_range),
+        ('url', method, url, byte_range),
+        ('path', method, _strip_query(url), byte_range),
+    ]
+class _SyntheticBody:
+    def __init__(self, size: int):
+        self.remaining = size
+        self.closed = False
+    def readable(self) -> bool:
+        return True
+    def read(self, amt: Optional[int] = None) -> bytes:
+        size = self.remaining if amt is None or amt < 0 else min(amt, self.remaining)
+        self.remaining -= size
+        chunks = [SYNTHETIC_PATTERN] * (size // len(SYNTHETIC_PATTERN))
+        chunks.append(SYNTHETIC_PATTERN[:size % len(SYNTHETIC_PATTERN)])
+        if not self.remaining:
+            self.closed = True
+        return b''.join(chunks)
+    def close(self) -> None:
+        self.closed = True
+class _Recorder:
+    def __init__(self, fp, cassette: "Cassette", response: Dict[str, Any], media: bool):
+        self.fp = fp
+        self.cassette = cassette
+        self.response = response
+        self.buffer = None if media and not cassette.keep_media else bytearray()
+        self.size = 0
+        self.done = False
+    @property
+    def closed(self) -> bool:
+        return self.fp.closed
+    def readable(self) -> bool:
+        return True
+    def __getattr__(self, name: str):
+        return getattr(self.fp, name)
+    def read(self, amt: Optional[int] = None, **kwargs) -> bytes:
+        data = self.fp.read(amt, **kwargs)
+        self.size += len(data)
+        if self.buffer is not None:
+            self.buffer.extend(data)
+        if not data or self.fp.closed:
+            self._finish()
+        return data
+    def close(self) -> None:
+        self.fp.close()
+        self._finish()
+    def _declared_size(self) -> Optional[int]:
+        headers = {name.lower(): value for name, value in self.response['headers']}
+        length = int_or_none(headers.get('content-length'))
+        if length is not None:
+            return length
+        content_range = re.match(r'bytes\s+(\d+)-(\d+)', headers.get('content-range') or '')
+        if content_range:
+            return int(content_range.group(2)) - int(content_range.group(1)) + 1
+        return None
+    def _finish(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        with self.cassette._lock:
+            if self.buffer is not None:
+                self.response['size'] = self.size
+                self.response['body'] = base64.b64encode(bytes(self.buffer)).decode('ascii')
+            else:
+                self.response['size'] = max(self.size, self._declared_size() or 0)
+                self.response['synthetic'] = True
+class Cassette:
+    VERSION = 1
+    def __init__(self, path: str, mode: str = 'replay', keep_media: bool = False, strict: bool = True):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"不明なモードです: {mode}")
+        self.path = path
+        self.mode = mode
+        self.keep_media = keep_media
+        self.strict = strict
+        self.meta: Dict[str, Any] = {}
+        self.interactions: List[Dict[str, Any]] = []
+        self.served = 0
+        self.misses: List[str] = []
+        self._lock = threading.Lock()
+        self._index: Dict[Tuple, List[int]] = {}
+        self._used: set = set()
+        self._recorders: List[_Recorder] = []
+        if mode == 'replay':
+            self.load()
+    def _open(self, path: str, mode: str):
+        if self.path.endswith('.gz'):
+            return gzip.open(path, mode + 't', encoding='utf-8')
+        return open(path, mode, encoding='utf-8')
+    def load(self) -> None:
+        with self._open(self.path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != self.VERSION:
+            raise ValueError(f"対応していないカセットのバージョンです: {data.get('version')}")
+        self.meta = data.get('meta') or {}
+        self.interactions = data.get('interactions') or []
+        self._index = {}
+        for number, interaction in enumerate(self.interactions):
+            request = interaction['request']
+            for key in _keys(request['method'], request['url'], request.get('body_sha1'), request.get('range')):
+                self._index.setdefault(key, []).append(number)
+        self.rewind()
+    def rewind(self) -> None:
+        with self._lock:
+            self._used = set()
+            self.served = 0
+            self.misses = []
+    def save(self) -> None:
+        for recorder in self._recorders:
+            recorder._finish()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with self._lock:
+            data = {'version': self.VERSION, 'meta': self.meta, 'interactions': self.interactions}
+            with self._open(temp_path, 'w') as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+    def _request_info(self, req: Request) -> Dict[str, Any]:
+        return {
+            'method': req.method,
+            'url': req.url,
+            'body_sha1': _body_digest(req.data),
+            'range': req.headers.get('Range'),
+        }
+    def _record(self, original, req) -> Response:
+        if isinstance(req, str):
+            req = Request(req)
+        interaction = {'request': self._request_info(req), 'response': None}
+        with self._lock:
+            self.interactions.append(interaction)
+        try:
+            response = original(req)
+        except HTTPError as e:
+            body = e.response.read()
+            interaction['response'] = {
+                'status': e.status,
+                'reason': e.reason,
+                'url': e.response.url,
+                'headers': list(e.response.headers.items()),
+                'body': base64.b64encode(body).decode('ascii'),
+                'size': len(body),
+                'error': 'http',
+            }
+            raise HTTPError(self._response(interaction['response']), redirect_loop=e.redirect_loop) from e
+        except TransportError as e:
+            interaction['response'] = {'error': 'transport', 'message': str(e)}
+            raise
+        content_type = (response.get_header('Content-Type') or '').lower()
+        interaction['response'] = {
+            'status': response.status,
+            'reason': response.reason,
+            'url': response.url,
+            'headers': list(response.headers.items()),
+            'body': None,
+            'size': 0,
+        }
+        response.fp = _Recorder(response.fp, self, interaction['response'], content_type.startswith(MEDIA_TYPES))
+        with self._lock:
+            self._recorders.append(response.fp)
+        return response
+    def _response(self, recorded: Dict[str, Any]) -> Response:
+        if recorded.get('body') is not None:
+            fp = io.BytesIO(base64.b64decode(recorded['body']))
+        else:
+            fp = _SyntheticBody(recorded.get('size') or 0)
+        return Response(fp, recorded['url'], dict(recorded['headers']), recorded['status'], recorded.get('reason'))
+    def _find(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fallback = None
+            for key in _keys(request['method'], request['url'], request['body_sha1'], request['range']):
+                candidates = self._index.get(key) or []
+                for number in candidates:
+                    if number not in self._used:
+                        self._used.add(number)
+                        self.served += 1
+                        return self.interactions[number]
+                if candidates and fallback is None:
+                    fallback = candidates[-1]
+            if fallback is not None:
+                self.served += 1
+                return self.interactions[fallback]
+            self.misses.append(f"{request['method']} {request['url']}")
+            return None
+    def _replay(self, req) -> Response:
+        if isinstance(req, str):
+            req = Request(req)
+        request = self._request_info(req)
+        interaction = self._find(request)
+        if interaction is None or interaction['response'] is None:
+            if self.strict:
+                raise CassetteMiss(f"カセットに記録されていないリクエストです: {request['method']} {request['url']}")
+            raise TransportError(f"カセットに記録されていないリクエストです: {request['url']}")
+        recorded = interaction['response']
+        if recorded.get('error') == 'transport':
+            raise TransportError(recorded['message'])
+        if recorded.get('error') == 'http':
+            raise HTTPError(self._response(recorded))
+        return self._response(recorded)
+    def attach(self, ydl: yt_dlp.YoutubeDL) -> yt_dlp.YoutubeDL:
+        original = ydl.urlopen
+        if self.mode == 'record':
+            ydl.urlopen = lambda req: self._record(original, req)
+        else:
+            ydl.urlopen = self._replay
+        return ydl
+def _run(cassette: Cassette, url: str, options: Dict[str, Any], download: bool) -> Dict[str, Any]:
+    from downloader import YouTubeDownloader
+    downloader = YouTubeDownloader()
+    downloader.ydl_hooks.append(cassette.attach)
+    if not download:
+        return downloader.get_video_info(url, options)
+    work_dir = tempfile.mkdtemp(prefix="ytgrab-cassette-")
+    try:
+        return downloader.download(url, dict(options, download_path=work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("1以上を指定してください")
+    return number
+def main(argv: Optional[List[str]] = None) -> int:
+    from worker import _parse_options
+    parser = argparse.ArgumentParser(prog="cassette", description="yt-dlpの通信を記録・再生してオフラインで計測")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="通信をカセットに記録")
+    record.add_argument('url')
+    record.add_argument('-c', '--cassette', required=True, help="カセットファイル (.json / .json.gz)")
+    record.add_argument('--download', action='store_true', help="動画情報の取得ではなくダウンロードを記録")
+    record.add_argument('--keep-media', action='store_true', help="メディアの中身も保存（省略時はサイズのみ記録し再生時は同サイズのダミーデータ。ダミーデータは結合・埋め込みなどの後処理に失敗するため、後処理まで計測する場合は指定）")
+    record.add_argument('-o', '--option', action='append', default=[], help="key=value または JSON")
+    bench = commands.add_parser('bench', help="カセットを再生して計測")
+    bench.add_argument('-c', '--cassette', required=True)
+    bench.add_argument('-n', '--iterations', type=_positive_int, default=5)
+    bench.add_argument('--profile', action='store_true', help="最後の1回をcProfileで計測して上位の関数を表示")
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        cassette = Cassette(args.cassette, 'record', keep_media=args.keep_media)
+        options = _parse_options(args.option)
+        cassette.meta = {'url': args.url, 'download': args.download, 'options': options,
+                         'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'), 'yt_dlp': yt_dlp.version.__version__}
+        try:
+            result = _run(cassette, args.url, options, args.download)
+        finally:
+            cassette.save()
+        print(f"📼 {len(cassette.interactions)}件の通信を記録: {args.cassette}")
+        print(f"{'✅' if result.get('success', True) else '❌'} {result.get('title') or result.get('error')}")
+        return 0
+    cassette = Cassette(args.cassette, 'replay')
+    meta = cassette.meta
+    if meta.get('yt_dlp') != yt_dlp.version.__version__:
+        print(f"⚠️ 記録時のyt-dlp {meta.get('yt_dlp')} と現在の {yt_dlp.version.__version__} が異なります")
+    walls, cpus = [], []
+    profiler = None
+    for iteration in range(1, args.iterations + 1):
+        cassette.rewind()
+        profiler = cProfile.Profile() if args.profile and iteration == args.iterations else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            if profiler:
+                profiler.enable()
+            result = _run(cassette, meta['url'], dict(meta.get('options') or {}), meta.get('download'))
+            status = "✅" if result.get('success', True) else f"❌ {result.get('error')}"
+        except Exception as e:
+            status = f"❌ {e}"
+        finally:
+            if profiler:
+                profiler.disable()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+        print(f"#{iteration} 実時間 {walls[-1] * 1000:.1f} ms / CPU {cpus[-1] * 1000:.1f} ms / "
+              f"再生 {cassette.served}件 / 未記録 {len(cassette.misses)}件 {status}")
+        for miss in cassette.misses[:5]:
+            print(f"    未記録: {miss}")
+    if profiler:
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(25)
+    print(f"📊 中央値 実時間 {statistics.median(walls) * 1000:.1f} ms / CPU {statistics.median(cpus) * 1000:.1f} ms "
+          f"(最小 {min(walls) * 1000:.1f} ms)")
+    return 0
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from yt_dlp.utils import download_range_func, parse_duration
+SECTION_SUFFIX = " [%(section_start>%H-%M-%S)s-%(section_end>%H-%M-%S|end)s]"
+def _parse_time(value: str, default: float) -> float:
+    value = value.strip()
+    if not value:
+        return default
+    if value.lower() in ('inf', 'end', '終了'):
+        return float('inf')
+    seconds = parse_duration(value)
+    if seconds is None:
+        raise ValueError(f"時間を解釈できません: {value}")
+    return seconds
+def parse_time_ranges(text: str) -> List[Tuple[float, float]]:
+    ranges = []
+    for token in text.replace('、', ',').split(','):
+        token = token.strip()
+        if not token:
+            continue
+        start, sep, end = token.partition('-')
+        if not sep:
+            raise ValueError(f"範囲は「開始-終了」の形式で指定してください: {token}")
+        start_time = _parse_time(start, 0.0)
+        end_time = _parse_time(end, float('inf'))
+        if end_time <= start_time:
+            raise ValueError(f"終了時間が開始時間より前です: {token}")
+        ranges.append((start_time, end_time))
+    return ranges
+def parse_chapter_names(text: str) -> List[str]:
+    return [
+        f"(?i){re.escape(name.strip())}"
+        for name in text.replace('、', ',').split(',') if name.strip()
+    ]
+def range_options(options: Dict[str, Any], outtmpl: str) -> Optional[Dict[str, Any]]:
+    ranges = options.get('time_ranges') or []
+    chapters = options.get('chapters') or []
+    if isinstance(ranges, str):
+        ranges = parse_time_ranges(ranges)
+    if isinstance(chapters, str):
+        chapters = parse_chapter_names(chapters)
+    if not ranges and not chapters:
+        return None
+    root, ext = os.path.splitext(outtmpl)
+    return {
+        'download_ranges': download_range_func(chapters, ranges),
+        'force_keyframes_at_cuts': bool(options.get('precise_cuts')),
+        'outtmpl': f"{root}{SECTION_SUFFIX}{ext}",
+    }
@@ -1,9 +1,11 @@
 import tkinter as tk
 from tkinter import ttk
 class CollapsibleFrame(ttk.Frame):
-    def __init__(self, parent, text="", style="Modern.TFrame", **kwargs):
+    def __init__(self, parent, text="", style="Modern.TFrame", content_factory=None, **kwargs):
         super().__init__(parent, style=style, **kwargs)
         self.is_expanded = tk.BooleanVar(value=False)
+        self.content_factory = content_factory
+        self.is_built = content_factory is None
         self.toggle_button = ttk.Button(
             self, 
             text=f"▶ {text}",
@@ -19,8 +21,13 @@ class CollapsibleFrame(ttk.Frame):
             self.toggle_button.config(text=f"▶ {self.text}")
             self.is_expanded.set(False)
         else:
+            self.build()
             self.content_frame.pack(fill=tk.BOTH, expand=True)
             self.toggle_button.config(text=f"▼ {self.text}")
             self.is_expanded.set(True)
+    def build(self):
+        if not self.is_built:
+            self.is_built = True
+            self.content_factory(self.content_frame)
     def get_content_frame(self):
         return self.content_frame
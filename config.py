@@ -1,12 +1,51 @@
 import json
 import os
 import sys
+import time
+import atexit
 import base64
+import threading
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+class ConfigPersister:
+    def __init__(self, write_func: Callable[[str], None], delay: float = 0.5, max_delay: float = 3.0):
+        self.write_func = write_func
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending: Optional[str] = None
+        self._first_pending_at = 0.0
+        self._deadline = 0.0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ytgrab-config-writer", daemon=True)
+        self._thread.start()
+    def schedule(self, payload: str) -> None:
+        now = time.monotonic()
+        with self._condition:
+            if self._pending is None:
+                self._first_pending_at = now
+            self._pending = payload
+            self._deadline = min(now + self.delay, self._first_pending_at + self.max_delay)
+            self._condition.notify()
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._condition:
+                payload, self._pending = self._pending, None
+            if payload is not None:
+                self.write_func(payload)
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+            self.flush()
 class Config:
     def __init__(self, config_file: str = "config.dat"):
         if getattr(sys, 'frozen', False):
@@ -18,6 +57,8 @@ class Config:
         self.config_file = os.path.join(self.data_dir, config_file)
         self.cipher = self._get_cipher()
         self.settings = self._load_config()
+        self.persister = ConfigPersister(self._write_config)
+        atexit.register(self.flush)
     def _get_cipher(self) -> Fernet:
         key_file = os.path.join(self.data_dir, ".key")
         if os.path.exists(key_file):
@@ -54,6 +95,8 @@ class Config:
     def _get_default_settings(self) -> Dict[str, Any]:
         return {
             "download_path": os.path.join(os.path.expanduser("~"), "Downloads", "YouTube"),
+            "staging_path": "",
+            "fanout_outputs": "",
             "video_quality": "1080p",
             "audio_quality": "最高",
             "video_format": "mp4",
@@ -69,6 +112,8 @@ class Config:
             "playlist_start": 1,
             "playlist_end": None,
             "max_downloads": None,
+            "watch_sources": [],
+            "watch_cursors": {},
             "download_history": []
         }
     def _load_config(self) -> Dict[str, Any]:
@@ -88,13 +133,24 @@ class Config:
     def save_config(self) -> bool:
         try:
             json_data = json.dumps(self.settings, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"設定ファイルの保存エラー: {e}")
+            return False
+        self.persister.schedule(json_data)
+        return True
+    def flush(self) -> None:
+        self.persister.flush()
+    def _write_config(self, json_data: str) -> None:
+        temp_file = f"{self.config_file}.tmp"
+        try:
             encrypted_data = self._encrypt_data(json_data)
-            with open(self.config_file, 'wb') as f:
+            with open(temp_file, 'wb') as f:
                 f.write(encrypted_data)
-            return True
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.config_file)
         except Exception as e:
             print(f"設定ファイルの保存エラー: {e}")
-            return False
     def get(self, key: str, default: Any = None) -> Any:
         return self.settings.get(key, default)
     def set(self, key: str, value: Any) -> None:
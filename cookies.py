@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import threading
+import time
+from http.cookiejar import Cookie
+from typing import Any, Dict, Optional
+from yt_dlp import cookies as ytdlp_cookies
+from yt_dlp.cookies import YoutubeDLCookieJar, extract_cookies_from_browser
+def _mtime(path: Optional[str]) -> Optional[float]:
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+def source_database(browser: str) -> Optional[str]:
+    try:
+        if browser in ytdlp_cookies.CHROMIUM_BASED_BROWSERS:
+            root = ytdlp_cookies._get_chromium_based_browser_settings(browser)['browser_dir']
+            candidates = [
+                os.path.join(current, name)
+                for current, _, files in os.walk(root) for name in files if name == 'Cookies'
+            ]
+        elif browser == 'firefox':
+            candidates = list(ytdlp_cookies._firefox_cookie_dbs(ytdlp_cookies._firefox_browser_dirs()))
+        elif browser == 'safari':
+            candidates = [path for path in map(os.path.expanduser, (
+                '~/Library/Cookies/Cookies.binarycookies',
+                '~/Library/Containers/com.apple.Safari/Data/Library/Cookies/Cookies.binarycookies',
+            )) if os.path.isfile(path)]
+        else:
+            return None
+    except Exception:
+        return None
+    return max(candidates, key=lambda path: _mtime(path) or 0, default=None)
+def _cookie_to_dict(cookie: Cookie) -> Dict[str, Any]:
+    data = dict(vars(cookie))
+    data['rest'] = data.pop('_rest', {})
+    return data
+class CookieJarCache:
+    TTL = 30 * 60
+    MIN_REFRESH = 60
+    def __init__(self, ttl: float = TTL, min_refresh: float = MIN_REFRESH):
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.cipher = None
+        self.cache_dir: Optional[str] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    def configure(self, cipher=None, cache_dir: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        self.cipher = cipher
+        self.cache_dir = cache_dir
+        if ttl is not None:
+            self.ttl = ttl
+    def jar(self, browser: str) -> YoutubeDLCookieJar:
+        with self._lock:
+            lock = self._locks.setdefault(browser, threading.Lock())
+        with lock:
+            entry = self._entries.get(browser)
+            if entry is None:
+                entry = self._load(browser)
+            if entry is None or self._stale(entry):
+                entry = self._extract(browser)
+            self._entries[browser] = entry
+            return entry['jar']
+    def attach(self, ydl):
+        spec = ydl.params.get('cookiesfrombrowser')
+        if spec and len(spec) == 1 and ydl.params.get('cookiefile') is None:
+            ydl.__dict__['cookiejar'] = self.jar(spec[0])
+        return ydl
+    def invalidate(self, browser: Optional[str] = None) -> None:
+        with self._lock:
+            browsers = [browser] if browser else list(self._entries)
+            for name in browsers:
+                self._entries.pop(name, None)
+                path = self._cache_path(name)
+                if path and os.path.exists(path):
+                    os.remove(path)
+    def _stale(self, entry: Dict[str, Any]) -> bool:
+        age = time.time() - entry['extracted_at']
+        if age >= self.ttl:
+            return True
+        if age < self.min_refresh:
+            return False
+        return _mtime(entry['source']) != entry['source_mtime']
+    def _extract(self, browser: str) -> Dict[str, Any]:
+        source = source_database(browser)
+        source_mtime = _mtime(source)
+        jar = extract_cookies_from_browser(browser)
+        entry = {
+            'jar': jar,
+            'source': source,
+            'source_mtime': source_mtime,
+            'extracted_at': time.time(),
+        }
+        self._save(browser, entry)
+        return entry
+    def _cache_path(self, browser: str) -> Optional[str]:
+        if not self.cache_dir or not self.cipher:
+            return None
+        return os.path.join(self.cache_dir, f"cookies_{re.sub(r'[^A-Za-z0-9_-]', '_', browser)}.dat")
+    def _save(self, browser: str, entry: Dict[str, Any]) -> None:
+        path = self._cache_path(browser)
+        if not path:
+            return
+        payload = json.dumps({
+            'source': entry['source'],
+            'source_mtime': entry['source_mtime'],
+            'extracted_at': entry['extracted_at'],
+            'cookies': [_cookie_to_dict(cookie) for cookie in entry['jar']],
+        })
+        try:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(self.cipher.encrypt(payload.encode('utf-8')))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Cookieキャッシュの保存エラー: {e}")
+    def _load(self, browser: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(browser)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(self.cipher.decrypt(f.read()).decode('utf-8'))
+            jar = YoutubeDLCookieJar()
+            for cookie in data['cookies']:
+                jar.set_cookie(Cookie(**cookie))
+        except Exception:
+            return None
+        return {
+            'jar': jar,
+            'source': data.get('source'),
+            'source_mtime': data.get('source_mtime'),
+            'extracted_at': data.get('extracted_at', 0),
+        }
+cookie_cache = CookieJarCache()
@@ -1,19 +1,88 @@
 
 import os
+import uuid
+from urllib.parse import urlparse
 import yt_dlp
+from yt_dlp.utils import ThrottledDownload
 from typing import Callable, Optional, Dict, Any
+from staging import StagingArea
+from admission import admission_controller
+from postprocessors import AdmissionPP, PublishPP, SinglePassEmbedPP, SinglePassYoutubeDL
+from throttle import ThrottleMonitor
+from retry import RetryDeferred, RetryPolicy, RetryScheduler, is_retryable
+from format_planner import FormatPlanner
+from fanout import FanoutJob
+from clips import range_options
+from subtitles import SubtitleHarvester
+from cookies import cookie_cache
+from profiling import job_profiler
+from proxy_pool import proxy_lease
+from verify import VerificationBatch, mark_verified
+from output_store import key_for, output_store, variant_for
+from prefilter import FilterCounter
 class YouTubeDownloader:
     
     def __init__(self, progress_callback: Optional[Callable] = None):
         self.progress_callback = progress_callback
         self.is_cancelled = False
+        self.detect_throttling = True
+        self.throttle_monitor = ThrottleMonitor()
+        self.active_hosts = set()
+        self.planner = None
+        self.embed_options = {}
+        self.proxy_lease = None
+        self.verification = None
+        self.dedupe_variant = None
+        self.dedupe_futures = []
+        self.filter = None
+        self.ydl_hooks = []
+    def _attach(self, ydl):
+        
+        for hook in self.ydl_hooks:
+            hook(ydl)
+        return cookie_cache.attach(ydl)
     def cancel(self):
         
         self.is_cancelled = True
+    def _on_hold(self, path: str):
+        
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'held',
+                'path': path
+            })
+    def _on_retry_wait(self, delay: float, reason: str):
+        
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'retrying',
+                'delay': delay,
+                'reason': reason
+            })
     def _progress_hook(self, d: Dict[str, Any]):
         
         if self.is_cancelled:
             raise Exception("ダウンロードがキャンセルされました")
+        format_url = (d.get('info_dict') or {}).get('url')
+        if format_url:
+            self.active_hosts.add(urlparse(format_url.split('\n')[0]).hostname)
+        stream_id = d.get('tmpfilename') or d.get('filename')
+        if self.proxy_lease is not None:
+            if d['status'] == 'downloading':
+                self.proxy_lease.mark_first_byte()
+            elif d['status'] == 'finished' and d.get('elapsed'):
+                self.proxy_lease.add_transfer(d.get('total_bytes') or d.get('downloaded_bytes') or 0, d['elapsed'])
+        if d['status'] == 'finished':
+            self.throttle_monitor.forget(stream_id)
+        elif d['status'] == 'downloading' and self.detect_throttling:
+            if self.throttle_monitor.update(stream_id, d.get('downloaded_bytes') or 0):
+                if self.progress_callback:
+                    self.progress_callback({
+                        'status': 'throttled',
+                        'speed': d.get('speed') or 0,
+                        'baseline': self.throttle_monitor.baseline(stream_id) or 0
+                    })
+                raise ThrottledDownload()
         if self.progress_callback and d['status'] == 'downloading':
             total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
             downloaded = d.get('downloaded_bytes', 0)
@@ -31,15 +100,100 @@ class YouTubeDownloader:
                 'speed': speed,
                 'eta': eta
             })
-    def get_video_info(self, url: str) -> Dict[str, Any]:
+    def _on_published(self, path: str, info: Dict[str, Any]):
+        
+        if self.verification is not None:
+            self.verification.submit(path, info)
+        if self.dedupe_variant:
+            self.dedupe_futures.append(output_store.submit(path, key_for(info, self.dedupe_variant)))
+    def _existing_filter(self, ydl, final_path: Callable[[str], str]) -> Callable:
+        
+        chained = ydl.params.get('match_filter')
+        def match_filter(info, incomplete=False):
+            reason = chained(info, incomplete=incomplete) if chained else None
+            if reason or incomplete:
+                return reason
+            existing = output_store.existing(key_for(info, self.dedupe_variant))
+            if not existing:
+                return None
+            target = os.path.splitext(final_path(ydl.prepare_filename(info)))[0] + os.path.splitext(existing)[1]
+            info['ytgrab_existing'] = output_store.link_existing(existing, target)
+            if self.progress_callback:
+                self.progress_callback({
+                    'status': 'existing',
+                    'file_path': info['ytgrab_existing']
+                })
+            return f"保存済みのファイルを再利用します: {info['ytgrab_existing']}"
+        return match_filter
+    def _finish_dedupe(self) -> int:
+        
+        futures, self.dedupe_futures = self.dedupe_futures, []
+        reclaimed = 0
+        for future in futures:
+            try:
+                stored = future.result()
+            except Exception:
+                continue
+            if stored['linked_to']:
+                reclaimed += stored['size']
+        return reclaimed
+    def _finish_verification(self, result: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        
+        verification, self.verification = self.verification, None
+        if verification is None or not result.get('success') or result['type'] == 'skipped':
+            return result
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'verifying',
+                'count': len(verification)
+            })
+        manifest_dir = options.get('download_path', '.') if options.get('verify_manifest', True) else None
+        summary = verification.finish(manifest_dir, options.get('manifest_format', 'json'))
+        entries = result['files'] if result['type'] in ('playlist', 'fanout') else [result]
+        mark_verified(entries, summary)
+        result['verification'] = summary
+        if summary['failed'] and not any(entry['verified'] for entry in entries):
+            return {
+                'success': False,
+                'error': "ファイルの検証に失敗しました: " + "; ".join(
+                    f"{os.path.basename(record['path'])}: {', '.join(record['errors'])}" for record in summary['failed']),
+                'verification': summary
+            }
+        return result
+    def _on_filtered(self, info: Dict[str, Any], reason: str):
+        
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'filtered',
+                'title': info.get('title') or info.get('id'),
+                'reason': reason,
+                'skipped': self.filter.skipped if self.filter else 0
+            })
+    def _on_profiled(self, report: Dict[str, Any]):
+        
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'profiled',
+                'summary': report['summary'],
+                'path': report['path']
+            })
+    def get_video_info(self, url: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        
+        options = options or {}
+        with job_profiler(options, 'info', options.get('download_path', '.'), self._on_profiled):
+            return self._get_video_info(url, options)
+    def _get_video_info(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
         
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
         }
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with proxy_lease(options.get('proxy')) as lease:
+                if lease.url:
+                    ydl_opts['proxy'] = lease.url
+                with self._attach(yt_dlp.YoutubeDL(ydl_opts)) as ydl:
+                    info = ydl.extract_info(url, download=False)
                 if 'entries' in info:
                     return {
                         'type': 'playlist',
@@ -49,7 +203,8 @@ class YouTubeDownloader:
                             {
                                 'title': entry.get('title', 'Unknown'),
                                 'duration': entry.get('duration', 0),
-                                'url': entry.get('webpage_url', '')
+                                'url': entry.get('webpage_url', ''),
+                                'thumbnail': entry.get('thumbnail', '')
                             }
                             for entry in info['entries'] if entry
                         ]
@@ -66,17 +221,49 @@ class YouTubeDownloader:
                     }
         except Exception as e:
             raise Exception(f"動画情報の取得に失敗しました: {str(e)}")
+    def get_flat_playlist(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+        }
+        if options.get('cookies_from_browser') and options.get('cookies_from_browser') != 'なし':
+            ydl_opts['cookiesfrombrowser'] = (options.get('cookies_from_browser'),)
+        counter = FilterCounter(options.get('filter'))
+        if counter.match:
+            ydl_opts['match_filter'] = counter
+        with proxy_lease(options.get('proxy')) as lease:
+            if lease.url:
+                ydl_opts['proxy'] = lease.url
+            with self._attach(yt_dlp.YoutubeDL(ydl_opts)) as ydl:
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        info['ytgrab_filtered'] = counter.summary()
+        return info
     def download(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
         
-        self.is_cancelled = False
+        with job_profiler(options, 'download', options.get('download_path', '.'), self._on_profiled):
+            return self._download(url, options)
+    def _download(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        
+        self.detect_throttling = options.get('throttle_detection', True)
         download_path = options.get('download_path', '.')
         os.makedirs(download_path, exist_ok=True)
+        if options.get('download_type') == 'subtitles':
+            return self._harvest_subtitles(url, options)
+        staging = None
+        if options.get('staging_path'):
+            staging = StagingArea(options.get('staging_path'), download_path)
+        output_root = staging.job_dir if staging else download_path
         ydl_opts = {
-            'outtmpl': os.path.join(download_path, options.get('filename_template', '%(title)s.%(ext)s')),
+            'outtmpl': os.path.join(output_root, options.get('filename_template', '%(title)s.%(ext)s')),
             'progress_hooks': [self._progress_hook],
             'quiet': False,
             'no_warnings': False,
         }
+        clip_opts = range_options(options, ydl_opts['outtmpl'])
+        if clip_opts:
+            ydl_opts.update(clip_opts)
         if options.get('limit_rate'):
             ydl_opts['ratelimit'] = options.get('limit_rate')
         if options.get('concurrent_fragments'):
@@ -84,8 +271,10 @@ class YouTubeDownloader:
                 ydl_opts['concurrent_fragment_downloads'] = int(options.get('concurrent_fragments'))
             except ValueError:
                 pass
-        if options.get('fragment_retries'):
-            ydl_opts['fragment_retries'] = float('inf')
+        retry_policy = RetryPolicy(fragment_retries=50 if options.get('fragment_retries') else 10)
+        ydl_opts['retries'] = retry_policy.fragment_retries
+        ydl_opts['fragment_retries'] = retry_policy.fragment_retries
+        ydl_opts['retry_sleep_functions'] = retry_policy.sleep_functions()
         if options.get('no_part'):
             ydl_opts['nopart'] = True
         if options.get('restrict_filenames'):
@@ -96,62 +285,28 @@ class YouTubeDownloader:
             ydl_opts['cookiesfrombrowser'] = (options.get('cookies_from_browser'),)
         if options.get('proxy'):
             ydl_opts['proxy'] = options.get('proxy')
-        if options.get('embed_metadata'):
-            ydl_opts['addmetadata'] = True
         if options.get('write_info_json'):
             ydl_opts['writeinfojson'] = True
-        download_type = options.get('download_type', 'video')
-        if download_type == 'audio':
-            audio_format = options.get('audio_format', 'mp3')
-            audio_quality = options.get('audio_quality', '最高')
-            quality_map = {
-                '最高': '0',
-                '高': '2',
-                '中': '5',
-                '低': '9'
-            }
-            ydl_opts['format'] = 'bestaudio/best'
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': audio_format,
-                'preferredquality': quality_map.get(audio_quality, '0'),
-            }]
-        else:
-            video_quality = options.get('video_quality', '1080p')
-            video_format = options.get('video_format', 'mp4')
-            quality_map = {
-                '4K': 'bestvideo[height<=2160]+bestaudio/best[height<=2160]',
-                '1080p': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
-                '720p': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
-                '480p': 'bestvideo[height<=480]+bestaudio/best[height<=480]',
-                '360p': 'bestvideo[height<=360]+bestaudio/best[height<=360]',
-            }
-            ydl_opts['format'] = quality_map.get(video_quality, 'best')
-            if video_format != 'mp4':
-                ydl_opts['postprocessors'] = [{
-                    'key': 'FFmpegVideoConvertor',
-                    'preferedformat': video_format,
-                }]
-            else:
-                ydl_opts['merge_output_format'] = 'mp4'
+        self.planner = FormatPlanner(options)
+        ydl_opts.update(self.planner.ydl_options())
         if options.get('download_subtitles', False):
             ydl_opts['writesubtitles'] = True
             ydl_opts['subtitleslangs'] = options.get('subtitle_languages', ['ja', 'en'])
             if options.get('auto_subtitles', False):
                 ydl_opts['writeautomaticsub'] = True
-            if options.get('embed_subs', False):
-                ydl_opts['embedsubtitles'] = True
             convert_subs = options.get('convert_subs')
             if convert_subs and convert_subs != 'なし':
                 ydl_opts['subtitlesformat'] = convert_subs
         if options.get('download_thumbnail', False):
             ydl_opts['writethumbnail'] = True
-        if options.get('embed_thumbnail', False):
-            if 'postprocessors' not in ydl_opts:
-                ydl_opts['postprocessors'] = []
-            ydl_opts['postprocessors'].append({
-                'key': 'EmbedThumbnail',
-            })
+        self.embed_options = {
+            'metadata': bool(options.get('embed_metadata')),
+            'subtitles': bool(options.get('download_subtitles') and options.get('embed_subs')),
+            'thumbnail': bool(options.get('embed_thumbnail')),
+            'keep_thumbnail': bool(options.get('download_thumbnail')),
+        }
+        if self.embed_options['thumbnail']:
+            ydl_opts['writethumbnail'] = True
         if options.get('playlist_mode', False):
             if options.get('playlist_items'):
                 ydl_opts['playlist_items'] = options.get('playlist_items')
@@ -168,16 +323,168 @@ class YouTubeDownloader:
                 ydl_opts['playlistrandom'] = True
         else:
             ydl_opts['noplaylist'] = True
+        self.filter = FilterCounter(options.get('filter'), self._on_filtered)
+        if self.filter.match:
+            ydl_opts['match_filter'] = self.filter
+        job_prefix = uuid.uuid4().hex
+        page_host = urlparse(url).hostname
+        self.active_hosts = set()
+        self.verification = VerificationBatch() if options.get('verify') else None
+        self.dedupe_variant = variant_for(options) if options.get('dedupe') and output_store.enabled else None
+        scheduler = RetryScheduler(retry_policy)
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            result = scheduler.run(
+                lambda: self._attempt_download(url, ydl_opts, staging, job_prefix, output_root, download_path),
+                hosts=lambda: sorted(self.active_hosts) or [page_host],
+                cancel_check=lambda: self.is_cancelled,
+                on_wait=self._on_retry_wait,
+            )
+            reclaimed = self._finish_dedupe()
+            if reclaimed and result.get('success'):
+                result['reclaimed'] = reclaimed
+            if self.filter.match:
+                result['filtered'] = self.filter.summary()
+            return self._finish_verification(result, options)
+        except RetryDeferred as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'retry_after': e.retry_after
+            }
+        except Exception as e:
+            if self.is_cancelled:
+                return {
+                    'success': False,
+                    'error': 'ダウンロードがキャンセルされました'
+                }
+            return {
+                'success': False,
+                'error': str(e),
+                'retryable': is_retryable(e)
+            }
+        finally:
+            self.verification = None
+            self.dedupe_variant = None
+            self._finish_dedupe()
+            if staging:
+                staging.cleanup()
+            admission_controller.release_all(job_prefix)
+    def _harvest_subtitles(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        
+        harvester = SubtitleHarvester(options, self.progress_callback, lambda: self.is_cancelled)
+        try:
+            return harvester.harvest(url)
+        except Exception as e:
+            if self.is_cancelled:
+                return {
+                    'success': False,
+                    'error': 'ダウンロードがキャンセルされました'
+                }
+            return {
+                'success': False,
+                'error': f"字幕の取得に失敗しました: {str(e)}"
+            }
+    def download_fanout(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        
+        with job_profiler(options, 'fanout', options.get('download_path', '.'), self._on_profiled):
+            return self._download_fanout(url, options)
+    def _download_fanout(self, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        
+        verification = VerificationBatch() if options.get('verify') else None
+        dedupe = bool(options.get('dedupe') and output_store.enabled)
+        dedupe_futures = []
+        def on_published(path, info):
+            if verification is not None:
+                verification.submit(path, info)
+            if dedupe:
+                dedupe_futures.append(output_store.submit(path))
+        try:
+            job = FanoutJob(self, options['outputs'], options)
+            result = job.run(url, on_output=self._on_fanout_output, on_published=on_published)
+            self.dedupe_futures = dedupe_futures
+            reclaimed = self._finish_dedupe()
+            if reclaimed and result.get('success'):
+                result['reclaimed'] = reclaimed
+            self.verification = verification
+            return self._finish_verification(result, options)
+        except Exception as e:
+            if self.is_cancelled:
+                return {
+                    'success': False,
+                    'error': 'ダウンロードがキャンセルされました'
+                }
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    def _on_fanout_output(self, output: Dict[str, Any]):
+        
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'rendered',
+                'file_path': output['file_path']
+            })
+    def _attempt_download(self, url: str, ydl_opts: Dict[str, Any], staging: Optional[StagingArea],
+                          job_prefix: str, output_root: str, download_path: str) -> Dict[str, Any]:
+        
+        self.active_hosts = set()
+        with proxy_lease(ydl_opts.get('proxy')) as lease:
+            self.proxy_lease = lease
+            try:
+                return self._run_attempt(url, dict(ydl_opts, proxy=lease.url) if lease.url else ydl_opts,
+                                         staging, job_prefix, output_root, download_path)
+            finally:
+                self.proxy_lease = None
+    def _run_attempt(self, url: str, ydl_opts: Dict[str, Any], staging: Optional[StagingArea],
+                     job_prefix: str, output_root: str, download_path: str) -> Dict[str, Any]:
+        
+        try:
+            with self._attach(SinglePassYoutubeDL(ydl_opts)) as ydl:
+                self.planner.bind(ydl)
+                postprocess_passes = len(ydl_opts.get('postprocessors', []))
+                if any(self.embed_options.get(key) for key in ('metadata', 'subtitles', 'thumbnail')):
+                    ydl.single_pass = SinglePassEmbedPP(ydl, self.planner.target_ext(), **self.embed_options)
+                    ydl.add_post_processor(ydl.single_pass, when='post_process')
+                    postprocess_passes += 1
+                admission = AdmissionPP(
+                    ydl, admission_controller, job_prefix,
+                    work_path=output_root,
+                    output_path=download_path,
+                    postprocess_passes=postprocess_passes,
+                    cancel_check=lambda: self.is_cancelled,
+                    on_hold=self._on_hold,
+                )
+                ydl.add_post_processor(admission, when='before_dl')
+                ydl.add_post_processor(PublishPP(ydl, staging, admission, self._on_published), when='after_move')
+                final_path = staging.final_path if staging else (lambda path: path)
+                if self.dedupe_variant:
+                    ydl.params['match_filter'] = self._existing_filter(ydl, final_path)
                 info = ydl.extract_info(url, download=True)
+                if staging:
+                    staging.publish_remaining()
+                    staging.wait()
+                def filtered(entry):
+                    return bool(entry.get('ytgrab_filtered')) or any(
+                        d.get('ytgrab_filtered') for d in entry.get('requested_downloads') or [])
+                def existing_path(entry):
+                    return next((d['ytgrab_existing'] for d in entry.get('requested_downloads') or []
+                                 if d.get('ytgrab_existing')), None)
+                def clip_paths(entry):
+                    return [
+                        final_path(d['filepath']) for d in entry.get('requested_downloads') or []
+                        if d.get('filepath') and (d.get('section_start') is not None or d.get('section_end'))
+                    ]
                 if 'entries' in info:
                     downloaded_files = []
                     for entry in info['entries']:
-                        if entry:
+                        if entry and not filtered(entry):
+                            clips = clip_paths(entry)
                             downloaded_files.append({
+                                'id': entry.get('id'),
                                 'title': entry.get('title', 'Unknown'),
-                                'file_path': ydl.prepare_filename(entry)
+                                'file_path': existing_path(entry) or (clips[0] if clips else final_path(ydl.prepare_filename(entry))),
+                                'clips': clips,
+                                'plan': entry.get('ytgrab_plan')
                             })
                     return {
                         'success': True,
@@ -185,20 +492,25 @@ class YouTubeDownloader:
                         'title': info.get('title', 'Unknown Playlist'),
                         'files': downloaded_files
                     }
+                elif filtered(info):
+                    return {
+                        'success': True,
+                        'type': 'skipped',
+                        'id': info.get('id'),
+                        'title': info.get('title', 'Unknown'),
+                        'skipped': "フィルター条件に一致しないためスキップしました"
+                    }
                 else:
+                    clips = clip_paths(info)
                     return {
                         'success': True,
                         'type': 'video',
+                        'id': info.get('id'),
                         'title': info.get('title', 'Unknown'),
-                        'file_path': ydl.prepare_filename(info)
+                        'file_path': existing_path(info) or (clips[0] if clips else final_path(ydl.prepare_filename(info))),
+                        'clips': clips,
+                        'plan': info.get('ytgrab_plan')
                     }
-        except Exception as e:
-            if self.is_cancelled:
-                return {
-                    'success': False,
-                    'error': 'ダウンロードがキャンセルされました'
-                }
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        except Exception:
+            admission_controller.release_all(job_prefix)
+            raise
\ No newline at end of file
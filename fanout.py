@@ -0,0 +1,377 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import yt_dlp
+from yt_dlp.extractor import gen_extractor_classes
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import float_or_none, prepend_extension
+from format_planner import AUDIO_QUALITY_MAP, AUDIO_TARGET_ABR, VIDEO_HEIGHTS
+from staging import StagingArea
+COPYABLE_CODECS = {
+    'mp4': ({'h264', 'hevc', 'av1'}, {'aac', 'mp3'}),
+    'webm': ({'vp8', 'vp9', 'av1'}, {'opus', 'vorbis'}),
+    'mkv': (None, None),
+    'mp3': (None, {'mp3'}),
+    'm4a': (None, {'aac'}),
+    'opus': (None, {'opus'}),
+}
+VIDEO_ENCODERS = {
+    'mp4': ('libx264', 'aac'),
+    'webm': ('libvpx-vp9', 'libopus'),
+    'mkv': ('libx264', 'aac'),
+}
+AUDIO_ENCODERS = {
+    'mp3': 'libmp3lame',
+    'm4a': 'aac',
+    'opus': 'libopus',
+}
+def parse_output_specs(text: str) -> List[Dict[str, Any]]:
+    specs = []
+    for token in text.replace('、', ',').split(','):
+        words = token.split()
+        if not words:
+            continue
+        spec: Dict[str, Any] = {}
+        for word in words:
+            if word in AUDIO_ENCODERS:
+                spec.update(download_type='audio', audio_format=word)
+            elif word in VIDEO_ENCODERS:
+                spec.update(video_format=word)
+            elif word in VIDEO_HEIGHTS:
+                spec.update(video_quality=word)
+            elif word in AUDIO_QUALITY_MAP:
+                spec.update(audio_quality=word)
+            else:
+                raise ValueError(f"出力指定を解釈できません: {word}")
+        spec.setdefault('download_type', 'video')
+        specs.append(spec)
+    return specs
+def _codec_allowed(codec: Optional[str], allowed: Optional[set]) -> bool:
+    return allowed is None or codec in allowed
+@functools.lru_cache(maxsize=1024)
+def _master_key(url: str) -> str:
+    for ie in gen_extractor_classes():
+        if ie.ie_key() != 'Generic' and ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            if video_id:
+                return f"{ie.ie_key()}-{video_id}"
+            break
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+_masters_in_use: Dict[str, int] = defaultdict(int)
+_masters_lock = threading.Lock()
+class MasterCache:
+    INDEX_FILE = "masters.json"
+    MAX_BYTES = 20 * 1024 ** 3
+    MAX_AGE = 7 * 24 * 3600
+    GRACE_SECONDS = 3600
+    def __init__(self, root: str, max_bytes: int = MAX_BYTES, max_age: float = MAX_AGE):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.root, exist_ok=True)
+        self._index_path = os.path.join(self.root, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._retired: Dict[str, float] = {}
+    def _load(self) -> None:
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if 'masters' not in data:
+            data = {'masters': data, 'retired': {}}
+        self._index = data['masters']
+        self._retired = data.get('retired') or {}
+    def _save(self) -> None:
+        temp_path = f"{self._index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'masters': self._index, 'retired': self._retired}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self._index_path)
+    @staticmethod
+    def in_use(path: str) -> bool:
+        with _masters_lock:
+            return _masters_in_use.get(path, 0) > 0
+    @staticmethod
+    def acquire(path: str) -> None:
+        with _masters_lock:
+            _masters_in_use[path] += 1
+    @staticmethod
+    def release(path: str) -> None:
+        with _masters_lock:
+            _masters_in_use[path] -= 1
+            if _masters_in_use[path] <= 0:
+                del _masters_in_use[path]
+    @staticmethod
+    def key_for(url: str) -> str:
+        return _master_key(url)
+    def lookup(self, key: str, height: int, needs_video: bool) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._load()
+            entry = self._index.get(key)
+            if not entry or not os.path.isfile(entry['path']):
+                return None
+            if needs_video and (not entry['has_video'] or entry['requested_height'] < height):
+                return None
+            self.acquire(entry['path'])
+            entry['last_used'] = time.time()
+            self._save()
+            return dict(entry)
+    def store(self, key: str, entry: Dict[str, Any]) -> None:
+        self.acquire(entry['path'])
+        with self._lock:
+            self._load()
+            previous = self._index.get(key)
+            entry = dict(entry, size=os.path.getsize(entry['path']), last_used=time.time())
+            self._index[key] = entry
+            if previous and previous['path'] != entry['path']:
+                self._retired[previous['path']] = time.time()
+            self._save()
+        self.prune()
+    def _remove(self, path: str) -> None:
+        for target in (path, f"{os.path.splitext(path)[0]}.info.json"):
+            if os.path.isfile(target):
+                os.remove(target)
+    def prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            self._load()
+            current = {entry['path'] for entry in self._index.values()}
+            for path, retired_at in list(self._retired.items()):
+                if path in current:
+                    del self._retired[path]
+                elif not self.in_use(path) and now - retired_at > self.GRACE_SECONDS:
+                    self._remove(path)
+                    del self._retired[path]
+            evictable = []
+            for key, entry in list(self._index.items()):
+                if not os.path.isfile(entry['path']):
+                    del self._index[key]
+                    continue
+                idle = now - entry.get('last_used', 0)
+                if self.in_use(entry['path']) or idle < self.GRACE_SECONDS:
+                    continue
+                if idle > self.max_age:
+                    self._remove(entry['path'])
+                    del self._index[key]
+                else:
+                    evictable.append((entry.get('last_used', 0), key))
+            total = sum(entry.get('size', 0) for entry in self._index.values())
+            for _, key in sorted(evictable):
+                if total <= self.max_bytes:
+                    break
+                entry = self._index.pop(key)
+                self._remove(entry['path'])
+                total -= entry.get('size', 0)
+            self._save()
+class FanoutJob:
+    def __init__(self, downloader, outputs: List[Dict[str, Any]], options: Dict[str, Any]):
+        self.downloader = downloader
+        self.outputs = outputs
+        self.options = options
+        self.download_path = options.get('download_path', '.')
+        self.cache = MasterCache(
+            options.get('master_cache_path')
+            or os.path.join(options.get('staging_path') or tempfile.gettempdir(), 'ytgrab-masters'),
+            max_bytes=options.get('master_cache_bytes') or MasterCache.MAX_BYTES)
+        self.ydl = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True,
+                                     'restrictfilenames': bool(options.get('restrict_filenames'))})
+        self.ffmpeg = FFmpegPostProcessor(self.ydl)
+    def requirements(self) -> Dict[str, Any]:
+        video_specs = [spec for spec in self.outputs if spec.get('download_type', 'video') == 'video']
+        heights = [VIDEO_HEIGHTS.get(spec.get('video_quality'), 10 ** 5) for spec in video_specs]
+        height = max(heights or [0])
+        label = next((name for name, value in VIDEO_HEIGHTS.items() if value == height), 'best')
+        containers = {spec.get('video_format', 'mp4') for spec in video_specs}
+        container = containers.pop() if len(containers) == 1 else 'mkv'
+        return {'needs_video': bool(video_specs), 'height': height, 'label': label, 'container': container}
+    def run(self, url: str, on_output: Optional[Callable[[Dict[str, Any]], None]] = None,
+            on_published: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        needs = self.requirements()
+        key = self.cache.key_for(url)
+        master = self.cache.lookup(key, needs['height'], needs['needs_video'])
+        reused = master is not None
+        if not master:
+            master = self._download_master(url, key, needs)
+            if 'error' in master:
+                return {'success': False, 'error': master['error']}
+        try:
+            return self._render_all(master, reused, on_output, on_published)
+        finally:
+            self.cache.release(master['path'])
+            self.cache.prune()
+    def _render_all(self, master: Dict[str, Any], reused: bool,
+                    on_output: Optional[Callable[[Dict[str, Any]], None]],
+                    on_published: Optional[Callable[[str, Dict[str, Any]], None]]) -> Dict[str, Any]:
+        metadata = self.ffmpeg.get_metadata_object(master['path'])
+        streams = metadata.get('streams', [])
+        video = next((s for s in streams if s.get('codec_type') == 'video'
+                      and not (s.get('disposition') or {}).get('attached_pic')), None)
+        audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+        duration = float_or_none((metadata.get('format') or {}).get('duration'))
+        info = self._master_info(master)
+        staging = StagingArea(self.options['staging_path'], self.download_path) if self.options.get('staging_path') else None
+        paths = self._output_paths(info, staging.job_dir if staging else self.download_path)
+        workers = self.options.get('fanout_workers') or max(1, min(len(self.outputs), (os.cpu_count() or 2) // 2))
+        files, errors = [], []
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ytgrab-fanout") as executor:
+                futures = [
+                    executor.submit(self._render, master['path'], spec, path, video, audio)
+                    for spec, path in zip(self.outputs, paths)
+                ]
+                for spec, future in zip(self.outputs, futures):
+                    try:
+                        path = future.result()
+                    except Exception as e:
+                        errors.append(str(e))
+                        continue
+                    published = {'id': info.get('id'), 'duration': duration, 'ext': self._target_ext(spec)}
+                    callback = (lambda final_path, published=published: on_published(final_path, published)) \
+                        if on_published else None
+                    if staging:
+                        staging.publish(path, callback)
+                        path = staging.final_path(path)
+                    elif callback:
+                        callback(path)
+                    output = {'title': master['title'], 'file_path': path, 'spec': spec}
+                    files.append(output)
+                    if on_output:
+                        on_output(output)
+            if staging:
+                staging.wait()
+        finally:
+            if staging:
+                staging.cleanup()
+        if errors and not files:
+            return {'success': False, 'error': '; '.join(errors)}
+        return {
+            'success': True,
+            'type': 'fanout',
+            'title': master['title'],
+            'files': files,
+            'errors': errors,
+            'master_reused': reused,
+            'duration': duration,
+        }
+    def _download_master(self, url: str, key: str, needs: Dict[str, Any]) -> Dict[str, Any]:
+        base = f"{key}-{needs['height']}"
+        master_options = dict(self.options)
+        master_options.update({
+            'download_type': 'video' if needs['needs_video'] else 'audio',
+            'video_format': needs['container'],
+            'video_quality': needs['label'],
+            'audio_format': 'best',
+            'audio_quality': '最高',
+            'download_path': self.cache.root,
+            'staging_path': None,
+            'filename_template': f"{base}.%(ext)s",
+            'playlist_mode': False,
+            'download_subtitles': False,
+            'download_thumbnail': False,
+            'embed_thumbnail': False,
+            'embed_metadata': False,
+            'write_info_json': True,
+            'verify': False,
+            'verify_manifest': False,
+            'dedupe': False,
+        })
+        for option in ('outputs', 'time_ranges', 'chapters'):
+            master_options.pop(option, None)
+        result = self.downloader.download(url, master_options)
+        if not result['success']:
+            return {'error': result['error']}
+        if result['type'] == 'skipped':
+            return {'error': f"{result['skipped']}: {result['title']}"}
+        path = next((
+            os.path.join(self.cache.root, name) for name in sorted(os.listdir(self.cache.root))
+            if name.startswith(f"{base}.") and not name.endswith(('.part', '.ytdl', '.json', '.tmp'))
+        ), None)
+        if not path:
+            return {'error': "マスターファイルが見つかりません"}
+        entry = {
+            'path': path,
+            'id': result.get('id'),
+            'title': result['title'],
+            'has_video': needs['needs_video'],
+            'requested_height': needs['height'],
+        }
+        self.cache.store(key, entry)
+        return entry
+    def _master_info(self, master: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with open(f"{os.path.splitext(master['path'])[0]}.info.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'title': master['title'], 'id': master.get('id')}
+    def _output_paths(self, info: Dict[str, Any], root: str) -> List[str]:
+        outtmpl = os.path.join(root, self.options.get('filename_template', '%(title)s.%(ext)s'))
+        exts = [self._target_ext(spec) for spec in self.outputs]
+        paths = []
+        for spec, ext in zip(self.outputs, exts):
+            path = self.ydl.prepare_filename(dict(info, ext=ext), outtmpl=outtmpl)
+            if exts.count(ext) > 1:
+                quality = spec.get('video_quality') if spec.get('download_type', 'video') == 'video' else spec.get('audio_quality')
+                path = f"{os.path.splitext(path)[0]} [{quality}].{ext}"
+            paths.append(path)
+        return paths
+    @staticmethod
+    def _target_ext(spec: Dict[str, Any]) -> str:
+        if spec.get('download_type', 'video') == 'audio':
+            return spec.get('audio_format', 'mp3')
+        return spec.get('video_format', 'mp4')
+    def _render(self, master_path: str, spec: Dict[str, Any], final_path: str,
+                video: Optional[Dict[str, Any]], audio: Optional[Dict[str, Any]]) -> str:
+        if self.downloader.is_cancelled:
+            raise Exception("ダウンロードがキャンセルされました")
+        ext = self._target_ext(spec)
+        video_codecs, audio_codecs = COPYABLE_CODECS.get(ext, (None, None))
+        options: List[str] = []
+        if spec.get('download_type', 'video') == 'audio':
+            if not audio:
+                raise Exception(f"音声ストリームがありません: {os.path.basename(final_path)}")
+            options.extend(['-map', '0:a:0', '-vn'])
+        else:
+            if not video:
+                raise Exception(f"映像ストリームがありません: {os.path.basename(final_path)}")
+            options.extend(['-map', '0:v:0', '-map', '0:a:0?'])
+            height = VIDEO_HEIGHTS.get(spec.get('video_quality'), 10 ** 5)
+            needs_scale = (video.get('height') or 0) > height
+            if needs_scale or not _codec_allowed(video.get('codec_name'), video_codecs):
+                if needs_scale:
+                    options.extend(['-vf', f'scale=-2:{height}'])
+                options.extend(['-c:v', VIDEO_ENCODERS.get(ext, VIDEO_ENCODERS['mkv'])[0]])
+            else:
+                options.extend(['-c:v', 'copy'])
+        if audio:
+            options.extend(self._audio_options(spec, ext, audio, audio_codecs))
+        os.makedirs(os.path.dirname(final_path) or '.', exist_ok=True)
+        temp_path = prepend_extension(final_path, 'temp')
+        try:
+            self.ffmpeg.run_ffmpeg(master_path, temp_path, options)
+            os.replace(temp_path, final_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return final_path
+    @staticmethod
+    def _audio_options(spec: Dict[str, Any], ext: str, audio: Dict[str, Any],
+                       audio_codecs: Optional[set]) -> List[str]:
+        quality = spec.get('audio_quality', '最高')
+        target_abr = AUDIO_TARGET_ABR.get(quality)
+        source_abr = int(audio.get('bit_rate') or 0) // 1000
+        if _codec_allowed(audio.get('codec_name'), audio_codecs) and (
+                not target_abr or not source_abr or source_abr <= target_abr * 1.25):
+            return ['-c:a', 'copy']
+        if ext == 'mp3':
+            return ['-c:a', 'libmp3lame', '-q:a', AUDIO_QUALITY_MAP.get(quality, '0')]
+        encoder = AUDIO_ENCODERS.get(ext) or VIDEO_ENCODERS.get(ext, VIDEO_ENCODERS['mkv'])[1]
+        return ['-c:a', encoder, '-b:a', f"{target_abr or 192}k"]
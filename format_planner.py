@@ -0,0 +1,149 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+VIDEO_HEIGHTS = {
+    '4K': 2160,
+    '1080p': 1080,
+    '720p': 720,
+    '480p': 480,
+    '360p': 360,
+}
+AUDIO_QUALITY_MAP = {
+    '最高': '0',
+    '高': '2',
+    '中': '5',
+    '低': '9',
+}
+AUDIO_TARGET_ABR = {
+    '最高': None,
+    '高': 160,
+    '中': 128,
+    '低': 64,
+}
+AUDIO_CODECS = {
+    'mp3': ('mp3',),
+    'm4a': ('mp4a', 'aac'),
+    'opus': ('opus',),
+    'best': None,
+}
+CONTAINER_CODECS = {
+    'mp4': (('avc1', 'h264', 'av01', 'hev1', 'hvc1'), ('mp4a', 'aac')),
+    'webm': (('vp8', 'vp9', 'vp09', 'av01'), ('opus', 'vorbis')),
+    'mkv': (None, None),
+}
+MERGE_OUTPUT_FORMATS = {
+    'mp4': 'mp4',
+    'webm': 'webm/mkv',
+    'mkv': 'mkv',
+}
+def _has(codec: Optional[str]) -> bool:
+    return bool(codec) and codec != 'none'
+def _matches(codec: Optional[str], prefixes: Optional[Tuple[str, ...]]) -> bool:
+    return _has(codec) and (prefixes is None or codec.lower().startswith(prefixes))
+def _video_rank(fmt: Dict[str, Any]) -> Tuple:
+    return (fmt.get('height') or 0, fmt.get('fps') or 0, fmt.get('tbr') or 0)
+def _audio_rank(fmt: Dict[str, Any]) -> Tuple:
+    return (fmt.get('abr') or fmt.get('tbr') or 0, fmt.get('asr') or 0)
+class FormatPlanner:
+    def __init__(self, options: Dict[str, Any]):
+        self.download_type = options.get('download_type', 'video')
+        self.video_format = options.get('video_format', 'mp4')
+        self.video_quality = options.get('video_quality', '1080p')
+        self.audio_format = options.get('audio_format', 'mp3')
+        self.audio_quality = options.get('audio_quality', '最高')
+        self.ydl = None
+    def bind(self, ydl) -> None:
+        self.ydl = ydl
+    def target_ext(self) -> str:
+        return self.audio_format if self.download_type == 'audio' else self.video_format
+    def fallback_format(self) -> str:
+        if self.download_type == 'audio':
+            return 'bestaudio/best'
+        height = VIDEO_HEIGHTS.get(self.video_quality)
+        if not height:
+            return 'best'
+        return f'bestvideo[height<={height}]+bestaudio/best[height<={height}]'
+    def fallback_plan(self) -> Dict[str, Any]:
+        if self.download_type == 'audio':
+            return {'format': self.fallback_format(), 'mode': 'transcode', 'target': self.audio_format}
+        mode = 'transcode' if self.video_format == 'webm' else 'remux'
+        return {'format': self.fallback_format(), 'mode': mode, 'target': self.video_format}
+    def ydl_options(self) -> Dict[str, Any]:
+        if self.download_type == 'audio':
+            return {
+                'format': self,
+                'postprocessors': [{
+                    'key': 'FFmpegExtractAudio',
+                    'preferredcodec': self.audio_format,
+                    'preferredquality': AUDIO_QUALITY_MAP.get(self.audio_quality, '0'),
+                }],
+            }
+        ydl_opts = {
+            'format': self,
+            'merge_output_format': MERGE_OUTPUT_FORMATS.get(self.video_format, self.video_format),
+        }
+        if self.video_format == 'webm':
+            ydl_opts['postprocessors'] = [{
+                'key': 'FFmpegVideoConvertor',
+                'preferedformat': 'webm',
+            }]
+        elif self.video_format == 'mkv':
+            ydl_opts['postprocessors'] = [{
+                'key': 'FFmpegVideoRemuxer',
+                'preferedformat': 'mkv',
+            }]
+        return ydl_opts
+    def plan(self, formats: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self.download_type == 'audio':
+            return self._plan_audio(formats)
+        return self._plan_video(formats)
+    def _plan_audio(self, formats: List[Dict[str, Any]]) -> Dict[str, Any]:
+        codecs = AUDIO_CODECS.get(self.audio_format, ())
+        candidates = [
+            f for f in formats
+            if _matches(f.get('acodec'), codecs) and not _has(f.get('vcodec'))
+        ]
+        if not candidates:
+            return self.fallback_plan()
+        candidates.sort(key=_audio_rank)
+        chosen = candidates[-1]
+        target_abr = AUDIO_TARGET_ABR.get(self.audio_quality)
+        if target_abr:
+            enough = [f for f in candidates if _audio_rank(f)[0] >= target_abr * 0.75]
+            if enough:
+                chosen = enough[0]
+        return {'format': chosen['format_id'], 'mode': 'copy', 'target': self.audio_format}
+    def _plan_video(self, formats: List[Dict[str, Any]]) -> Dict[str, Any]:
+        height = VIDEO_HEIGHTS.get(self.video_quality, 10 ** 5)
+        video_codecs, audio_codecs = CONTAINER_CODECS.get(self.video_format, (None, None))
+        videos = sorted((
+            f for f in formats
+            if _matches(f.get('vcodec'), video_codecs) and not _has(f.get('acodec'))
+            and (f.get('height') or 0) <= height
+        ), key=_video_rank)
+        audios = sorted((
+            f for f in formats
+            if _matches(f.get('acodec'), audio_codecs) and not _has(f.get('vcodec'))
+        ), key=_audio_rank)
+        muxed = sorted((
+            f for f in formats
+            if _matches(f.get('vcodec'), video_codecs) and _matches(f.get('acodec'), audio_codecs)
+            and (f.get('height') or 0) <= height
+        ), key=_video_rank)
+        if videos and audios and (not muxed or _video_rank(videos[-1]) > _video_rank(muxed[-1])):
+            return {
+                'format': f"{videos[-1]['format_id']}+{audios[-1]['format_id']}",
+                'mode': 'remux',
+                'target': self.video_format,
+            }
+        if muxed:
+            mode = 'copy' if muxed[-1].get('ext') == self.video_format else 'remux'
+            return {'format': muxed[-1]['format_id'], 'mode': mode, 'target': self.video_format}
+        return self.fallback_plan()
+    def __call__(self, ctx: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        plan = self.plan(ctx['formats'])
+        selected = list(self.ydl.build_format_selector(plan['format'])(ctx))
+        if not selected and plan['format'] != self.fallback_format():
+            plan = self.fallback_plan()
+            selected = list(self.ydl.build_format_selector(plan['format'])(ctx))
+        for fmt in selected:
+            fmt['ytgrab_plan'] = plan['mode']
+            yield fmt
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_token INTEGER NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, lease_expires, id);
+"""
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+class JobStore:
+    LEASE_SECONDS = 60
+    BUSY_TIMEOUT = 30
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS, wal: bool = False):
+        self.path = os.path.abspath(path)
+        self.lease_seconds = lease_seconds
+        self.wal = wal
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={'WAL' if self.wal else 'DELETE'}")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+    def enqueue(self, url: str, options: Dict[str, Any], max_attempts: int = 3) -> int:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO jobs (url, options, max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (url, json.dumps(options, ensure_ascii=False), max_attempts, now, now))
+        return cursor.lastrowid
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._transaction()
+        try:
+            now = time.time()
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE (status = ? AND (lease_expires IS NULL OR lease_expires <= ?)) "
+                    "OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                    (QUEUED, now, RUNNING, now)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row['attempts'] >= row['max_attempts']:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, "
+                        "updated_at = ?, finished_at = ? WHERE id = ?",
+                        (FAILED, row['error'] or "リースの期限切れが上限回数に達しました", now, now, row['id']))
+                    continue
+                token = row['lease_token'] + 1
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_token = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, token, now + self.lease_seconds, now, row['id']))
+                conn.execute("COMMIT")
+                job = dict(row)
+                job.update(options=json.loads(row['options']), lease_owner=worker_id, lease_token=token,
+                           attempts=row['attempts'] + 1, status=RUNNING)
+                return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    def heartbeat(self, job_id: int, token: int) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_token = ? AND status = ?",
+            (now + self.lease_seconds, now, job_id, token, RUNNING))
+        return cursor.rowcount == 1
+    def complete(self, job_id: int, token: int, result: Dict[str, Any]) -> bool:
+        now = time.time()
+        status = DONE if result.get('success') else FAILED
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ?, finished_at = ? WHERE id = ? AND lease_token = ? AND status = ?",
+            (status, json.dumps(result, ensure_ascii=False, default=str), result.get('error'),
+             now, now, job_id, token, RUNNING))
+        return cursor.rowcount == 1
+    def release(self, job_id: int, token: int, error: str, delay: float = 0.0) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+            "finished_at = CASE WHEN attempts >= max_attempts THEN ? ELSE NULL END, "
+            "lease_expires = CASE WHEN attempts >= max_attempts THEN NULL ELSE ? END, "
+            "error = ?, lease_owner = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_token = ? AND status = ?",
+            (FAILED, QUEUED, now, now + delay if delay > 0 else None, error, now, job_id, token, RUNNING))
+        return cursor.rowcount == 1
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, url, status, attempts, lease_owner, error FROM jobs ORDER BY id DESC LIMIT ?",
+            (limit,)).fetchall()
+        return [dict(row) for row in rows]
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -1,4 +1,9 @@
 
+import sys
+from single_instance import InstanceServer, hand_off
+CLI_URLS = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+if __name__ == "__main__" and hand_off(CLI_URLS):
+    sys.exit(0)
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
@@ -6,48 +11,19 @@ import os
 from datetime import datetime
 from config import Config
 from downloader import YouTubeDownloader
+from cookies import cookie_cache
+from output_store import output_store
+from proxy_pool import parse_proxies
+from profiling import PROFILE_ENV, profile_modes
+from ui_watchdog import UiWatchdog
 from dependency_manager import DependencyManager
 from collapsible_frame import CollapsibleFrame
-class ThemeManager:
-    
-    LIGHT = {
-        'name': 'light',
-        'bg_dark': '#f5f5f5',
-        'bg_darker': '#ffffff',
-        'bg_lighter': '#e8e8e8',
-        'bg_hover': '#d0d0d0',
-        'accent_primary': '#0078d4',
-        'accent_secondary': '#106ebe',
-        'accent_success': '#107c10',
-        'accent_warning': '#ff8c00',
-        'accent_error': '#e81123',
-        'text_primary': '#323130',
-        'text_secondary': '#605e5c',
-        'text_bright': '#000000',
-        'border': '#d1d1d1',
-        'border_focus': '#0078d4',
-    }
-    DARK = {
-        'name': 'dark',
-        'bg_dark': '#1e1e1e',
-        'bg_darker': '#181818',
-        'bg_lighter': '#252525',
-        'bg_hover': '#2d2d2d',
-        'accent_primary': '#007acc',
-        'accent_secondary': '#0098ff',
-        'accent_success': '#4ec9b0',
-        'accent_warning': '#ce9178',
-        'accent_error': '#f48771',
-        'text_primary': '#cccccc',
-        'text_secondary': '#858585',
-        'text_bright': '#ffffff',
-        'border': '#3e3e3e',
-        'border_focus': '#007acc',
-    }
-    FONT_FAMILY = "Segoe UI"
-    FONT_SIZE_TITLE = 18
-    FONT_SIZE_NORMAL = 10
-    FONT_SIZE_SMALL = 9
+from fanout import parse_output_specs
+from clips import parse_time_ranges
+from prefilter import compile_filter
+from thumbnails import INFO_SIZE, LIST_SIZE, ThumbnailCache, thumbnail_url
+from theme_engine import ThemeEngine, ThemeManager
+from PIL import ImageTk
 class LoadingOverlay:
     
     def __init__(self, parent, text="処理中..."):
@@ -82,37 +58,46 @@ class YouTubeDownloaderGUI:
     APP_NAME = "YTGrab"
     VERSION = "2.1.0"
     AUTHOR = "Lapius"
-    def __init__(self, root):
+    def __init__(self, root, instance: InstanceServer = None):
         self.root = root
+        self.instance = instance
         self.root.title(f"{self.APP_NAME} v{self.VERSION} by {self.AUTHOR}")
         self.root.geometry("900x700")
         self.root.minsize(800, 600)
         self.config = Config()
+        cookie_cache.configure(self.config.cipher, self.config.data_dir)
+        output_store.configure(self.config.data_dir)
         self.downloader = None
         self.is_downloading = False
+        self.thumbnail_cache = None
+        self.thumbnail_placeholders = {}
         self.dep_manager = DependencyManager()
         self.theme_var = tk.StringVar(value=self.config.get("theme", "light"))
         self.current_theme = ThemeManager.LIGHT if self.theme_var.get() == "light" else ThemeManager.DARK
-        self.root.configure(bg=self.current_theme['bg_dark'])
+        self.theme = ThemeEngine(self.current_theme)
+        self.theme.register(self.root, 'window')
         self._init_variables()
-        self._configure_styles()
         self._create_scrollable_canvas()
         self._create_widgets()
         self._load_settings()
         self.root.after(100, self._check_dependencies)
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
         self.loading = LoadingOverlay(self.root)
+        self.watchdog = UiWatchdog(self.root)
+        self.watchdog.start()
+        if self.instance:
+            self.instance.set_handler(lambda urls: self.root.after(0, self._receive_urls, urls))
+        if CLI_URLS:
+            self._receive_urls(CLI_URLS)
     def _create_scrollable_canvas(self):
         
-        self.canvas = tk.Canvas(self.root, bg=self.current_theme['bg_dark'], 
-                               highlightthickness=0)
+        self.canvas = self.theme.register(tk.Canvas(self.root, highlightthickness=0), 'canvas')
         self.scrollbar = tk.Scrollbar(self.root, orient="vertical", 
                                      command=self.canvas.yview)
         self.scrollable_frame = ttk.Frame(self.canvas, style="Modern.TFrame")
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        self._scrollregion_job = None
+        self._canvas_width = None
+        self.scrollable_frame.bind("<Configure>", self._schedule_scrollregion)
         self.canvas_window = self.canvas.create_window((0, 0), 
                                                        window=self.scrollable_frame, 
                                                        anchor="nw")
@@ -121,15 +106,28 @@ class YouTubeDownloaderGUI:
         self.scrollbar.pack(side="right", fill="y")
         self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
         self.canvas.bind('<Configure>', self._on_canvas_configure)
+    def _schedule_scrollregion(self, event=None):
+        
+        if self._scrollregion_job is None:
+            self._scrollregion_job = self.root.after(50, self._update_scrollregion)
+    def _update_scrollregion(self):
+        
+        self._scrollregion_job = None
+        self.canvas.configure(scrollregion=(0, 0, self.scrollable_frame.winfo_width(),
+                                            self.scrollable_frame.winfo_height()))
     def _on_canvas_configure(self, event):
         
-        self.canvas.itemconfig(self.canvas_window, width=event.width)
+        if event.width != self._canvas_width:
+            self._canvas_width = event.width
+            self.canvas.itemconfig(self.canvas_window, width=event.width)
     def _on_mousewheel(self, event):
         
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
     def _init_variables(self):
         
         self.download_path_var = tk.StringVar(value=self.config.get("download_path", os.path.join(os.path.expanduser("~"), "Downloads")))
+        self.staging_path_var = tk.StringVar(value=self.config.get("staging_path", ""))
+        self.fanout_outputs_var = tk.StringVar(value=self.config.get("fanout_outputs", ""))
         self.download_type_var = tk.StringVar(value=self.config.get("download_type", "video"))
         self.video_quality_var = tk.StringVar(value=self.config.get("video_quality", "best"))
         self.audio_quality_var = tk.StringVar(value=self.config.get("audio_quality", "best"))
@@ -158,70 +156,6 @@ class YouTubeDownloaderGUI:
         self.playlist_random_var = tk.BooleanVar(value=self.config.get("playlist_random", False))
         self.cookies_from_browser_var = tk.StringVar(value=self.config.get("cookies_from_browser", "なし"))
         self.proxy_var = tk.StringVar(value=self.config.get("proxy", ""))
-    def _configure_styles(self):
-        
-        style = ttk.Style()
-        style.theme_use('clam')
-        theme = self.current_theme
-        style.configure("Modern.TFrame", background=theme['bg_dark'])
-        style.configure("Card.TFrame", background=theme['bg_lighter'], 
-                       borderwidth=1, relief="flat")
-        style.configure("Modern.TLabel", 
-                       background=theme['bg_dark'],
-                       foreground=theme['text_primary'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_NORMAL))
-        style.configure("Title.TLabel",
-                       background=theme['bg_dark'],
-                       foreground=theme['text_bright'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_TITLE, "bold"))
-        style.configure("Subtitle.TLabel",
-                       background=theme['bg_lighter'],
-                       foreground=theme['text_secondary'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_SMALL))
-        style.configure("Accent.TButton",
-                       background=theme['accent_primary'],
-                       foreground=theme['text_bright'],
-                       borderwidth=0,
-                       focuscolor=theme['accent_primary'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_NORMAL, "bold"))
-        style.map("Accent.TButton",
-                 background=[('active', theme['accent_secondary']),
-                           ('disabled', theme['bg_hover'])])
-        style.configure("Modern.TButton",
-                       background=theme['bg_hover'],
-                       foreground=theme['text_primary'],
-                       borderwidth=0,
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_NORMAL))
-        style.map("Modern.TButton",
-                 background=[('active', theme['bg_lighter'])])
-        style.configure("Modern.TCombobox",
-                       fieldbackground=theme['bg_lighter'],
-                       background=theme['bg_lighter'],
-                       foreground=theme['text_primary'],
-                       borderwidth=1,
-                       arrowcolor=theme['text_primary'])
-        style.configure("Modern.Horizontal.TProgressbar",
-                       background=theme['accent_primary'],
-                       troughcolor=theme['bg_lighter'],
-                       borderwidth=0,
-                       thickness=8)
-        style.configure("Modern.TCheckbutton",
-                       background=theme['bg_lighter'],
-                       foreground=theme['text_primary'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_NORMAL))
-        style.configure("Modern.TRadiobutton",
-                       background=theme['bg_lighter'],
-                       foreground=theme['text_primary'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_NORMAL))
-        style.configure("Modern.TLabelframe",
-                       background=theme['bg_lighter'],
-                       foreground=theme['text_primary'],
-                       borderwidth=1,
-                       relief="flat")
-        style.configure("Modern.TLabelframe.Label",
-                       background=theme['bg_lighter'],
-                       foreground=theme['accent_primary'],
-                       font=(ThemeManager.FONT_FAMILY, ThemeManager.FONT_SIZE_NORMAL, "bold"))
     def _switch_theme(self):
         
         if self.theme_var.get() == 'dark':
@@ -230,51 +164,8 @@ class YouTubeDownloaderGUI:
             self.current_theme = ThemeManager.LIGHT
         self.config.set("theme", self.theme_var.get())
         self.config.save_config()
-        self._configure_styles()
-        self.root.configure(bg=self.current_theme['bg_dark'])
-        self.canvas.configure(bg=self.current_theme['bg_dark'])
-        self._update_entry_colors()
-        if hasattr(self, 'log_text'):
-            self.log_text.configure(
-                bg=self.current_theme['bg_darker'],
-                fg=self.current_theme['text_primary'],
-                insertbackground=self.current_theme['text_bright']
-            )
+        self.theme.switch(self.current_theme)
         self._log(f"✅ テーマを{self.theme_var.get()}モードに変更しました")
-    def _update_entry_colors(self):
-        
-        if hasattr(self, 'url_entry'):
-            self.url_entry.configure(
-                bg=self.current_theme['bg_darker'],
-                fg=self.current_theme['text_primary'],
-                insertbackground=self.current_theme['text_bright'],
-                highlightbackground=self.current_theme['border'],
-                highlightcolor=self.current_theme['border_focus']
-            )
-        for widget in self.root.winfo_children():
-            self._update_widget_colors_recursive(widget)
-    def _update_widget_colors_recursive(self, widget):
-        
-        if isinstance(widget, tk.Entry):
-            widget.configure(
-                bg=self.current_theme['bg_darker'],
-                fg=self.current_theme['text_primary'],
-                insertbackground=self.current_theme['text_bright'],
-                highlightbackground=self.current_theme['border']
-            )
-        elif isinstance(widget, tk.Text):
-            widget.configure(
-                bg=self.current_theme['bg_darker'],
-                fg=self.current_theme['text_primary'],
-                insertbackground=self.current_theme['text_bright']
-            )
-        elif isinstance(widget, tk.Canvas):
-            widget.configure(bg=self.current_theme['bg_dark'])
-        try:
-            for child in widget.winfo_children():
-                self._update_widget_colors_recursive(child)
-        except:
-            pass
     def _open_settings_window(self):
         
         if hasattr(self, 'settings_window') and self.settings_window.winfo_exists():
@@ -285,7 +176,7 @@ class YouTubeDownloaderGUI:
         self.settings_window.title("設定")
         self.settings_window.geometry("500x300")
         self.settings_window.resizable(False, False)
-        self.settings_window.configure(bg=self.current_theme['bg_dark'])
+        self.theme.register(self.settings_window, 'window')
         settings_frame = ttk.Frame(self.settings_window, padding="20", style="Modern.TFrame")
         settings_frame.pack(fill=tk.BOTH, expand=True)
         title_label = ttk.Label(settings_frame, text="⚙️ アプリケーション設定", 
@@ -362,16 +253,12 @@ class YouTubeDownloaderGUI:
         url_frame = ttk.Frame(url_card, style="Modern.TFrame")
         url_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
         url_frame.columnconfigure(0, weight=1)
-        self.url_entry = tk.Entry(url_frame, 
-                                  bg=self.current_theme['bg_darker'],
-                                  fg=self.current_theme['text_primary'],
-                                  insertbackground=self.current_theme['text_bright'],
+        self.url_entry = tk.Entry(url_frame,
                                   font=(ThemeManager.FONT_FAMILY, 11),
                                   relief="flat",
                                   borderwidth=2,
-                                  highlightthickness=1,
-                                  highlightbackground=self.current_theme['border'],
-                                  highlightcolor=self.current_theme['border_focus'])
+                                  highlightthickness=1)
+        self.theme.register(self.url_entry, 'entry')
         self.url_entry.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 10), ipady=8)
         info_btn = ttk.Button(url_frame, text="📋 動画情報", 
                              command=self._get_video_info,
@@ -396,6 +283,9 @@ class YouTubeDownloaderGUI:
                        style="Modern.TRadiobutton").pack(side=tk.LEFT, padx=(0, 20))
         ttk.Radiobutton(type_frame, text="🎵 音声のみ", variable=self.download_type_var, 
                        value="audio", command=self._on_type_change,
+                       style="Modern.TRadiobutton").pack(side=tk.LEFT, padx=(0, 20))
+        ttk.Radiobutton(type_frame, text="💬 字幕のみ", variable=self.download_type_var, 
+                       value="subtitles", command=self._on_type_change,
                        style="Modern.TRadiobutton").pack(side=tk.LEFT)
         row += 1
         ttk.Label(settings_card, text="動画品質", style="Modern.TLabel").grid(
@@ -446,51 +336,127 @@ class YouTubeDownloaderGUI:
         self.download_path_var = tk.StringVar()
         path_entry = tk.Entry(path_frame,
                              textvariable=self.download_path_var,
-                             bg=self.current_theme['bg_darker'],
-                             fg=self.current_theme['text_primary'],
-                             insertbackground=self.current_theme['text_bright'],
                              font=(ThemeManager.FONT_FAMILY, 10),
                              relief="flat",
                              borderwidth=2,
-                             highlightthickness=1,
-                             highlightbackground=self.current_theme['border'],
-                             highlightcolor=self.current_theme['border_focus'])
+                             highlightthickness=1)
+        self.theme.register(path_entry, 'entry')
         path_entry.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 10), ipady=6)
         browse_btn = ttk.Button(path_frame, text="📁 参照", 
                                command=self._browse_folder,
                                style="Modern.TButton")
         browse_btn.grid(row=0, column=1)
+        self._init_option_variables()
         self.options_collapsible = CollapsibleFrame(main_frame, text="詳細オプション", 
-                                                    style="Modern.TFrame")
+                                                    style="Modern.TFrame",
+                                                    content_factory=self._build_options_card)
         self.options_collapsible.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
-        options_card = self.options_collapsible.get_content_frame()
+        progress_card = ttk.LabelFrame(main_frame, text="進捗", padding="15", 
+                                      style="Modern.TLabelframe")
+        progress_card.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
+        progress_card.columnconfigure(0, weight=1)
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(progress_card, 
+                                           variable=self.progress_var, 
+                                           maximum=100, mode='determinate',
+                                           style="Modern.Horizontal.TProgressbar")
+        self.progress_bar.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        self.status_label = ttk.Label(progress_card, text="⏸️ 待機中...", 
+                                     style="Modern.TLabel")
+        self.status_label.grid(row=1, column=0, sticky=tk.W)
+        log_card = ttk.LabelFrame(main_frame, text="ログ", padding="15", 
+                                 style="Modern.TLabelframe")
+        log_card.grid(row=5, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
+        log_card.columnconfigure(0, weight=1)
+        self.log_text = tk.Text(log_card, height=8, wrap=tk.WORD,
+                               font=(ThemeManager.FONT_FAMILY, 9),
+                               relief="flat",
+                               borderwidth=0,
+                               padx=10, pady=10)
+        self.theme.register(self.log_text, 'text')
+        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        scrollbar = tk.Scrollbar(log_card, command=self.log_text.yview)
+        self.theme.register(scrollbar, 'scrollbar')
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.log_text.config(yscrollcommand=scrollbar.set)
+        button_frame = ttk.Frame(main_frame, style="Modern.TFrame")
+        button_frame.grid(row=6, column=0, sticky=(tk.W, tk.E), pady=(0, 20))
+        self.download_btn = ttk.Button(button_frame, text="⬇️ ダウンロード", 
+                                       command=self._start_download,
+                                       style="Accent.TButton")
+        self.download_btn.pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=20)
+        self.cancel_btn = ttk.Button(button_frame, text="⏹️ キャンセル", 
+                                     command=self._cancel_download, 
+                                     state=tk.DISABLED,
+                                     style="Modern.TButton")
+        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
+        ttk.Button(button_frame, text="📜 履歴", 
+                  command=self._show_history,
+                  style="Modern.TButton").pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
+        ttk.Button(button_frame, text="💾 設定を保存", 
+                  command=self._save_settings,
+                  style="Modern.TButton").pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
+        ttk.Button(button_frame, text="🩺 診断", 
+                  command=self._show_diagnostics,
+                  style="Modern.TButton").pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
+        ttk.Button(button_frame, text="🗑️ ログクリア", 
+                  command=self._clear_log,
+                  style="Modern.TButton").pack(side=tk.LEFT, ipady=8, ipadx=15)
+        self._on_type_change()
+    def _init_option_variables(self):
+        
+        self.download_subtitles_var = tk.BooleanVar(value=False)
+        self.auto_subtitles_var = tk.BooleanVar(value=False)
+        self.download_thumbnail_var = tk.BooleanVar(value=False)
+        self.embed_thumbnail_var = tk.BooleanVar(value=False)
+        self.playlist_mode_var = tk.BooleanVar(value=False)
+        self.playlist_start_var = tk.StringVar(value="1")
+        self.playlist_end_var = tk.StringVar(value="")
+        self.filename_template_var = tk.StringVar(value="%(title)s.%(ext)s")
+        self.embed_metadata_var = tk.BooleanVar(value=False)
+        self.write_info_json_var = tk.BooleanVar(value=False)
+        self.embed_subs_var = tk.BooleanVar(value=False)
+        self.convert_subs_var = tk.StringVar(value="なし")
+        self.limit_rate_var = tk.StringVar(value="")
+        self.concurrent_fragments_var = tk.StringVar(value="1")
+        self.fragment_retries_var = tk.BooleanVar(value=False)
+        self.no_part_var = tk.BooleanVar(value=False)
+        self.playlist_reverse_var = tk.BooleanVar(value=False)
+        self.playlist_random_var = tk.BooleanVar(value=False)
+        self.cookies_from_browser_var = tk.StringVar(value="なし")
+        self.proxy_var = tk.StringVar(value="")
+        self.restrict_filenames_var = tk.BooleanVar(value=False)
+        self.no_mtime_var = tk.BooleanVar(value=False)
+        self.clip_ranges_var = tk.StringVar(value="")
+        self.clip_chapters_var = tk.StringVar(value="")
+        self.profile_var = tk.BooleanVar(value=bool(profile_modes()))
+        self.verify_var = tk.BooleanVar(value=False)
+        self.dedupe_var = tk.BooleanVar(value=False)
+        self.filter_var = tk.StringVar(value="")
+    def _build_options_card(self, options_card):
+        
         options_card.configure(style="Card.TFrame", padding="15")
         options_card.columnconfigure(0, weight=1)
         options_card.columnconfigure(1, weight=1)
-        self.download_subtitles_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="📝 字幕をダウンロード", 
                        variable=self.download_subtitles_var,
                        command=self._on_subtitle_change,
                        style="Modern.TCheckbutton").grid(
             row=0, column=0, sticky=tk.W, pady=5, padx=(0, 10))
-        self.auto_subtitles_var = tk.BooleanVar(value=False)
         self.auto_subtitles_check = ttk.Checkbutton(options_card, 
                                                     text="🤖 自動生成字幕を含む", 
                                                     variable=self.auto_subtitles_var,
                                                     state=tk.DISABLED,
                                                     style="Modern.TCheckbutton")
         self.auto_subtitles_check.grid(row=0, column=1, sticky=tk.W, pady=5)
-        self.download_thumbnail_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="🖼️ サムネイルをダウンロード", 
                        variable=self.download_thumbnail_var,
                        style="Modern.TCheckbutton").grid(
             row=1, column=0, sticky=tk.W, pady=5, padx=(0, 10))
-        self.embed_thumbnail_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="📎 サムネイルを埋め込む", 
                        variable=self.embed_thumbnail_var,
                        style="Modern.TCheckbutton").grid(
             row=1, column=1, sticky=tk.W, pady=5)
-        self.playlist_mode_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="📚 プレイリストモード", 
                        variable=self.playlist_mode_var,
                        command=self._on_playlist_change,
@@ -500,33 +466,25 @@ class YouTubeDownloaderGUI:
         playlist_range_frame.grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=5)
         ttk.Label(playlist_range_frame, text="範囲:", style="Modern.TLabel").pack(
             side=tk.LEFT, padx=(0, 10))
-        self.playlist_start_var = tk.StringVar(value="1")
         self.playlist_start_entry = tk.Entry(playlist_range_frame,
                                             textvariable=self.playlist_start_var,
                                             width=8, state=tk.DISABLED,
-                                            bg=self.current_theme['bg_darker'],
-                                            fg=self.current_theme['text_primary'],
-                                            insertbackground=self.current_theme['text_bright'],
                                             font=(ThemeManager.FONT_FAMILY, 10),
                                             relief="flat",
                                             borderwidth=2,
-                                            highlightthickness=1,
-                                            highlightbackground=self.current_theme['border'])
+                                            highlightthickness=1)
+        self.theme.register(self.playlist_start_entry, 'entry')
         self.playlist_start_entry.pack(side=tk.LEFT, padx=(0, 10))
         ttk.Label(playlist_range_frame, text="〜", style="Modern.TLabel").pack(
             side=tk.LEFT, padx=(0, 10))
-        self.playlist_end_var = tk.StringVar(value="")
         self.playlist_end_entry = tk.Entry(playlist_range_frame,
                                           textvariable=self.playlist_end_var,
                                           width=8, state=tk.DISABLED,
-                                          bg=self.current_theme['bg_darker'],
-                                          fg=self.current_theme['text_primary'],
-                                          insertbackground=self.current_theme['text_bright'],
                                           font=(ThemeManager.FONT_FAMILY, 10),
                                           relief="flat",
                                           borderwidth=2,
-                                          highlightthickness=1,
-                                          highlightbackground=self.current_theme['border'])
+                                          highlightthickness=1)
+        self.theme.register(self.playlist_end_entry, 'entry')
         self.playlist_end_entry.pack(side=tk.LEFT, padx=(0, 10))
         ttk.Label(playlist_range_frame, text="(空欄で最後まで)", 
                  style="Subtitle.TLabel").pack(side=tk.LEFT)
@@ -535,30 +493,23 @@ class YouTubeDownloaderGUI:
         template_frame.columnconfigure(1, weight=1)
         ttk.Label(template_frame, text="ファイル名:", style="Modern.TLabel").grid(
             row=0, column=0, sticky=tk.W, padx=(0, 10))
-        self.filename_template_var = tk.StringVar(value="%(title)s.%(ext)s")
         template_entry = tk.Entry(template_frame,
                                  textvariable=self.filename_template_var,
-                                 bg=self.current_theme['bg_darker'],
-                                 fg=self.current_theme['text_primary'],
-                                 insertbackground=self.current_theme['text_bright'],
                                  font=(ThemeManager.FONT_FAMILY, 10),
                                  relief="flat",
                                  borderwidth=2,
-                                 highlightthickness=1,
-                                 highlightbackground=self.current_theme['border'],
-                                 highlightcolor=self.current_theme['border_focus'])
+                                 highlightthickness=1)
+        self.theme.register(template_entry, 'entry')
         template_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), ipady=6)
         ttk.Separator(options_card, orient='horizontal').grid(
             row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=15)
         ttk.Label(options_card, text="📊 メタデータ", 
                  style="Modern.TLabel", font=(ThemeManager.FONT_FAMILY, 10, "bold")).grid(
             row=6, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
-        self.embed_metadata_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="メタデータを埋め込む", 
                        variable=self.embed_metadata_var,
                        style="Modern.TCheckbutton").grid(
             row=7, column=0, sticky=tk.W, pady=5, padx=(0, 10))
-        self.write_info_json_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="情報JSONを保存", 
                        variable=self.write_info_json_var,
                        style="Modern.TCheckbutton").grid(
@@ -566,7 +517,6 @@ class YouTubeDownloaderGUI:
         ttk.Label(options_card, text="💬 字幕詳細", 
                  style="Modern.TLabel", font=(ThemeManager.FONT_FAMILY, 10, "bold")).grid(
             row=8, column=0, columnspan=2, sticky=tk.W, pady=(10, 5))
-        self.embed_subs_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="字幕を埋め込む", 
                        variable=self.embed_subs_var,
                        style="Modern.TCheckbutton").grid(
@@ -575,7 +525,6 @@ class YouTubeDownloaderGUI:
         sub_convert_frame.grid(row=9, column=1, sticky=tk.W, pady=5)
         ttk.Label(sub_convert_frame, text="変換:", style="Modern.TLabel").pack(
             side=tk.LEFT, padx=(0, 5))
-        self.convert_subs_var = tk.StringVar(value="なし")
         convert_subs_combo = ttk.Combobox(sub_convert_frame, 
                                          textvariable=self.convert_subs_var,
                                          values=["なし", "srt", "ass", "vtt"],
@@ -589,17 +538,14 @@ class YouTubeDownloaderGUI:
         speed_frame.grid(row=11, column=0, sticky=tk.W, pady=5)
         ttk.Label(speed_frame, text="速度制限:", style="Modern.TLabel").pack(
             side=tk.LEFT, padx=(0, 5))
-        self.limit_rate_var = tk.StringVar(value="")
         limit_rate_entry = tk.Entry(speed_frame,
                                     textvariable=self.limit_rate_var,
                                     width=10,
-                                    bg=self.current_theme['bg_darker'],
-                                    fg=self.current_theme['text_primary'],
                                     font=(ThemeManager.FONT_FAMILY, 10),
                                     relief="flat",
                                     borderwidth=2,
-                                    highlightthickness=1,
-                                    highlightbackground=self.current_theme['border'])
+                                    highlightthickness=1)
+        self.theme.register(limit_rate_entry, 'entry')
         limit_rate_entry.pack(side=tk.LEFT, padx=(0, 5))
         ttk.Label(speed_frame, text="(例: 1M, 500K)", 
                  style="Subtitle.TLabel").pack(side=tk.LEFT)
@@ -607,24 +553,19 @@ class YouTubeDownloaderGUI:
         conn_frame.grid(row=11, column=1, sticky=tk.W, pady=5)
         ttk.Label(conn_frame, text="同時接続:", style="Modern.TLabel").pack(
             side=tk.LEFT, padx=(0, 5))
-        self.concurrent_fragments_var = tk.StringVar(value="1")
         concurrent_entry = tk.Entry(conn_frame,
                                    textvariable=self.concurrent_fragments_var,
                                    width=8,
-                                   bg=self.current_theme['bg_darker'],
-                                   fg=self.current_theme['text_primary'],
                                    font=(ThemeManager.FONT_FAMILY, 10),
                                    relief="flat",
                                    borderwidth=2,
-                                   highlightthickness=1,
-                                   highlightbackground=self.current_theme['border'])
+                                   highlightthickness=1)
+        self.theme.register(concurrent_entry, 'entry')
         concurrent_entry.pack(side=tk.LEFT)
-        self.fragment_retries_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(options_card, text="無限再試行", 
+        ttk.Checkbutton(options_card, text="再試行回数を増やす", 
                        variable=self.fragment_retries_var,
                        style="Modern.TCheckbutton").grid(
             row=12, column=0, sticky=tk.W, pady=5, padx=(0, 10))
-        self.no_part_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="一時ファイルなし", 
                        variable=self.no_part_var,
                        style="Modern.TCheckbutton").grid(
@@ -632,12 +573,10 @@ class YouTubeDownloaderGUI:
         ttk.Label(options_card, text="📚 プレイリスト詳細", 
                  style="Modern.TLabel", font=(ThemeManager.FONT_FAMILY, 10, "bold")).grid(
             row=13, column=0, columnspan=2, sticky=tk.W, pady=(10, 5))
-        self.playlist_reverse_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="逆順でダウンロード", 
                        variable=self.playlist_reverse_var,
                        style="Modern.TCheckbutton").grid(
             row=14, column=0, sticky=tk.W, pady=5, padx=(0, 10))
-        self.playlist_random_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="ランダム順", 
                        variable=self.playlist_random_var,
                        style="Modern.TCheckbutton").grid(
@@ -650,7 +589,6 @@ class YouTubeDownloaderGUI:
         cookie_frame.columnconfigure(1, weight=1)
         ttk.Label(cookie_frame, text="Cookie:", style="Modern.TLabel").grid(
             row=0, column=0, sticky=tk.W, padx=(0, 10))
-        self.cookies_from_browser_var = tk.StringVar(value="なし")
         cookies_combo = ttk.Combobox(cookie_frame, 
                                     textvariable=self.cookies_from_browser_var,
                                     values=["なし", "chrome", "firefox", "edge", "safari", "opera"],
@@ -662,98 +600,129 @@ class YouTubeDownloaderGUI:
         proxy_frame.columnconfigure(1, weight=1)
         ttk.Label(proxy_frame, text="プロキシ:", style="Modern.TLabel").grid(
             row=0, column=0, sticky=tk.W, padx=(0, 10))
-        self.proxy_var = tk.StringVar(value="")
         proxy_entry = tk.Entry(proxy_frame,
                               textvariable=self.proxy_var,
-                              bg=self.current_theme['bg_darker'],
-                              fg=self.current_theme['text_primary'],
                               font=(ThemeManager.FONT_FAMILY, 10),
                               relief="flat",
                               borderwidth=2,
-                              highlightthickness=1,
-                              highlightbackground=self.current_theme['border'])
+                              highlightthickness=1)
+        self.theme.register(proxy_entry, 'entry')
         proxy_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), ipady=6)
         ttk.Label(options_card, text="🛠️ その他", 
                  style="Modern.TLabel", font=(ThemeManager.FONT_FAMILY, 10, "bold")).grid(
             row=18, column=0, columnspan=2, sticky=tk.W, pady=(10, 5))
-        self.restrict_filenames_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="安全なファイル名", 
                        variable=self.restrict_filenames_var,
                        style="Modern.TCheckbutton").grid(
             row=19, column=0, sticky=tk.W, pady=5, padx=(0, 10))
-        self.no_mtime_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_card, text="タイムスタンプ保持しない", 
                        variable=self.no_mtime_var,
                        style="Modern.TCheckbutton").grid(
             row=19, column=1, sticky=tk.W, pady=5)
-        progress_card = ttk.LabelFrame(main_frame, text="進捗", padding="15", 
-                                      style="Modern.TLabelframe")
-        progress_card.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
-        progress_card.columnconfigure(0, weight=1)
-        self.progress_var = tk.DoubleVar()
-        self.progress_bar = ttk.Progressbar(progress_card, 
-                                           variable=self.progress_var, 
-                                           maximum=100, mode='determinate',
-                                           style="Modern.Horizontal.TProgressbar")
-        self.progress_bar.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
-        self.status_label = ttk.Label(progress_card, text="⏸️ 待機中...", 
-                                     style="Modern.TLabel")
-        self.status_label.grid(row=1, column=0, sticky=tk.W)
-        log_card = ttk.LabelFrame(main_frame, text="ログ", padding="15", 
-                                 style="Modern.TLabelframe")
-        log_card.grid(row=5, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
-        log_card.columnconfigure(0, weight=1)
-        self.log_text = tk.Text(log_card, height=8, wrap=tk.WORD,
-                               bg=self.current_theme['bg_darker'],
-                               fg=self.current_theme['text_primary'],
-                               insertbackground=self.current_theme['text_bright'],
-                               font=(ThemeManager.FONT_FAMILY, 9),
+        staging_frame = ttk.Frame(options_card, style="Modern.TFrame")
+        staging_frame.grid(row=20, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        staging_frame.columnconfigure(1, weight=1)
+        ttk.Label(staging_frame, text="作業フォルダ:", style="Modern.TLabel").grid(
+            row=0, column=0, sticky=tk.W, padx=(0, 10))
+        staging_entry = tk.Entry(staging_frame,
+                                textvariable=self.staging_path_var,
+                                font=(ThemeManager.FONT_FAMILY, 10),
+                                relief="flat",
+                                borderwidth=2,
+                                highlightthickness=1)
+        self.theme.register(staging_entry, 'entry')
+        staging_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 10), ipady=6)
+        ttk.Button(staging_frame, text="📁 参照", 
+                  command=self._browse_staging_folder,
+                  style="Modern.TButton").grid(row=0, column=2)
+        ttk.Label(staging_frame, text="(空欄で保存先に直接書き込み)", 
+                 style="Subtitle.TLabel").grid(row=1, column=1, sticky=tk.W)
+        fanout_frame = ttk.Frame(options_card, style="Modern.TFrame")
+        fanout_frame.grid(row=21, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        fanout_frame.columnconfigure(1, weight=1)
+        ttk.Label(fanout_frame, text="同時出力:", style="Modern.TLabel").grid(
+            row=0, column=0, sticky=tk.W, padx=(0, 10))
+        fanout_entry = tk.Entry(fanout_frame,
+                               textvariable=self.fanout_outputs_var,
+                               font=(ThemeManager.FONT_FAMILY, 10),
                                relief="flat",
-                               borderwidth=0,
-                               padx=10, pady=10)
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E))
-        scrollbar = tk.Scrollbar(log_card, command=self.log_text.yview,
-                                bg=self.current_theme['bg_lighter'],
-                                troughcolor=self.current_theme['bg_darker'],
-                                activebackground=self.current_theme['accent_primary'])
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.log_text.config(yscrollcommand=scrollbar.set)
-        button_frame = ttk.Frame(main_frame, style="Modern.TFrame")
-        button_frame.grid(row=6, column=0, sticky=(tk.W, tk.E), pady=(0, 20))
-        self.download_btn = ttk.Button(button_frame, text="⬇️ ダウンロード", 
-                                       command=self._start_download,
-                                       style="Accent.TButton")
-        self.download_btn.pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=20)
-        self.cancel_btn = ttk.Button(button_frame, text="⏹️ キャンセル", 
-                                     command=self._cancel_download, 
-                                     state=tk.DISABLED,
-                                     style="Modern.TButton")
-        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
-        ttk.Button(button_frame, text="📜 履歴", 
-                  command=self._show_history,
-                  style="Modern.TButton").pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
-        ttk.Button(button_frame, text="💾 設定を保存", 
-                  command=self._save_settings,
-                  style="Modern.TButton").pack(side=tk.LEFT, padx=(0, 10), ipady=8, ipadx=15)
-        ttk.Button(button_frame, text="🗑️ ログクリア", 
-                  command=self._clear_log,
-                  style="Modern.TButton").pack(side=tk.LEFT, ipady=8, ipadx=15)
-        self._on_type_change()
+                               borderwidth=2,
+                               highlightthickness=1)
+        self.theme.register(fanout_entry, 'entry')
+        fanout_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), ipady=6)
+        ttk.Label(fanout_frame, text="(例: mp3, 480p mp4 — 1回のダウンロードから追加で書き出し)", 
+                 style="Subtitle.TLabel").grid(row=1, column=1, sticky=tk.W)
+        clip_frame = ttk.Frame(options_card, style="Modern.TFrame")
+        clip_frame.grid(row=22, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        clip_frame.columnconfigure(1, weight=1)
+        for clip_row, (label, variable, hint) in enumerate((
+                ("切り出し範囲:", self.clip_ranges_var, "(例: 1:00-4:00, 2:30:00-2:33:00)"),
+                ("チャプター:", self.clip_chapters_var, "(チャプター名をカンマ区切りで指定)"))):
+            ttk.Label(clip_frame, text=label, style="Modern.TLabel").grid(
+                row=clip_row * 2, column=0, sticky=tk.W, padx=(0, 10))
+            self.theme.register(tk.Entry(clip_frame,
+                     textvariable=variable,
+                     font=(ThemeManager.FONT_FAMILY, 10),
+                     relief="flat",
+                     borderwidth=2,
+                     highlightthickness=1), 'entry').grid(
+                row=clip_row * 2, column=1, sticky=(tk.W, tk.E), ipady=6)
+            ttk.Label(clip_frame, text=hint, 
+                     style="Subtitle.TLabel").grid(row=clip_row * 2 + 1, column=1, sticky=tk.W)
+        ttk.Checkbutton(options_card, text="⏱️ プロファイル計測（レポートを保存先に出力）", 
+                       variable=self.profile_var,
+                       style="Modern.TCheckbutton").grid(
+            row=23, column=0, columnspan=2, sticky=tk.W, pady=5)
+        ttk.Checkbutton(options_card, text="🔍 ダウンロード後に検証（ffprobe・ハッシュ、マニフェストを保存先に出力）", 
+                       variable=self.verify_var,
+                       style="Modern.TCheckbutton").grid(
+            row=24, column=0, columnspan=2, sticky=tk.W, pady=5)
+        ttk.Checkbutton(options_card, text="🔗 重複ファイルを共有（同じ動画・形式は再ダウンロードせずハードリンク）", 
+                       variable=self.dedupe_var,
+                       style="Modern.TCheckbutton").grid(
+            row=25, column=0, columnspan=2, sticky=tk.W, pady=5)
+        filter_frame = ttk.Frame(options_card, style="Modern.TFrame")
+        filter_frame.grid(row=26, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        filter_frame.columnconfigure(1, weight=1)
+        ttk.Label(filter_frame, text="フィルター:", style="Modern.TLabel").grid(
+            row=0, column=0, sticky=tk.W, padx=(0, 10))
+        filter_entry = tk.Entry(filter_frame,
+                               textvariable=self.filter_var,
+                               font=(ThemeManager.FONT_FAMILY, 10),
+                               relief="flat",
+                               borderwidth=2,
+                               highlightthickness=1)
+        self.theme.register(filter_entry, 'entry')
+        filter_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), ipady=6)
+        ttk.Label(filter_frame, text="(例: duration < 1200 & upload_date >= 20240101 & title ~= (?i)live)", 
+                 style="Subtitle.TLabel").grid(row=1, column=1, sticky=tk.W)
+        self._sync_option_widgets()
+    def _sync_option_widgets(self):
+        
+        self._on_subtitle_change()
+        self._on_playlist_change()
+        if self.playlist_start_var.get() == "選択済み":
+            self.playlist_start_entry.config(state=tk.DISABLED)
     def _on_type_change(self):
         
         is_video = self.download_type_var.get() == "video"
+        is_audio = self.download_type_var.get() == "audio"
         state = "readonly" if is_video else "disabled"
         self.video_quality_combo.config(state=state)
         self.video_format_combo.config(state=state)
-        state = "disabled" if is_video else "readonly"
+        state = "readonly" if is_audio else "disabled"
         self.audio_quality_combo.config(state=state)
         self.audio_format_combo.config(state=state)
     def _on_subtitle_change(self):
         
+        if not self.options_collapsible.is_built:
+            return
         state = tk.NORMAL if self.download_subtitles_var.get() else tk.DISABLED
         self.auto_subtitles_check.config(state=state)
     def _on_playlist_change(self):
         
+        if not self.options_collapsible.is_built:
+            return
         state = tk.NORMAL if self.playlist_mode_var.get() else tk.DISABLED
         self.playlist_start_entry.config(state=state)
         self.playlist_end_entry.config(state=state)
@@ -762,6 +731,11 @@ class YouTubeDownloaderGUI:
         folder = filedialog.askdirectory(initialdir=self.download_path_var.get())
         if folder:
             self.download_path_var.set(folder)
+    def _browse_staging_folder(self):
+        
+        folder = filedialog.askdirectory(initialdir=self.staging_path_var.get() or self.download_path_var.get())
+        if folder:
+            self.staging_path_var.set(folder)
     def _log(self, message: str):
         
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -774,6 +748,8 @@ class YouTubeDownloaderGUI:
     def _load_settings(self):
         
         self.download_path_var.set(self.config.get("download_path"))
+        self.staging_path_var.set(self.config.get("staging_path"))
+        self.fanout_outputs_var.set(self.config.get("fanout_outputs"))
         self.download_type_var.set(self.config.get("download_type"))
         self.video_quality_var.set(self.config.get("video_quality"))
         self.audio_quality_var.set(self.config.get("audio_quality"))
@@ -791,6 +767,8 @@ class YouTubeDownloaderGUI:
     def _save_settings(self):
         
         self.config.set("download_path", self.download_path_var.get())
+        self.config.set("staging_path", self.staging_path_var.get())
+        self.config.set("fanout_outputs", self.fanout_outputs_var.get())
         self.config.set("download_type", self.download_type_var.get())
         self.config.set("video_quality", self.video_quality_var.get())
         self.config.set("audio_quality", self.audio_quality_var.get())
@@ -816,8 +794,12 @@ class YouTubeDownloaderGUI:
         self.loading.show()
         def get_info():
             try:
-                self.downloader = YouTubeDownloader()
-                info = self.downloader.get_video_info(url)
+                self.downloader = YouTubeDownloader(progress_callback=self._progress_callback)
+                info = self.downloader.get_video_info(url, {
+                    'profile': 'all' if self.profile_var.get() else '',
+                    'download_path': self.download_path_var.get(),
+                    'proxy': self.proxy_var.get(),
+                })
                 self.root.after(0, lambda: self._show_video_info(info))
             except Exception as e:
                 self.root.after(0, lambda: self._log(f"❌ エラー: {str(e)}"))
@@ -839,6 +821,7 @@ class YouTubeDownloaderGUI:
             if info['count'] > 10:
                 message += f"\n... 他 {info['count'] - 10} 件"
             self._log(f"📚 プレイリスト情報を取得: {info['title']} ({info['count']}件)")
+            thumbnail = next((entry.get('thumbnail') for entry in info['entries'] if entry.get('thumbnail')), None)
         else:
             duration = info['duration']
             minutes = duration // 60
@@ -848,9 +831,85 @@ class YouTubeDownloaderGUI:
             message += f"再生時間: {minutes}:{seconds:02d}\n"
             message += f"再生回数: {info.get('view_count', 'N/A'):,}\n"
             self._log(f"🎬 動画情報を取得: {info['title']}")
-        messagebox.showinfo("動画情報", message)
+            thumbnail = info.get('thumbnail')
+        window = tk.Toplevel(self.root)
+        window.title("動画情報")
+        self.theme.register(window, 'window')
+        window.transient(self.root)
+        frame = ttk.Frame(window, padding="15", style="Modern.TFrame")
+        frame.pack(fill=tk.BOTH, expand=True)
+        image_label = self.theme.register(
+            tk.Label(frame, image=self._thumbnail_placeholder(INFO_SIZE), borderwidth=0), 'image')
+        image_label.pack(pady=(0, 10))
+        ttk.Label(frame, text=message, style="Modern.TLabel", justify=tk.LEFT).pack(anchor=tk.W)
+        ttk.Button(frame, text="閉じる", command=window.destroy,
+                  style="Accent.TButton").pack(pady=(10, 0), ipady=6, ipadx=20)
+        if thumbnail:
+            self._load_thumbnail(image_label, thumbnail, INFO_SIZE)
+    def _thumbnails(self) -> ThumbnailCache:
+        
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache(
+                os.path.join(self.config.data_dir, "thumbnails"),
+                proxy=next(iter(parse_proxies(self.proxy_var.get())), None))
+        return self.thumbnail_cache
+    def _thumbnail_placeholder(self, size):
+        
+        if size not in self.thumbnail_placeholders:
+            self.thumbnail_placeholders[size] = tk.PhotoImage(width=size[0], height=size[1])
+        return self.thumbnail_placeholders[size]
+    def _load_thumbnail(self, label, url: str, size=LIST_SIZE):
+        
+        def on_loaded(image):
+            if image is not None:
+                self.root.after(0, lambda: self._set_thumbnail(label, image))
+        self._thumbnails().request(url, on_loaded, size)
+    def _set_thumbnail(self, label, image):
+        
+        if not label.winfo_exists():
+            return
+        photo = ImageTk.PhotoImage(image)
+        label.configure(image=photo)
+        label.image = photo
     def _progress_callback(self, progress: dict):
         
+        if progress.get('status') == 'held':
+            message = f"💾 ディスク容量待ち: {progress.get('path')}"
+            self.root.after(0, lambda: self.status_label.config(text=message))
+            self.root.after(0, lambda: self._log(message))
+            return
+        if progress.get('status') == 'throttled':
+            speed_kb = progress.get('speed', 0) / 1024
+            baseline_kb = progress.get('baseline', 0) / 1024
+            message = f"🐢 速度低下を検出 ({speed_kb:.0f} KB/s / 通常 {baseline_kb:.0f} KB/s)。URLを再取得して再開します"
+            self.root.after(0, lambda: self._log(message))
+            return
+        if progress.get('status') == 'profiled':
+            message = f"⏱️ プロファイル: {progress.get('summary')} → {progress.get('path')}.*"
+            self.root.after(0, lambda: self._log(message))
+            return
+        if progress.get('status') == 'filtered':
+            message = f"🚫 フィルターで除外: {progress.get('skipped', 0)}件 (最新: {progress.get('title')})"
+            self.root.after(0, lambda: self.status_label.config(text=message))
+            return
+        if progress.get('status') == 'existing':
+            message = f"🔗 保存済みのファイルを再利用: {progress.get('file_path')}"
+            self.root.after(0, lambda: self._log(message))
+            return
+        if progress.get('status') == 'verifying':
+            message = f"🔍 {progress.get('count', 0)}件のファイルを検証中..."
+            self.root.after(0, lambda: self.status_label.config(text=message))
+            self.root.after(0, lambda: self._log(message))
+            return
+        if progress.get('status') == 'rendered':
+            message = f"🎞️ 書き出し完了: {progress.get('file_path')}"
+            self.root.after(0, lambda: self._log(message))
+            return
+        if progress.get('status') == 'retrying':
+            message = f"🔁 {progress.get('delay', 0):.0f}秒後に再試行します: {progress.get('reason', '')}"
+            self.root.after(0, lambda: self.status_label.config(text="🔁 再試行待ち..."))
+            self.root.after(0, lambda: self._log(message))
+            return
         percent = progress.get('percent', 0)
         speed = progress.get('speed', 0)
         eta = progress.get('eta', 0)
@@ -895,6 +954,10 @@ class YouTubeDownloaderGUI:
             'no_part': self.no_part_var.get(),
             'restrict_filenames': self.restrict_filenames_var.get(),
             'no_mtime': self.no_mtime_var.get(),
+            'profile': 'all' if self.profile_var.get() else '',
+            'verify': self.verify_var.get(),
+            'dedupe': self.dedupe_var.get(),
+            'filter': self.filter_var.get(),
             'embed_metadata': self.embed_metadata_var.get(),
             'write_info_json': self.write_info_json_var.get(),
             'embed_subs': self.embed_subs_var.get(),
@@ -908,7 +971,8 @@ class YouTubeDownloaderGUI:
             if hasattr(self, 'selected_playlist_items') and self.selected_playlist_items:
                 options['playlist_items'] = self.selected_playlist_items
                 self.selected_playlist_items = None
-                self.playlist_start_entry.config(state=tk.NORMAL)
+                if self.options_collapsible.is_built:
+                    self.playlist_start_entry.config(state=tk.NORMAL)
                 self.playlist_start_var.set("1")
             else:
                 try:
@@ -994,19 +1058,9 @@ class YouTubeDownloaderGUI:
         history_window = tk.Toplevel(self.root)
         history_window.title("ダウンロード履歴")
         history_window.geometry("800x500")
-        history_window.configure(bg=self.current_theme['bg_dark'])
+        self.theme.register(history_window, 'window')
         tree_frame = ttk.Frame(history_window, padding="20", style="Modern.TFrame")
         tree_frame.pack(fill=tk.BOTH, expand=True)
-        style = ttk.Style()
-        style.configure("Modern.Treeview",
-                       background=self.current_theme['bg_lighter'],
-                       foreground=self.current_theme['text_primary'],
-                       fieldbackground=self.current_theme['bg_lighter'],
-                       font=(ThemeManager.FONT_FAMILY, 9))
-        style.configure("Modern.Treeview.Heading",
-                       background=self.current_theme['bg_hover'],
-                       foreground=self.current_theme['text_bright'],
-                       font=(ThemeManager.FONT_FAMILY, 10, "bold"))
         tree = ttk.Treeview(tree_frame, columns=("title", "type", "quality", "date"), 
                            show="headings", height=15, style="Modern.Treeview")
         tree.heading("title", text="タイトル")
@@ -1017,10 +1071,8 @@ class YouTubeDownloaderGUI:
         tree.column("type", width=100)
         tree.column("quality", width=120)
         tree.column("date", width=180)
-        scrollbar = tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview,
-                                bg=self.current_theme['bg_lighter'],
-                                troughcolor=self.current_theme['bg_darker'],
-                                activebackground=self.current_theme['accent_primary'])
+        scrollbar = self.theme.register(
+            tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview), 'scrollbar')
         tree.configure(yscrollcommand=scrollbar.set)
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -1045,6 +1097,74 @@ class YouTubeDownloaderGUI:
         ttk.Button(button_frame, text="✖️ 閉じる", 
                   command=history_window.destroy,
                   style="Modern.TButton").pack(side=tk.RIGHT, ipady=6, ipadx=15)
+    def _show_diagnostics(self):
+        
+        if hasattr(self, 'diagnostics_window') and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        self.diagnostics_window = window
+        window.title("UI診断")
+        window.geometry("760x520")
+        self.theme.register(window, 'window')
+        frame = ttk.Frame(window, padding="15", style="Modern.TFrame")
+        frame.pack(fill=tk.BOTH, expand=True)
+        summary_label = ttk.Label(frame, style="Modern.TLabel", justify=tk.LEFT)
+        summary_label.pack(anchor=tk.W, pady=(0, 10))
+        tree = ttk.Treeview(frame, columns=("time", "duration", "handler"),
+                           show="headings", height=8, style="Modern.Treeview")
+        tree.heading("time", text="日時")
+        tree.heading("duration", text="停止時間 (ms)")
+        tree.heading("handler", text="処理")
+        tree.column("time", width=170)
+        tree.column("duration", width=110)
+        tree.column("handler", width=420)
+        tree.pack(fill=tk.X)
+        stack_text = tk.Text(frame, height=12, wrap=tk.NONE, relief="flat", borderwidth=0,
+                             font=("Consolas", 9), padx=8, pady=8)
+        self.theme.register(stack_text, 'text')
+        stack_text.pack(fill=tk.BOTH, expand=True, pady=(10, 10))
+        stalls = []
+        def refresh():
+            if not window.winfo_exists():
+                return
+            metrics = self.watchdog.metrics()
+            lag = metrics['lag_ms']
+            summary_label.config(text=(
+                f"メインループ遅延: p50 {lag['p50']} ms / p90 {lag['p90']} ms / "
+                f"p99 {lag['p99']} ms / 最大 {lag['max']} ms\n"
+                f"計測数: {metrics['samples']}  停止検出: {metrics['stall_count']}件 "
+                f"(しきい値 {metrics['threshold_ms']:.0f} ms)"))
+            if len(metrics['stalls']) != len(stalls) or metrics['stalls'][-1:] != stalls[-1:]:
+                stalls[:] = metrics['stalls']
+                tree.delete(*tree.get_children())
+                for index, stall in reversed(list(enumerate(stalls))):
+                    tree.insert("", tk.END, iid=str(index),
+                                values=(stall['time'], stall['duration_ms'], stall['handler']))
+            window.after(1000, refresh)
+        def on_select(event):
+            selection = tree.selection()
+            if not selection:
+                return
+            stall = stalls[int(selection[0])]
+            stack_text.delete("1.0", tk.END)
+            stack_text.insert(tk.END, ''.join(stall['stack']) or "(スタック未取得)")
+        tree.bind("<<TreeviewSelect>>", on_select)
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=window, defaultextension=".json",
+                initialfile=f"ytgrab-ui-metrics-{datetime.now():%Y%m%d-%H%M%S}.json",
+                filetypes=[("JSON", "*.json")])
+            if path:
+                self.watchdog.export(path)
+                self._log(f"🩺 UI診断データを書き出しました: {path}")
+        button_frame = ttk.Frame(frame, style="Modern.TFrame")
+        button_frame.pack(fill=tk.X)
+        ttk.Button(button_frame, text="📤 エクスポート", command=export,
+                  style="Modern.TButton").pack(side=tk.LEFT, ipady=6, ipadx=15)
+        ttk.Button(button_frame, text="✖️ 閉じる", command=window.destroy,
+                  style="Modern.TButton").pack(side=tk.RIGHT, ipady=6, ipadx=15)
+        refresh()
     def _start_download(self):
         
         url = self.url_entry.get().strip()
@@ -1056,6 +1176,7 @@ class YouTubeDownloaderGUI:
             return
         options = {
             'download_path': self.download_path_var.get(),
+            'staging_path': self.staging_path_var.get(),
             'download_type': self.download_type_var.get(),
             'video_quality': self.video_quality_var.get(),
             'audio_quality': self.audio_quality_var.get(),
@@ -1068,6 +1189,10 @@ class YouTubeDownloaderGUI:
             'embed_thumbnail': self.embed_thumbnail_var.get(),
             'filename_template': self.filename_template_var.get(),
             'playlist_mode': self.playlist_mode_var.get(),
+            'profile': 'all' if self.profile_var.get() else '',
+            'verify': self.verify_var.get(),
+            'dedupe': self.dedupe_var.get(),
+            'filter': self.filter_var.get(),
         }
         if self.playlist_mode_var.get():
             try:
@@ -1078,6 +1203,35 @@ class YouTubeDownloaderGUI:
             except ValueError:
                 messagebox.showerror("エラー", "プレイリスト範囲は数値で入力してください")
                 return
+        try:
+            compile_filter(self.filter_var.get())
+        except ValueError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+        if self.clip_ranges_var.get().strip() or self.clip_chapters_var.get().strip():
+            try:
+                parse_time_ranges(self.clip_ranges_var.get())
+            except ValueError as e:
+                messagebox.showerror("エラー", str(e))
+                return
+            options['time_ranges'] = self.clip_ranges_var.get()
+            options['chapters'] = self.clip_chapters_var.get()
+        if (self.fanout_outputs_var.get().strip() and not self.playlist_mode_var.get()
+                and options['download_type'] != 'subtitles'
+                and not options.get('time_ranges') and not options.get('chapters')):
+            try:
+                extra_outputs = parse_output_specs(self.fanout_outputs_var.get())
+            except ValueError as e:
+                messagebox.showerror("エラー", str(e))
+                return
+            primary = {key: options[key] for key in
+                       ('download_type', 'video_quality', 'audio_quality', 'video_format', 'audio_format')}
+            options['outputs'] = [primary] + extra_outputs
+            if not options.get('staging_path'):
+                options['master_cache_path'] = os.path.join(self.config.data_dir, "masters")
+        self._run_download(url, options)
+    def _run_download(self, url: str, options: dict):
+        
         self.is_downloading = True
         self.download_btn.config(state=tk.DISABLED)
         self.cancel_btn.config(state=tk.NORMAL)
@@ -1087,7 +1241,10 @@ class YouTubeDownloaderGUI:
         def download():
             try:
                 self.downloader = YouTubeDownloader(progress_callback=self._progress_callback)
-                result = self.downloader.download(url, options)
+                if options.get('outputs'):
+                    result = self.downloader.download_fanout(url, options)
+                else:
+                    result = self.downloader.download(url, options)
                 self.root.after(0, lambda: self._download_complete(result, url, options))
             except Exception as e:
                 self.root.after(0, lambda: self._download_error(str(e)))
@@ -1106,29 +1263,107 @@ class YouTubeDownloaderGUI:
             if result['type'] == 'playlist':
                 self._log(f"✅ プレイリストのダウンロードが完了: {result['title']}")
                 self._log(f"📊 ダウンロード数: {len(result['files'])}件")
-                if result['files']:
-                    first_file = result['files'][0]
+                self._log_plans([f.get('plan') for f in result['files']])
+                verified_files = [f for f in result['files'] if f.get('verified', True)]
+                if verified_files:
+                    first_file = verified_files[0]
                     self.config.add_to_history(
                         url, result['title'], first_file['file_path'],
                         options['download_type'], 
                         f"Playlist ({len(result['files'])} files)"
                     )
                 messagebox.showinfo("完了", f"プレイリストのダウンロードが完了しました\n{len(result['files'])}件")
+            elif result['type'] == 'subtitles':
+                self._log(f"✅ 字幕の取得が完了: {result['title']}")
+                self._log(f"📊 動画数: {result['video_count']}件 / 字幕ファイル: {len(result['files'])}件")
+                self._log(f"🗂️ インデックス: {result['index_path']}")
+                for error in result.get('errors', []):
+                    self._log(f"⚠️ 取得失敗: {error}")
+                self.config.add_to_history(
+                    url, result['title'], result['index_path'],
+                    'subtitles', ", ".join(options.get('subtitle_languages', []))
+                )
+                messagebox.showinfo("完了", f"字幕の取得が完了しました\n{len(result['files'])}件")
+            elif result['type'] == 'fanout':
+                self._log(f"✅ ダウンロード完了: {result['title']}")
+                if result.get('master_reused'):
+                    self._log("♻️ 保存済みのマスターから書き出しました")
+                for output in result['files']:
+                    self._log(f"📁 保存先: {output['file_path']}")
+                    if not output.get('verified', True):
+                        continue
+                    spec = output['spec']
+                    quality = spec.get('video_quality' if spec['download_type'] == 'video' else 'audio_quality')
+                    self.config.add_to_history(
+                        url, result['title'], output['file_path'],
+                        spec['download_type'], quality
+                    )
+                for error in result.get('errors', []):
+                    self._log(f"⚠️ 書き出し失敗: {error}")
+                messagebox.showinfo("完了", f"ダウンロードが完了しました\n{result['title']} ({len(result['files'])}件)")
+            elif result['type'] == 'skipped':
+                self._log(f"⏭️ {result['skipped']}: {result['title']}")
+                messagebox.showinfo("スキップ", f"{result['skipped']}\n{result['title']}")
             else:
                 self._log(f"✅ ダウンロード完了: {result['title']}")
                 self._log(f"📁 保存先: {result['file_path']}")
+                for clip in result.get('clips', [])[1:]:
+                    self._log(f"📁 保存先: {clip}")
+                self._log_plans([result.get('plan')])
                 quality = options.get('video_quality' if options['download_type'] == 'video' else 'audio_quality')
                 self.config.add_to_history(
                     url, result['title'], result['file_path'],
                     options['download_type'], quality
                 )
                 messagebox.showinfo("完了", f"ダウンロードが完了しました\n{result['title']}")
+            self._log_verification(result.get('verification'))
+            self._log_filtered(result.get('filtered'))
+            if result.get('reclaimed'):
+                self._log(f"🔗 重複をリンクに置き換え: {result['reclaimed'] / 1024 / 1024:.1f} MB を節約")
             self.status_label.config(text="✅ 完了")
             self.progress_var.set(100)
+        elif result.get('retry_after'):
+            self._log(f"⏳ {result['error']}")
+            self.status_label.config(text="⏳ 再試行待ち")
+            self.root.after(int(result['retry_after'] * 1000), lambda: self._requeue_download(url, options))
         else:
+            self._log_verification(result.get('verification'))
+            self._log_filtered(result.get('filtered'))
             self._log(f"❌ エラー: {result['error']}")
             self.status_label.config(text="❌ エラー")
             messagebox.showerror("エラー", result['error'])
+    def _log_verification(self, verification: dict):
+        
+        if not verification:
+            return
+        failed = verification['failed']
+        self._log(f"🔍 検証: {verification['files'] - len(failed)}/{verification['files']}件 OK")
+        for record in failed:
+            self._log(f"⚠️ 検証失敗（履歴に記録しません）: {record['path']}: {', '.join(record['errors'])}")
+        if verification.get('manifest'):
+            self._log(f"🗂️ マニフェスト: {verification['manifest']}")
+    def _log_filtered(self, filtered: dict):
+        
+        if filtered and filtered['skipped']:
+            self._log(f"🚫 フィルターで除外: {filtered['skipped']}件 "
+                      f"(一覧の情報で除外: {filtered['flat']}件 / 詳細取得後に除外: {filtered['full']}件)")
+    def _log_plans(self, plans: list):
+        
+        labels = {'copy': 'コピー', 'remux': 'リマックス', 'transcode': '再エンコード'}
+        counts = {}
+        for plan in plans:
+            if plan:
+                counts[plan] = counts.get(plan, 0) + 1
+        if counts:
+            summary = ", ".join(f"{labels.get(plan, plan)}: {count}件" for plan, count in counts.items())
+            self._log(f"🧩 処理方式: {summary}")
+    def _requeue_download(self, url: str, options: dict):
+        
+        if self.is_downloading:
+            self.root.after(10000, lambda: self._requeue_download(url, options))
+            return
+        self._log(f"🔁 再試行します: {url}")
+        self._run_download(url, options)
     def _download_error(self, error: str):
         
         self.is_downloading = False
@@ -1146,19 +1381,9 @@ class YouTubeDownloaderGUI:
         history_window = tk.Toplevel(self.root)
         history_window.title("ダウンロード履歴")
         history_window.geometry("800x500")
-        history_window.configure(bg=self.current_theme['bg_dark'])
+        self.theme.register(history_window, 'window')
         tree_frame = ttk.Frame(history_window, padding="20", style="Modern.TFrame")
         tree_frame.pack(fill=tk.BOTH, expand=True)
-        style = ttk.Style()
-        style.configure("Modern.Treeview",
-                       background=self.current_theme['bg_lighter'],
-                       foreground=self.current_theme['text_primary'],
-                       fieldbackground=self.current_theme['bg_lighter'],
-                       font=(ThemeManager.FONT_FAMILY, 9))
-        style.configure("Modern.Treeview.Heading",
-                       background=self.current_theme['bg_hover'],
-                       foreground=self.current_theme['text_bright'],
-                       font=(ThemeManager.FONT_FAMILY, 10, "bold"))
         tree = ttk.Treeview(tree_frame, columns=("title", "type", "quality", "date"), 
                            show="headings", height=15, style="Modern.Treeview")
         tree.heading("title", text="タイトル")
@@ -1169,10 +1394,8 @@ class YouTubeDownloaderGUI:
         tree.column("type", width=100)
         tree.column("quality", width=120)
         tree.column("date", width=180)
-        scrollbar = tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview,
-                                bg=self.current_theme['bg_lighter'],
-                                troughcolor=self.current_theme['bg_darker'],
-                                activebackground=self.current_theme['accent_primary'])
+        scrollbar = self.theme.register(
+            tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview), 'scrollbar')
         tree.configure(yscrollcommand=scrollbar.set)
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -1208,44 +1431,14 @@ class YouTubeDownloaderGUI:
         self.loading.show()
         def fetch_info():
             try:
-                import subprocess
-                import json
-                if getattr(sys, 'frozen', False):
-                    app_dir = os.path.dirname(sys.executable)
-                else:
-                    app_dir = os.path.dirname(os.path.abspath(__file__))
-                ytdlp_path = os.path.join(app_dir, "dependencies", "yt-dlp.exe")
-                if not os.path.exists(ytdlp_path):
-                    ytdlp_path = "yt-dlp"
-                cmd = [
-                    ytdlp_path, 
-                    "--flat-playlist", 
-                    "--dump-single-json",
-                    url
-                ]
-                proxy = self.proxy_var.get()
-                if proxy:
-                    cmd.extend(["--proxy", proxy])
-                cookies = self.cookies_from_browser_var.get()
-                if cookies and cookies != "なし":
-                    cmd.extend(["--cookies-from-browser", cookies])
-                startupinfo = None
-                if os.name == 'nt':
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                result = subprocess.run(
-                    cmd, 
-                    capture_output=True, 
-                    text=True, 
-                    encoding='utf-8',
-                    errors='ignore',
-                    startupinfo=startupinfo
-                )
-                if result.returncode != 0:
-                    raise Exception(result.stderr)
-                info = json.loads(result.stdout)
+                info = YouTubeDownloader().get_flat_playlist(url, {
+                    'proxy': self.proxy_var.get(),
+                    'cookies_from_browser': self.cookies_from_browser_var.get(),
+                    'filter': self.filter_var.get(),
+                })
                 if 'entries' not in info:
                     raise Exception("プレイリストが見つかりませんでした")
+                self.root.after(0, lambda: self._log_filtered(info.get('ytgrab_filtered')))
                 self.root.after(0, lambda: self._show_selection_dialog(info))
             except Exception as e:
                 self.root.after(0, lambda: self._log(f"❌ エラー: {str(e)}"))
@@ -1259,15 +1452,14 @@ class YouTubeDownloaderGUI:
         dialog = tk.Toplevel(self.root)
         dialog.title(f"プレイリスト選択: {info.get('title', 'Unknown')}")
         dialog.geometry("600x500")
-        dialog.configure(bg=self.current_theme['bg_dark'])
+        self.theme.register(dialog, 'window')
         main_frame = ttk.Frame(dialog, padding="10", style="Modern.TFrame")
         main_frame.pack(fill=tk.BOTH, expand=True)
         ttk.Label(main_frame, text="ダウンロードする動画を選択してください:", 
                  style="Modern.TLabel").pack(anchor=tk.W, pady=(0, 10))
         list_frame = ttk.Frame(main_frame, style="Modern.TFrame")
         list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
-        canvas = tk.Canvas(list_frame, bg=self.current_theme['bg_darker'], 
-                          highlightthickness=0)
+        canvas = self.theme.register(tk.Canvas(list_frame, highlightthickness=0), 'list_canvas')
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=canvas.yview)
         scrollable_frame = ttk.Frame(canvas, style="Modern.TFrame")
         scrollable_frame.bind(
@@ -1288,6 +1480,8 @@ class YouTubeDownloaderGUI:
                        variable=all_var, command=toggle_all,
                        style="Modern.TCheckbutton").pack(anchor=tk.W, pady=5)
         ttk.Separator(scrollable_frame, orient='horizontal').pack(fill=tk.X, pady=5)
+        rows = []
+        placeholder = self._thumbnail_placeholder(LIST_SIZE)
         for i, entry in enumerate(info['entries']):
             if not entry: continue
             var = tk.BooleanVar(value=True)
@@ -1296,11 +1490,39 @@ class YouTubeDownloaderGUI:
             duration_str = f" ({int(duration//60)}:{int(duration%60):02d})" if duration else ""
             frame = ttk.Frame(scrollable_frame, style="Modern.TFrame")
             frame.pack(fill=tk.X, pady=2)
+            image_label = self.theme.register(tk.Label(frame, image=placeholder, borderwidth=0), 'image')
+            image_label.pack(side=tk.LEFT, padx=(0, 8))
             cb = ttk.Checkbutton(frame, text=f"{i+1}. {title}{duration_str}", 
                                 variable=var,
                                 style="Modern.TCheckbutton")
-            cb.pack(anchor=tk.W)
+            cb.pack(side=tk.LEFT, anchor=tk.W)
             self.video_vars.append((var, i + 1))
+            rows.append((frame, image_label, thumbnail_url(entry)))
+        requested = set()
+        scheduled = {'id': None}
+        def load_visible():
+            scheduled['id'] = None
+            if not dialog.winfo_exists():
+                return
+            top = canvas.canvasy(0)
+            bottom = top + canvas.winfo_height()
+            for index, (frame, image_label, thumb) in enumerate(rows):
+                if index in requested or not thumb:
+                    continue
+                y = frame.winfo_y()
+                if y + frame.winfo_height() >= top and y <= bottom:
+                    requested.add(index)
+                    self._load_thumbnail(image_label, thumb, LIST_SIZE)
+        def schedule_visible(*_):
+            if scheduled['id'] is None:
+                scheduled['id'] = dialog.after(80, load_visible)
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            schedule_visible()
+        canvas.configure(yscrollcommand=on_scroll)
+        canvas.bind("<Configure>", schedule_visible, add="+")
+        dialog.bind("<Destroy>", lambda e: e.widget is dialog and self._thumbnails().cancel_pending(), add="+")
+        schedule_visible()
         btn_frame = ttk.Frame(main_frame, style="Modern.TFrame")
         btn_frame.pack(fill=tk.X)
         def on_ok():
@@ -1313,7 +1535,8 @@ class YouTubeDownloaderGUI:
             self.selected_playlist_items = ",".join(selected_indices)
             self._log(f"✅ {len(selected_indices)}件の動画を選択しました")
             self.playlist_start_var.set("選択済み")
-            self.playlist_start_entry.config(state=tk.DISABLED)
+            if self.options_collapsible.is_built:
+                self.playlist_start_entry.config(state=tk.DISABLED)
             dialog.destroy()
             if messagebox.askyesno("確認", "選択した動画をダウンロードしますか？"):
                 self._start_download()
@@ -1328,11 +1551,35 @@ class YouTubeDownloaderGUI:
                 return
             self._cancel_download()
         self._save_settings()
+        self.config.flush()
+        if self.thumbnail_cache:
+            self.thumbnail_cache.shutdown()
+        if self.instance:
+            self.instance.close()
+        self.watchdog.stop()
         self.root.destroy()
+    def _receive_urls(self, urls):
+        
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+        if not urls:
+            return
+        self.url_entry.delete(0, tk.END)
+        self.url_entry.insert(0, urls[0])
+        for url in urls:
+            self._log(f"📥 URLを受け取りました: {url}")
     def main(self):
         
         self.root.mainloop()
 if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        if arg == '--profile' or arg.startswith('--profile='):
+            os.environ[PROFILE_ENV] = arg.partition('=')[2] or 'all'
+    instance = InstanceServer()
+    if not instance.start():
+        hand_off(CLI_URLS)
+        sys.exit(0)
     root = tk.Tk()
-    app = YouTubeDownloaderGUI(root)
+    app = YouTubeDownloaderGUI(root, instance)
     app.main()
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from verify import file_hash
+FICLONE = 0x40049409
+VARIANT_OPTIONS = ('download_type', 'video_format', 'video_quality', 'audio_format', 'audio_quality',
+                   'embed_metadata', 'embed_thumbnail', 'embed_subs', 'download_subtitles')
+_store_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ytgrab-dedupe")
+def variant_for(options: Dict[str, Any]) -> Optional[str]:
+    if options.get('time_ranges') or options.get('chapters'):
+        return None
+    values = json.dumps({key: options.get(key) for key in VARIANT_OPTIONS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()[:12]
+def key_for(info: Dict[str, Any], variant: str) -> Optional[str]:
+    if not info.get('id') or not info.get('format_id'):
+        return None
+    return f"{info.get('extractor_key') or info.get('extractor')}:{info['id']}:{info['format_id']}:{variant}"
+def _reflink(source: str, target: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            return False
+    return True
+def link_file(source: str, target: str) -> Optional[str]:
+    temp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        try:
+            os.link(source, temp_path)
+            method = 'hardlink'
+        except OSError:
+            if not _reflink(source, temp_path):
+                return None
+            method = 'reflink'
+        os.replace(temp_path, target)
+        return method
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+class OutputStore:
+    INDEX_FILE = "output_index.json"
+    MIN_SIZE = 1024 * 1024
+    def __init__(self, index_dir: Optional[str] = None):
+        self.index_dir = index_dir
+        self._lock = threading.RLock()
+        self._files: Optional[Dict[str, Dict[str, Any]]] = None
+        self._keys: Dict[str, str] = {}
+        self._by_hash: Dict[str, List[str]] = defaultdict(list)
+    def configure(self, index_dir: Optional[str]) -> None:
+        with self._lock:
+            self.index_dir = index_dir
+            self._files = None
+    @property
+    def enabled(self) -> bool:
+        return bool(self.index_dir)
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.index_dir, self.INDEX_FILE)
+    def _load(self) -> None:
+        if self._files is not None:
+            return
+        self._files, self._keys = {}, {}
+        self._by_hash = defaultdict(list)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._files = data.get('files') or {}
+        self._keys = data.get('keys') or {}
+        for path, entry in self._files.items():
+            self._by_hash[entry['hash']].append(path)
+    def _save(self) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self._files, 'keys': self._keys}, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
+    def _current(self, path: str) -> Optional[Dict[str, Any]]:
+        entry = self._files.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if entry is not None and (stat is None or stat.st_size != entry['size'] or stat.st_mtime != entry['mtime']):
+            self._forget(path)
+            return None
+        return entry
+    def _forget(self, path: str) -> None:
+        entry = self._files.pop(path, None)
+        if entry is not None and path in self._by_hash.get(entry['hash'], []):
+            self._by_hash[entry['hash']].remove(path)
+        for key in [key for key, value in self._keys.items() if value == path]:
+            del self._keys[key]
+    def existing(self, key: Optional[str]) -> Optional[str]:
+        if not self.enabled or not key:
+            return None
+        with self._lock:
+            self._load()
+            path = self._keys.get(key)
+            if path and self._current(path) is None:
+                self._save()
+                return None
+            return path
+    def add(self, path: str, key: Optional[str] = None, digest: Optional[str] = None) -> Dict[str, Any]:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = digest or file_hash(path)
+        result = {'path': path, 'hash': digest, 'size': stat.st_size, 'linked_to': None, 'method': None}
+        with self._lock:
+            self._load()
+            self._forget(path)
+            if stat.st_size >= self.MIN_SIZE:
+                for other in list(self._by_hash.get(digest, [])):
+                    other_entry = self._current(other)
+                    if other_entry is None or other_entry['size'] != stat.st_size:
+                        continue
+                    if os.path.samefile(other, path):
+                        break
+                    method = link_file(other, path)
+                    if method:
+                        result.update(linked_to=other, method=method)
+                        stat = os.stat(path)
+                        break
+            self._files[path] = {'hash': digest, 'size': stat.st_size, 'mtime': stat.st_mtime}
+            self._by_hash[digest].append(path)
+            if key:
+                self._keys[key] = path
+            self._save()
+        return result
+    def submit(self, path: str, key: Optional[str] = None) -> Future:
+        return _store_executor.submit(self.add, path, key)
+    def link_existing(self, existing: str, target: str) -> str:
+        if os.path.exists(target):
+            return target if os.path.samefile(existing, target) else existing
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        if not link_file(existing, target):
+            return existing
+        with self._lock:
+            self._load()
+            digest = (self._files.get(os.path.abspath(existing)) or {}).get('hash')
+        self.add(target, digest=digest)
+        return target
+    def scan(self, root: str, dry_run: bool = False) -> Dict[str, Any]:
+        by_size: Dict[int, List[str]] = defaultdict(list)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(('.part', '.ytdl', '.tmp', '.temp')):
+                    continue
+                path = os.path.abspath(os.path.join(dirpath, filename))
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                if size >= self.MIN_SIZE and not os.path.islink(path):
+                    by_size[size].append(path)
+        stats = {'files': sum(len(paths) for paths in by_size.values()), 'duplicates': 0, 'reclaimed': 0, 'linked': []}
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            inodes = {}
+            for path in paths:
+                stat = os.stat(path)
+                inodes.setdefault((stat.st_dev, stat.st_ino), path)
+            if len(inodes) < 2:
+                continue
+            groups: Dict[str, List[str]] = defaultdict(list)
+            for path in inodes.values():
+                groups[file_hash(path)].append(path)
+            for digest, same in groups.items():
+                keep = same[0]
+                if self.enabled and not dry_run:
+                    self.add(keep, digest=digest)
+                for duplicate in same[1:]:
+                    stats['duplicates'] += 1
+                    if dry_run:
+                        method = 'dry-run'
+                    else:
+                        method = link_file(keep, duplicate)
+                        if not method:
+                            continue
+                        if self.enabled:
+                            self.add(duplicate, digest=digest)
+                    stats['reclaimed'] += size
+                    stats['linked'].append({'path': duplicate, 'linked_to': keep, 'method': method})
+        return stats
+output_store = OutputStore()
+def _format_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="output_store", description="保存済みファイルの重複を検出してハードリンク/リフリンクに置き換える")
+    commands = parser.add_subparsers(dest='command', required=True)
+    scan = commands.add_parser('scan', help="ライブラリを走査して重複を解消")
+    scan.add_argument('root')
+    scan.add_argument('--dry-run', action='store_true', help="置き換えずに重複だけを表示")
+    scan.add_argument('--index-dir', help="インデックスの保存先（省略時はアプリのdataフォルダ）")
+    args = parser.parse_args(argv)
+    store = OutputStore(args.index_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    stats = store.scan(args.root, dry_run=args.dry_run)
+    for link in stats['linked']:
+        print(f"🔗 {link['path']} → {link['linked_to']} ({link['method']})")
+    print(f"📊 {stats['files']}件を走査 / 重複 {stats['duplicates']}件 / "
+          f"{'回収可能' if args.dry_run else '回収'}: {_format_size(stats['reclaimed'])}")
+    return 0
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import yt_dlp
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.postprocessor.embedthumbnail import EmbedThumbnailPP
+from yt_dlp.postprocessor.ffmpeg import (
+    FFmpegMergerPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
+    FFmpegThumbnailsConvertorPP,
+)
+from yt_dlp.utils import ISO639Utils, prepend_extension, replace_extension
+from admission import AdmissionController
+from staging import StagingArea
+class AdmissionPP(PostProcessor):
+    def __init__(self, downloader, controller: AdmissionController, job_prefix: str,
+                 work_path: str, output_path: str, postprocess_passes: int = 0,
+                 cancel_check: Optional[Callable[[], bool]] = None,
+                 on_hold: Optional[Callable[[str], None]] = None):
+        super().__init__(downloader)
+        self.controller = controller
+        self.job_prefix = job_prefix
+        self.work_path = work_path
+        self.output_path = output_path
+        self.postprocess_passes = postprocess_passes
+        self.cancel_check = cancel_check
+        self.on_hold = on_hold
+    def job_id(self, info: Dict[str, Any]) -> str:
+        return f"{self.job_prefix}:{info.get('id')}"
+    def run(self, info: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+        final_size, peak_size = self.controller.estimate_size(info, self.postprocess_passes)
+        self.controller.reserve(
+            self.job_id(info),
+            [(self.work_path, peak_size), (self.output_path, final_size)],
+            cancel_check=self.cancel_check,
+            on_hold=self.on_hold,
+        )
+        return [], info
+class PublishPP(PostProcessor):
+    def __init__(self, downloader, staging: Optional[StagingArea] = None,
+                 admission: Optional[AdmissionPP] = None,
+                 on_published: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        super().__init__(downloader)
+        self.staging = staging
+        self.admission = admission
+        self.on_published = on_published
+    def run(self, info: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+        on_published = None
+        if self.on_published:
+            published = dict(info)
+            on_published = lambda path: self.on_published(path, published)
+        future = self.staging.publish(info['filepath'], on_published) if self.staging else None
+        if on_published and not self.staging:
+            on_published(info['filepath'])
+        if self.admission:
+            job_id = self.admission.job_id(info)
+            if future:
+                future.add_done_callback(lambda _: self.admission.controller.release(job_id))
+            else:
+                self.admission.controller.release(job_id)
+        return [], info
+INLINE_METADATA = all(hasattr(FFmpegMetadataPP, name)
+                      for name in ('_get_metadata_opts', '_get_chapter_opts', '_fixup_chapters'))
+class SinglePassEmbedPP(FFmpegPostProcessor):
+    SUBTITLE_EXTS = ('mp4', 'mov', 'm4a', 'webm', 'mkv', 'mka')
+    MP4_EXTS = ('mp4', 'm4a', 'm4v', 'mov')
+    MUTAGEN_EXTS = ('ogg', 'opus', 'flac')
+    def __init__(self, downloader, target_ext: str, metadata: bool = False, subtitles: bool = False,
+                 thumbnail: bool = False, keep_thumbnail: bool = True, keep_subtitles: bool = True):
+        super().__init__(downloader)
+        self.target_ext = target_ext
+        self.metadata = metadata
+        self.subtitles = subtitles
+        self.thumbnail = thumbnail
+        self.keep_thumbnail = keep_thumbnail
+        self.keep_subtitles = keep_subtitles
+    def can_absorb_merge(self, info: Dict[str, Any]) -> bool:
+        return bool(info.get('__files_to_merge')) and info.get('ext') == self.target_ext
+    @PostProcessor._restrict_to(images=False)
+    def run(self, info: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+        if info.pop('__ytgrab_single_pass_done', False):
+            return [], info
+        filename = info['filepath']
+        ext = info['ext']
+        merge_files = info.get('__files_to_merge') if info.pop('__ytgrab_merge', False) else None
+        inputs, options, files_to_delete = [], [], []
+        if merge_files:
+            inputs.extend(merge_files)
+            video_streams = 0
+            audio_streams = 0
+            for i, fmt in enumerate(info['requested_formats']):
+                if fmt.get('acodec') != 'none':
+                    options.extend(['-map', f'{i}:a:0'])
+                    if fmt['protocol'].startswith('m3u8') and self.get_audio_codec(fmt['filepath']) == 'aac':
+                        options.extend([f'-bsf:a:{audio_streams}', 'aac_adtstoasc'])
+                    audio_streams += 1
+                if fmt.get('vcodec') != 'none':
+                    options.extend(['-map', f'{i}:v:0'])
+                    video_streams += 1
+            files_to_delete.extend(merge_files)
+        else:
+            inputs.append(filename)
+            options.extend(['-map', '0', '-dn', '-ignore_unknown'])
+            video_streams = None
+        options.extend(['-c', 'copy'])
+        if ext in self.MP4_EXTS:
+            options.extend(['-c:s', 'mov_text'])
+        delegate_thumbnail = False
+        if self.subtitles:
+            self._add_subtitles(info, inputs, options, files_to_delete)
+        if self.thumbnail:
+            if ext in self.MUTAGEN_EXTS:
+                delegate_thumbnail = True
+            elif video_streams is None and ext in ('mp3', *self.MP4_EXTS):
+                video_streams = sum(
+                    1 for stream in self.get_metadata_object(filename).get('streams', [])
+                    if stream.get('codec_type') == 'video')
+            if not delegate_thumbnail:
+                self._add_thumbnail(info, inputs, options, files_to_delete, video_streams)
+        inline_metadata = self.metadata and INLINE_METADATA
+        if inline_metadata:
+            self._add_metadata(info, inputs, options, files_to_delete)
+        if len(inputs) > 1 or inline_metadata or merge_files:
+            temp_filename = prepend_extension(filename, 'temp')
+            self.to_screen(f'Processing "{filename}" in a single ffmpeg pass')
+            self.run_ffmpeg_multiple_files(inputs, temp_filename, options)
+            os.replace(temp_filename, filename)
+        if merge_files:
+            info['__ytgrab_single_pass_done'] = True
+        if self.metadata and not inline_metadata:
+            metadata_files, info = FFmpegMetadataPP(self._downloader, add_infojson=False).run(info)
+            files_to_delete.extend(metadata_files)
+        if delegate_thumbnail:
+            embed = EmbedThumbnailPP(self._downloader, already_have_thumbnail=self.keep_thumbnail)
+            thumbnail_files, info = embed.run(info)
+            files_to_delete.extend(thumbnail_files)
+        return files_to_delete, info
+    def _add_metadata(self, info: Dict[str, Any], inputs: List[str], options: List[str],
+                      files_to_delete: List[str]) -> None:
+        metadata_pp = FFmpegMetadataPP(self._downloader, add_infojson=False)
+        chapters = info.get('chapters')
+        if chapters and chapters[-1].get('end_time') is None and info.get('duration'):
+            chapters[-1]['end_time'] = info['duration']
+        if chapters and os.path.exists(info['filepath']):
+            metadata_pp._fixup_chapters(info)
+        if chapters:
+            metadata_filename = replace_extension(info['filepath'], 'meta')
+            list(metadata_pp._get_chapter_opts(info['chapters'], metadata_filename))
+            options.extend(['-map_metadata', str(len(inputs)), '-map_chapters', str(len(inputs))])
+            inputs.append(metadata_filename)
+            files_to_delete.append(metadata_filename)
+        for opts in metadata_pp._get_metadata_opts(info):
+            options.extend(opts)
+    def _add_subtitles(self, info: Dict[str, Any], inputs: List[str], options: List[str],
+                       files_to_delete: List[str]) -> None:
+        ext = info['ext']
+        if ext not in self.SUBTITLE_EXTS:
+            return
+        index = 0
+        for lang, sub_info in (info.get('requested_subtitles') or {}).items():
+            sub_path = sub_info.get('filepath')
+            if not sub_path or not os.path.exists(sub_path):
+                continue
+            if sub_info.get('ext') == 'json' or (ext == 'webm' and sub_info.get('ext') != 'vtt'):
+                self.report_warning(f'{lang} の字幕は {ext} に埋め込めないためスキップします')
+                continue
+            if index == 0 and len(inputs) == 1:
+                options.extend(['-map', '-0:s'])
+            options.extend(['-map', f'{len(inputs)}:0'])
+            options.extend([f'-metadata:s:s:{index}', f'language={ISO639Utils.short2long(lang) or lang}'])
+            if sub_info.get('name'):
+                options.extend([f'-metadata:s:s:{index}', f"title={sub_info['name']}"])
+            inputs.append(sub_path)
+            if not self.keep_subtitles:
+                files_to_delete.append(sub_path)
+            index += 1
+    def _add_thumbnail(self, info: Dict[str, Any], inputs: List[str], options: List[str],
+                       files_to_delete: List[str], video_streams: Optional[int]) -> None:
+        ext = info['ext']
+        thumbnail_path = next((
+            t['filepath'] for t in reversed(info.get('thumbnails') or [])
+            if t.get('filepath') and os.path.exists(t['filepath'])), None)
+        if not thumbnail_path:
+            return
+        if ext not in ('mp3', 'mkv', 'mka', *self.MP4_EXTS):
+            self.report_warning(f'{ext} にはサムネイルを埋め込めないためスキップします')
+            return
+        if not self.keep_thumbnail:
+            files_to_delete.append(thumbnail_path)
+        thumbnail_ext = os.path.splitext(thumbnail_path)[1][1:].lower()
+        if ext in ('mkv', 'mka'):
+            mimetype = f"image/{thumbnail_ext.replace('jpg', 'jpeg')}"
+            options.extend([
+                '-attach', self._ffmpeg_filename_argument(thumbnail_path),
+                '-metadata:s:t', f'mimetype={mimetype}',
+                '-metadata:s:t', f'filename=cover.{thumbnail_ext}'])
+            return
+        if thumbnail_ext not in ('jpg', 'jpeg', 'png'):
+            thumbnail_path = FFmpegThumbnailsConvertorPP(self._downloader).convert_thumbnail(thumbnail_path, 'png')
+            files_to_delete.append(thumbnail_path)
+        options.extend(['-map', f'{len(inputs)}:0', f'-disposition:v:{video_streams or 0}', 'attached_pic'])
+        if ext == 'mp3':
+            options.extend([
+                '-id3v2_version', '3',
+                '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)'])
+        inputs.append(thumbnail_path)
+class SinglePassYoutubeDL(yt_dlp.YoutubeDL):
+    single_pass: Optional[SinglePassEmbedPP] = None
+    def post_process(self, filename, info, files_to_move=None):
+        pps = info.get('__postprocessors') or []
+        if (self.single_pass and len(pps) == 1 and isinstance(pps[0], FFmpegMergerPP)
+                and self.single_pass.can_absorb_merge(info)):
+            info['__postprocessors'] = [self.single_pass]
+            info['__ytgrab_merge'] = True
+        return super().post_process(filename, info, files_to_move)
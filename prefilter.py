@@ -0,0 +1,92 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Optional
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import match_filter_func, match_str
+SAMPLE_INFO = {
+    'id': 'sample',
+    'title': 'sample',
+    'description': '',
+    'uploader': 'sample',
+    'channel': 'sample',
+    'duration': 60,
+    'upload_date': '20240101',
+    'release_date': '20240101',
+    'timestamp': 1704067200,
+    'view_count': 1,
+    'like_count': 1,
+    'comment_count': 1,
+    'age_limit': 0,
+    'width': 1920,
+    'height': 1080,
+    'is_live': False,
+    'was_live': False,
+    'live_status': 'not_live',
+    'availability': 'public',
+    'tags': [],
+    'categories': [],
+}
+INFO_FIELDS = {
+    'display_id', 'fulltitle', 'alt_title', 'webpage_url', 'original_url', 'webpage_url_domain', 'webpage_url_basename',
+    'extractor', 'extractor_key', 'uploader_id', 'uploader_url', 'channel_id', 'channel_url', 'channel_follower_count',
+    'channel_is_verified', 'creator', 'creators', 'artist', 'artists', 'album', 'album_artist', 'track', 'genre', 'genres',
+    'composer', 'location', 'license', 'series', 'season', 'episode', 'chapter', 'modified_date', 'modified_timestamp',
+    'playlist', 'playlist_id', 'playlist_title', 'playlist_index', 'playlist_count', 'playlist_uploader',
+    'playlist_uploader_id', 'n_entries', 'concurrent_view_count', 'media_type', 'playable_in_embed', 'is_private',
+    'automatic_captions', 'subtitles', 'chapters', 'heatmap', 'thumbnail', 'thumbnails',
+}
+KNOWN_FIELDS = (set(SAMPLE_INFO) | INFO_FIELDS | set(getattr(YoutubeDL, '_NUMERIC_FIELDS', ()))
+                | set(getattr(YoutubeDL, '_format_fields', ())))
+FIELD_PATTERN = re.compile(r'\s*!?\s*([a-z_]+)')
+def compile_filter(expression: Optional[str]) -> Optional[Callable]:
+    expression = (expression or '').strip()
+    if not expression:
+        return None
+    alternatives = [line.strip() for line in expression.splitlines() if line.strip()]
+    try:
+        for part in (part for alternative in alternatives for part in re.split(r'(?<!\\)&', alternative)):
+            match_str(part, dict(SAMPLE_INFO))
+            field = FIELD_PATTERN.match(part).group(1)
+            if field not in KNOWN_FIELDS:
+                raise ValueError(f"不明なフィールドです: {field}")
+    except Exception as e:
+        raise ValueError(f"フィルター式が正しくありません: {e}")
+    return match_filter_func(alternatives)
+class FilterCounter:
+    def __init__(self, expression: Optional[str],
+                 on_skip: Optional[Callable[[Dict[str, Any], str], None]] = None):
+        self.expression = expression
+        self.match = compile_filter(expression)
+        self.on_skip = on_skip
+        self._flat = set()
+        self._full = set()
+        self._lock = threading.Lock()
+    @property
+    def flat(self) -> int:
+        return len(self._flat)
+    @property
+    def full(self) -> int:
+        return len(self._full - self._flat)
+    @property
+    def skipped(self) -> int:
+        return len(self._flat | self._full)
+    def __call__(self, info, incomplete: bool = False) -> Optional[str]:
+        if self.match is None or info.get('_type') in ('playlist', 'multi_video'):
+            return None
+        try:
+            reason = self.match(info, incomplete=incomplete)
+        except (TypeError, ValueError) as e:
+            reason = f"{info.get('title') or info.get('id')}: フィルターを評価できません ({e})"
+        if not isinstance(reason, str):
+            return reason
+        key = info.get('id') or info.get('url') or info.get('title')
+        if incomplete is not True:
+            info['ytgrab_filtered'] = reason
+        with self._lock:
+            seen = key in self._flat or key in self._full
+            (self._flat if incomplete is True else self._full).add(key)
+        if self.on_skip and not seen:
+            self.on_skip(info, reason)
+        return reason
+    def summary(self) -> Dict[str, int]:
+        return {'skipped': self.skipped, 'flat': self.flat, 'full': self.full}
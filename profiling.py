@@ -0,0 +1,153 @@
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, Optional
+PROFILE_ENV = "YTGRAB_PROFILE"
+MODES = frozenset({'cpu', 'memory', 'sample'})
+_ALL = ('1', 'true', 'yes', 'on', 'all')
+_active = threading.Lock()
+def parse_modes(value: Any) -> FrozenSet[str]:
+    if not value:
+        return frozenset()
+    if value is True:
+        return MODES
+    words = {word.strip().lower() for word in str(value).split(',') if word.strip()}
+    if words & set(_ALL):
+        return MODES
+    return frozenset(words & MODES)
+def profile_modes(options: Optional[Dict[str, Any]] = None) -> FrozenSet[str]:
+    value = (options or {}).get('profile') or os.environ.get(PROFILE_ENV)
+    return parse_modes(value)
+def job_profiler(options: Optional[Dict[str, Any]], label: str, report_dir: str,
+                 on_report: Optional[Callable[[Dict[str, Any]], None]] = None):
+    modes = profile_modes(options)
+    if not modes or not _active.acquire(blocking=False):
+        return contextlib.nullcontext()
+    return JobProfiler(modes, label, report_dir, on_report)
+class StackSampler:
+    INTERVAL = 0.01
+    def __init__(self, interval: float = INTERVAL, include_main: bool = True):
+        self.interval = interval
+        self.include_main = include_main
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ytgrab-sampler", daemon=True)
+    def start(self) -> None:
+        self._thread.start()
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+    def _run(self) -> None:
+        skip = {threading.get_ident()}
+        if not self.include_main:
+            skip.add(threading.main_thread().ident)
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident in skip:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+    def top_frame(self) -> Optional[str]:
+        leaves: Counter = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(1)[0][0] if leaves else None
+class JobProfiler:
+    TOP_ENTRIES = 40
+    TRACEMALLOC_FRAMES = 25
+    def __init__(self, modes: FrozenSet[str], label: str, report_dir: str,
+                 on_report: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.modes = modes
+        self.report_dir = report_dir
+        self.on_report = on_report
+        safe_label = re.sub(r'[^A-Za-z0-9_-]', '_', label)
+        self.stem = os.path.join(report_dir, f"ytgrab-profile-{safe_label}-{datetime.now():%Y%m%d-%H%M%S}")
+        self.profile: Optional[cProfile.Profile] = None
+        self.sampler: Optional[StackSampler] = None
+        self.report: Dict[str, Any] = {}
+        self._started_tracemalloc = False
+        self._started_at = 0.0
+    def __enter__(self) -> "JobProfiler":
+        self._started_at = time.perf_counter()
+        if 'memory' in self.modes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+        if 'sample' in self.modes:
+            self.sampler = StackSampler(include_main=threading.current_thread() is threading.main_thread())
+            self.sampler.start()
+        if 'cpu' in self.modes:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                self.profile = None
+        return self
+    def __exit__(self, *exc_info) -> None:
+        try:
+            if self.profile:
+                self.profile.disable()
+            if self.sampler:
+                self.sampler.stop()
+            snapshot = peak = None
+            if 'memory' in self.modes:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+            self._write_reports(snapshot, peak, time.perf_counter() - self._started_at)
+        finally:
+            _active.release()
+    def _write_reports(self, snapshot, peak: Optional[int], elapsed: float) -> None:
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+        except OSError:
+            return
+        files = []
+        parts = [f"{elapsed:.2f}s"]
+        if self.profile:
+            self.profile.dump_stats(f"{self.stem}.pstats")
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.sort_stats('cumulative').print_stats(self.TOP_ENTRIES)
+            with open(f"{self.stem}.cpu.txt", 'w', encoding='utf-8') as f:
+                f.write(stream.getvalue())
+            files += [f"{self.stem}.pstats", f"{self.stem}.cpu.txt"]
+            parts.append(f"CPU {stats.total_tt:.2f}s")
+        if snapshot is not None:
+            with open(f"{self.stem}.memory.txt", 'w', encoding='utf-8') as f:
+                f.write(f"peak: {peak / 1024 / 1024:.1f} MiB\n\n")
+                for stat in snapshot.statistics('lineno')[:self.TOP_ENTRIES]:
+                    f.write(f"{stat}\n")
+            files.append(f"{self.stem}.memory.txt")
+            parts.append(f"ピークメモリ {peak / 1024 / 1024:.1f} MiB")
+        if self.sampler:
+            self.sampler.write(f"{self.stem}.stacks.txt")
+            files.append(f"{self.stem}.stacks.txt")
+            top = self.sampler.top_frame()
+            parts.append(f"サンプル {self.sampler.sample_count}回" + (f" (最多: {top})" if top else ""))
+        self.report = {'summary': ' | '.join(parts), 'files': files, 'path': self.stem}
+        if self.on_report:
+            self.on_report(self.report)
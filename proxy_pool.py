@@ -0,0 +1,144 @@
+import contextlib
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from yt_dlp.networking.exceptions import HTTPError
+from retry import is_retryable
+PROXY_FAULT_STATUSES = (403, 407, 429)
+def parse_proxies(spec: Optional[str]) -> List[str]:
+    if not spec:
+        return []
+    return [proxy for proxy in re.split(r'[\s,;]+', spec.strip()) if proxy]
+def is_proxy_fault(error: BaseException) -> bool:
+    seen = set()
+    current = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, HTTPError) and current.status in PROXY_FAULT_STATUSES:
+            return True
+        exc_info = getattr(current, 'exc_info', None)
+        cause = exc_info[1] if exc_info and exc_info[1] is not current else None
+        current = cause or getattr(current, 'cause', None) or current.__cause__
+    return is_retryable(error)
+class ProxyStats:
+    ALPHA = 0.3
+    def __init__(self, url: str):
+        self.url = url
+        self.active = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None
+        self.throughput: Optional[float] = None
+        self.error_rate = 0.0
+        self.benched_until = 0.0
+    def _ewma(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None else previous + self.ALPHA * (value - previous)
+    def record(self, ok: bool, latency: Optional[float], throughput: Optional[float]) -> None:
+        if latency is not None:
+            self.latency = self._ewma(self.latency, latency)
+        if throughput:
+            self.throughput = self._ewma(self.throughput, throughput)
+        self.error_rate = self._ewma(self.error_rate, 0.0 if ok else 1.0)
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+    def snapshot(self, now: float) -> Dict[str, object]:
+        return {
+            'url': self.url,
+            'active': self.active,
+            'successes': self.successes,
+            'failures': self.failures,
+            'error_rate': round(self.error_rate, 3),
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'throughput': round(self.throughput) if self.throughput else None,
+            'benched_for': round(max(0.0, self.benched_until - now), 1),
+        }
+class ProxyLease:
+    def __init__(self, stats: Optional[ProxyStats]):
+        self.stats = stats
+        self.url = stats.url if stats else None
+        self.started_at = time.monotonic()
+        self.first_byte_at: Optional[float] = None
+        self.bytes = 0
+        self.download_seconds = 0.0
+    def mark_first_byte(self) -> None:
+        if self.first_byte_at is None:
+            self.first_byte_at = time.monotonic()
+    def add_transfer(self, size: int, seconds: float) -> None:
+        self.bytes += size
+        self.download_seconds += seconds
+    def latency(self) -> float:
+        return (self.first_byte_at or time.monotonic()) - self.started_at
+    def throughput(self) -> Optional[float]:
+        if self.bytes and self.download_seconds > 0:
+            return self.bytes / self.download_seconds
+        return None
+class ProxyPool:
+    BENCH_SECONDS = 60.0
+    MAX_BENCH_SECONDS = 30 * 60.0
+    FAILURES_TO_BENCH = 2
+    def __init__(self, proxies: List[str]):
+        self._proxies = [ProxyStats(url) for url in dict.fromkeys(proxies)]
+        self._lock = threading.Lock()
+    def __len__(self) -> int:
+        return len(self._proxies)
+    def _cost(self, stats: ProxyStats, typical_latency: float) -> float:
+        latency = stats.latency if stats.latency is not None else typical_latency
+        return (stats.active + 1) * (1 + 4 * stats.error_rate) * max(latency, 0.05)
+    def acquire(self) -> ProxyStats:
+        now = time.monotonic()
+        with self._lock:
+            ready = [p for p in self._proxies if p.benched_until <= now]
+            if not ready:
+                ready = [min(self._proxies, key=lambda p: p.benched_until)]
+            latencies = sorted(p.latency for p in self._proxies if p.latency is not None)
+            typical = latencies[len(latencies) // 2] if latencies else 1.0
+            chosen = min(ready, key=lambda p: self._cost(p, typical))
+            chosen.active += 1
+            return chosen
+    def release(self, lease: ProxyLease, ok: Optional[bool]) -> None:
+        stats = lease.stats
+        with self._lock:
+            stats.active -= 1
+            if ok is None:
+                return
+            stats.record(ok, lease.latency() if ok or lease.first_byte_at else None, lease.throughput())
+            if not ok and stats.consecutive_failures >= self.FAILURES_TO_BENCH:
+                bench = min(self.MAX_BENCH_SECONDS,
+                            self.BENCH_SECONDS * 2 ** (stats.consecutive_failures - self.FAILURES_TO_BENCH))
+                stats.benched_until = time.monotonic() + bench
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[ProxyLease]:
+        lease = ProxyLease(self.acquire())
+        try:
+            yield lease
+        except BaseException as e:
+            self.release(lease, False if isinstance(e, Exception) and is_proxy_fault(e) else None)
+            raise
+        else:
+            self.release(lease, True)
+    def snapshot(self) -> List[Dict[str, object]]:
+        now = time.monotonic()
+        with self._lock:
+            return [p.snapshot(now) for p in self._proxies]
+_pools: Dict[tuple, ProxyPool] = {}
+_pools_lock = threading.Lock()
+def get_pool(spec: Optional[str]) -> Optional[ProxyPool]:
+    proxies = parse_proxies(spec)
+    if not proxies:
+        return None
+    key = tuple(proxies)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ProxyPool(proxies)
+        return _pools[key]
+def proxy_lease(spec: Optional[str]):
+    pool = get_pool(spec)
+    if pool is None:
+        return contextlib.nullcontext(ProxyLease(None))
+    return pool.lease()
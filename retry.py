@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import ContentTooShortError
+RETRYABLE_HTTP_STATUSES = (408, 429, 500, 502, 503, 504)
+def is_retryable(error: BaseException) -> bool:
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, HTTPError):
+            return error.status in RETRYABLE_HTTP_STATUSES
+        if isinstance(error, (TransportError, ContentTooShortError)):
+            return True
+        exc_info = getattr(error, 'exc_info', None)
+        cause = exc_info[1] if exc_info and exc_info[1] is not error else None
+        error = cause or getattr(error, 'cause', None) or error.__cause__
+    return False
+class RetryPolicy:
+    def __init__(self, base_delay: float = 2.0, factor: float = 2.0, max_delay: float = 120.0,
+                 jitter: float = 0.5, max_attempts: int = 4, fragment_retries: int = 10):
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.fragment_retries = fragment_retries
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * self.factor ** max(attempt - 1, 0))
+        return random.uniform(delay * (1 - self.jitter), delay)
+    def sleep_functions(self) -> Dict[str, Callable[[int], float]]:
+        return {
+            'http': self.delay,
+            'fragment': self.delay,
+            'extractor': self.delay,
+        }
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+    def retry_after(self, now: float) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        remaining = self.opened_at + self.cooldown - now
+        if remaining <= 0:
+            self.state = self.HALF_OPEN
+            return 0.0
+        return remaining
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = now
+class CircuitBreakerRegistry:
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    def _get(self, host: str) -> CircuitBreaker:
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return self._breakers[host]
+    def retry_after(self, hosts: Iterable[str]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            return max([self._get(host).retry_after(now) for host in hosts if host] or [0.0])
+    def record_success(self, hosts: Iterable[str]) -> None:
+        with self._lock:
+            for host in hosts:
+                if host:
+                    self._get(host).record_success()
+    def record_failure(self, hosts: Iterable[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for host in hosts:
+                if host:
+                    self._get(host).record_failure(now)
+    def open_hosts(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            return [host for host, breaker in self._breakers.items() if breaker.retry_after(now) > 0]
+host_breakers = CircuitBreakerRegistry()
+class RetryDeferred(Exception):
+    def __init__(self, retry_after: float, hosts: List[str]):
+        super().__init__(f"ホストが一時停止中です: {', '.join(hosts)} ({retry_after:.0f}秒後に再試行)")
+        self.retry_after = retry_after
+        self.hosts = hosts
+class RetryScheduler:
+    MAX_INLINE_WAIT = 30.0
+    def __init__(self, policy: Optional[RetryPolicy] = None,
+                 breakers: CircuitBreakerRegistry = host_breakers):
+        self.policy = policy or RetryPolicy()
+        self.breakers = breakers
+    def run(self, attempt: Callable[[], Dict], hosts: Callable[[], List[str]],
+            cancel_check: Callable[[], bool],
+            on_wait: Optional[Callable[[float, str], None]] = None) -> Dict:
+        attempt_number = 0
+        while True:
+            attempt_number += 1
+            self._wait_for_hosts(hosts(), cancel_check, on_wait)
+            try:
+                result = attempt()
+            except Exception as e:
+                if cancel_check() or not is_retryable(e):
+                    raise
+                self.breakers.record_failure(hosts())
+                if attempt_number >= self.policy.max_attempts:
+                    raise
+                delay = self.policy.delay(attempt_number)
+                if on_wait:
+                    on_wait(delay, str(e))
+                self._sleep(delay, cancel_check)
+                continue
+            self.breakers.record_success(hosts())
+            return result
+    def _wait_for_hosts(self, hosts: List[str], cancel_check: Callable[[], bool],
+                        on_wait: Optional[Callable[[float, str], None]]) -> None:
+        retry_after = self.breakers.retry_after(hosts)
+        if retry_after <= 0:
+            return
+        if retry_after > self.MAX_INLINE_WAIT:
+            raise RetryDeferred(retry_after, [h for h in hosts if h in self.breakers.open_hosts()])
+        if on_wait:
+            on_wait(retry_after, "ホストが一時停止中です")
+        self._sleep(retry_after, cancel_check)
+    def _sleep(self, seconds: float, cancel_check: Callable[[], bool]) -> None:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if cancel_check():
+                raise Exception("ダウンロードがキャンセルされました")
+            time.sleep(max(0.0, min(0.5, deadline - time.monotonic())))
@@ -0,0 +1,128 @@
+import getpass
+import os
+import secrets
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+from typing import Callable, List, Optional
+APP_ID = "ytgrab"
+CONNECT_TIMEOUT = 2.0
+def _user() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:
+        return str(os.getpid())
+def _runtime_dir() -> str:
+    return os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+def instance_address() -> str:
+    if sys.platform == 'win32':
+        return rf"\\.\pipe\{APP_ID}-{_user()}"
+    return os.path.join(_runtime_dir(), f"{APP_ID}-{_user()}.sock")
+def instance_family() -> str:
+    return 'AF_PIPE' if sys.platform == 'win32' else 'AF_UNIX'
+def _key_path() -> str:
+    return os.path.join(_runtime_dir(), f"{APP_ID}-{_user()}.key")
+def _read_key() -> Optional[bytes]:
+    try:
+        with open(_key_path(), 'rb') as f:
+            return f.read() or None
+    except OSError:
+        return None
+def _write_key() -> bytes:
+    key = secrets.token_bytes(32)
+    path = _key_path()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    os.replace(temp_path, path)
+    return key
+def hand_off(urls: List[str], timeout: float = CONNECT_TIMEOUT) -> bool:
+    authkey = _read_key()
+    if authkey is None:
+        return False
+    if sys.platform != 'win32' and not os.path.exists(instance_address()):
+        return False
+    result: List[bool] = []
+    def send() -> None:
+        try:
+            with Client(instance_address(), family=instance_family(), authkey=authkey) as conn:
+                conn.send({'command': 'open', 'urls': urls})
+                if conn.poll(timeout):
+                    result.append(conn.recv() == 'ok')
+        except Exception:
+            pass
+    thread = threading.Thread(target=send, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return bool(result and result[0])
+class InstanceServer:
+    def __init__(self, on_urls: Optional[Callable[[List[str]], None]] = None):
+        self.on_urls = on_urls
+        self._backlog: List[List[str]] = []
+        self._lock = threading.Lock()
+        self.address = instance_address()
+        self._listener: Optional[Listener] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+    def start(self) -> bool:
+        if hand_off([]):
+            return False
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.remove(self.address)
+        authkey = _write_key()
+        try:
+            self._listener = Listener(self.address, family=instance_family(), authkey=authkey)
+        except OSError:
+            return False
+        if sys.platform != 'win32':
+            os.chmod(self.address, 0o600)
+        self._thread = threading.Thread(target=self._serve, name="ytgrab-instance", daemon=True)
+        self._thread.start()
+        return True
+    def set_handler(self, on_urls: Callable[[List[str]], None]) -> None:
+        with self._lock:
+            self.on_urls = on_urls
+            backlog, self._backlog = self._backlog, []
+        for urls in backlog:
+            on_urls(urls)
+    def _dispatch(self, urls: List[str]) -> None:
+        with self._lock:
+            if self.on_urls is None:
+                self._backlog.append(urls)
+                return
+            on_urls = self.on_urls
+        on_urls(urls)
+    def _serve(self) -> None:
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._closed:
+                    return
+                continue
+            try:
+                message = conn.recv()
+                if isinstance(message, dict) and message.get('command') == 'open':
+                    urls = [url for url in message.get('urls') or [] if isinstance(url, str)]
+                    self._dispatch(urls)
+                    conn.send('ok')
+            except Exception:
+                pass
+            finally:
+                conn.close()
+    def close(self) -> None:
+        self._closed = True
+        if self._listener:
+            try:
+                self._listener.close()
+            except Exception:
+                pass
+            self._listener = None
+        if sys.platform != 'win32':
+            for path in (self.address, _key_path()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
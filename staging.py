@@ -0,0 +1,112 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+_publish_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ytgrab-publish")
+class StagingArea:
+    COPY_CHUNK_SIZE = 4 * 1024 * 1024
+    INCOMPLETE_SUFFIXES = (".part", ".ytdl", ".temp", ".tmp")
+    def __init__(self, staging_root: str, output_root: str):
+        os.makedirs(staging_root, exist_ok=True)
+        os.makedirs(output_root, exist_ok=True)
+        self.output_root = output_root
+        self.job_dir = tempfile.mkdtemp(prefix="job-", dir=os.path.abspath(staging_root))
+        self.published: Dict[str, str] = {}
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+    def final_path(self, staged_path: str) -> str:
+        staged_path = os.path.abspath(staged_path)
+        with self._lock:
+            if staged_path in self.published:
+                return self.published[staged_path]
+        return os.path.join(self.output_root, os.path.relpath(staged_path, self.job_dir))
+    def publish(self, staged_path: str, on_published: Optional[Callable[[str], None]] = None) -> Optional[Future]:
+        staged_path = os.path.abspath(staged_path)
+        with self._lock:
+            if staged_path in self.published or not os.path.isfile(staged_path):
+                return None
+            final_path = os.path.join(self.output_root, os.path.relpath(staged_path, self.job_dir))
+            self.published[staged_path] = final_path
+        if self._same_filesystem(staged_path, final_path):
+            future = Future()
+            try:
+                os.replace(staged_path, final_path)
+                if on_published:
+                    on_published(final_path)
+                future.set_result(final_path)
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = _publish_executor.submit(self._copy_verified, staged_path, final_path, on_published)
+        with self._lock:
+            self._futures.append(future)
+        return future
+    def publish_remaining(self) -> None:
+        for dirpath, _, filenames in os.walk(self.job_dir):
+            for filename in filenames:
+                if filename.endswith(self.INCOMPLETE_SUFFIXES):
+                    continue
+                self.publish(os.path.join(dirpath, filename))
+    def wait(self) -> None:
+        with self._lock:
+            futures = list(self._futures)
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(str(e))
+        if errors:
+            raise Exception(f"ファイルの公開に失敗しました: {'; '.join(errors)}")
+    def cleanup(self) -> None:
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+    def _same_filesystem(self, staged_path: str, final_path: str) -> bool:
+        dest_dir = os.path.dirname(final_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        try:
+            return os.stat(staged_path).st_dev == os.stat(dest_dir).st_dev
+        except OSError:
+            return False
+    def _copy_verified(self, staged_path: str, final_path: str,
+                       on_published: Optional[Callable[[str], None]] = None) -> str:
+        dest_dir = os.path.dirname(final_path)
+        temp_path = os.path.join(dest_dir, f".{os.path.basename(final_path)}.{uuid.uuid4().hex[:8]}.tmp")
+        source_hash = hashlib.sha256()
+        try:
+            with open(staged_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(self.COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    source_hash.update(chunk)
+                    dst.write(chunk)
+                dst.flush()
+                os.fsync(dst.fileno())
+            if os.path.getsize(temp_path) != os.path.getsize(staged_path):
+                raise Exception(f"サイズが一致しません: {final_path}")
+            copy_hash = hashlib.sha256()
+            with open(temp_path, 'rb') as f:
+                while True:
+                    chunk = f.read(self.COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    copy_hash.update(chunk)
+            if copy_hash.digest() != source_hash.digest():
+                raise Exception(f"ハッシュが一致しません: {final_path}")
+            shutil.copystat(staged_path, temp_path)
+            os.replace(temp_path, final_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.remove(staged_path)
+        if on_published:
+            on_published(final_path)
+        return final_path
@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+import yt_dlp
+from cookies import cookie_cache
+from proxy_pool import proxy_lease
+class SubtitleHarvester:
+    MAX_WORKERS = 8
+    INDEX_FILE = "subtitles_index.json"
+    def __init__(self, options: Dict[str, Any],
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_check: Optional[Callable[[], bool]] = None):
+        self.options = options
+        self.progress_callback = progress_callback
+        self.cancel_check = cancel_check or (lambda: False)
+        self.download_path = options.get('download_path', '.')
+        self.index_path = os.path.join(self.download_path, self.INDEX_FILE)
+        self._local = threading.local()
+        self._clients: List[yt_dlp.YoutubeDL] = []
+        self._lock = threading.Lock()
+    def list_videos(self, url: str) -> Dict[str, Any]:
+        listing_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'noplaylist': not self.options.get('playlist_mode', False),
+        }
+        if self.options.get('playlist_items'):
+            listing_opts['playlist_items'] = self.options.get('playlist_items')
+        else:
+            if self.options.get('playlist_start'):
+                listing_opts['playliststart'] = self.options.get('playlist_start')
+            if self.options.get('playlist_end'):
+                listing_opts['playlistend'] = self.options.get('playlist_end')
+        if self.options.get('cookies_from_browser') and self.options.get('cookies_from_browser') != 'なし':
+            listing_opts['cookiesfrombrowser'] = (self.options.get('cookies_from_browser'),)
+        with proxy_lease(self.options.get('proxy')) as lease:
+            if lease.url:
+                listing_opts['proxy'] = lease.url
+            with cookie_cache.attach(yt_dlp.YoutubeDL(listing_opts)) as ydl:
+                info = ydl.extract_info(url, download=False)
+        if 'entries' not in info:
+            return {'title': info.get('title', 'Unknown'), 'urls': [info.get('webpage_url') or url]}
+        urls = []
+        for entry in info['entries']:
+            if entry and (entry.get('url') or entry.get('webpage_url')):
+                urls.append(entry.get('webpage_url') or entry.get('url'))
+        return {'title': info.get('title', 'Unknown Playlist'), 'urls': urls}
+    def _ydl_options(self, proxy: Optional[str]) -> Dict[str, Any]:
+        ydl_opts = {
+            'outtmpl': os.path.join(self.download_path, self.options.get('filename_template', '%(title)s.%(ext)s')),
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            'ignore_no_formats_error': True,
+            'noplaylist': True,
+            'writesubtitles': True,
+            'writeautomaticsub': self.options.get('auto_subtitles', False),
+            'subtitleslangs': self.options.get('subtitle_languages', ['ja', 'en']),
+        }
+        if self.options.get('restrict_filenames'):
+            ydl_opts['restrictfilenames'] = True
+        if self.options.get('cookies_from_browser') and self.options.get('cookies_from_browser') != 'なし':
+            ydl_opts['cookiesfrombrowser'] = (self.options.get('cookies_from_browser'),)
+        if proxy:
+            ydl_opts['proxy'] = proxy
+        convert_subs = self.options.get('convert_subs')
+        if convert_subs and convert_subs != 'なし':
+            ydl_opts['postprocessors'] = [{
+                'key': 'FFmpegSubtitlesConvertor',
+                'format': convert_subs,
+                'when': 'before_dl',
+            }]
+        return ydl_opts
+    def _client(self, proxy: Optional[str]) -> yt_dlp.YoutubeDL:
+        if not hasattr(self._local, 'clients'):
+            self._local.clients = {}
+        ydl = self._local.clients.get(proxy)
+        if ydl is None:
+            ydl = cookie_cache.attach(yt_dlp.YoutubeDL(self._ydl_options(proxy)))
+            self._local.clients[proxy] = ydl
+            with self._lock:
+                self._clients.append(ydl)
+        return ydl
+    def _harvest_one(self, url: str) -> Dict[str, Any]:
+        if self.cancel_check():
+            raise Exception("ダウンロードがキャンセルされました")
+        with proxy_lease(self.options.get('proxy')) as lease:
+            info = self._client(lease.url).extract_info(url, download=True)
+        manual = info.get('subtitles') or {}
+        subtitles = {}
+        for lang, sub in (info.get('requested_subtitles') or {}).items():
+            if sub.get('filepath') and os.path.exists(sub['filepath']):
+                subtitles[lang] = {
+                    'title': info.get('title', 'Unknown'),
+                    'path': sub['filepath'],
+                    'ext': sub.get('ext'),
+                    'automatic': lang not in manual,
+                }
+        return {'id': info.get('id'), 'subtitles': subtitles}
+    def harvest(self, url: str) -> Dict[str, Any]:
+        listing = self.list_videos(url)
+        urls = listing['urls']
+        workers = max(1, min(int(self.options.get('subtitle_workers') or self.MAX_WORKERS), len(urls) or 1))
+        index = self._load_index()
+        files, errors = [], []
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ytgrab-subs") as executor:
+                futures = {executor.submit(self._harvest_one, video_url): video_url for video_url in urls}
+                for done, future in enumerate(as_completed(futures), 1):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(f"{futures[future]}: {e}")
+                    else:
+                        if result['subtitles']:
+                            index[result['id']] = result['subtitles']
+                            files.extend(sub['path'] for sub in result['subtitles'].values())
+                    self._report(done, len(urls))
+                    if self.cancel_check():
+                        for pending in futures:
+                            pending.cancel()
+        finally:
+            for ydl in self._clients:
+                ydl.close()
+            self._save_index(index)
+        if self.cancel_check():
+            raise Exception("ダウンロードがキャンセルされました")
+        return {
+            'success': True,
+            'type': 'subtitles',
+            'title': listing['title'],
+            'files': files,
+            'errors': errors,
+            'video_count': len(urls),
+            'index_path': self.index_path,
+        }
+    def _report(self, done: int, total: int) -> None:
+        if self.progress_callback:
+            self.progress_callback({
+                'status': 'downloading',
+                'percent': done / total * 100 if total else 100,
+                'downloaded': done,
+                'total': total,
+                'speed': 0,
+                'eta': 0
+            })
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    def _save_index(self, index: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(self.download_path, exist_ok=True)
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
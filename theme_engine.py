@@ -0,0 +1,188 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Tuple
+class ThemeManager:
+    
+    LIGHT = {
+        'name': 'light',
+        'bg_dark': '#f5f5f5',
+        'bg_darker': '#ffffff',
+        'bg_lighter': '#e8e8e8',
+        'bg_hover': '#d0d0d0',
+        'accent_primary': '#0078d4',
+        'accent_secondary': '#106ebe',
+        'accent_success': '#107c10',
+        'accent_warning': '#ff8c00',
+        'accent_error': '#e81123',
+        'text_primary': '#323130',
+        'text_secondary': '#605e5c',
+        'text_bright': '#000000',
+        'border': '#d1d1d1',
+        'border_focus': '#0078d4',
+    }
+    DARK = {
+        'name': 'dark',
+        'bg_dark': '#1e1e1e',
+        'bg_darker': '#181818',
+        'bg_lighter': '#252525',
+        'bg_hover': '#2d2d2d',
+        'accent_primary': '#007acc',
+        'accent_secondary': '#0098ff',
+        'accent_success': '#4ec9b0',
+        'accent_warning': '#ce9178',
+        'accent_error': '#f48771',
+        'text_primary': '#cccccc',
+        'text_secondary': '#858585',
+        'text_bright': '#ffffff',
+        'border': '#3e3e3e',
+        'border_focus': '#007acc',
+    }
+    FONT_FAMILY = "Segoe UI"
+    FONT_SIZE_TITLE = 18
+    FONT_SIZE_NORMAL = 10
+    FONT_SIZE_SMALL = 9
+StyleSet = List[Tuple[str, Dict[str, object], Dict[str, list]]]
+def build_style_set(theme: Dict[str, str]) -> StyleSet:
+    family = ThemeManager.FONT_FAMILY
+    normal = (family, ThemeManager.FONT_SIZE_NORMAL)
+    return [
+        ("Modern.TFrame", {'background': theme['bg_dark']}, {}),
+        ("Card.TFrame", {'background': theme['bg_lighter'], 'borderwidth': 1, 'relief': "flat"}, {}),
+        ("Modern.TLabel", {
+            'background': theme['bg_dark'],
+            'foreground': theme['text_primary'],
+            'font': normal,
+        }, {}),
+        ("Title.TLabel", {
+            'background': theme['bg_dark'],
+            'foreground': theme['text_bright'],
+            'font': (family, ThemeManager.FONT_SIZE_TITLE, "bold"),
+        }, {}),
+        ("Subtitle.TLabel", {
+            'background': theme['bg_lighter'],
+            'foreground': theme['text_secondary'],
+            'font': (family, ThemeManager.FONT_SIZE_SMALL),
+        }, {}),
+        ("Accent.TButton", {
+            'background': theme['accent_primary'],
+            'foreground': theme['text_bright'],
+            'borderwidth': 0,
+            'focuscolor': theme['accent_primary'],
+            'font': (family, ThemeManager.FONT_SIZE_NORMAL, "bold"),
+        }, {'background': [('active', theme['accent_secondary']), ('disabled', theme['bg_hover'])]}),
+        ("Modern.TButton", {
+            'background': theme['bg_hover'],
+            'foreground': theme['text_primary'],
+            'borderwidth': 0,
+            'font': normal,
+        }, {'background': [('active', theme['bg_lighter'])]}),
+        ("Modern.TCombobox", {
+            'fieldbackground': theme['bg_lighter'],
+            'background': theme['bg_lighter'],
+            'foreground': theme['text_primary'],
+            'borderwidth': 1,
+            'arrowcolor': theme['text_primary'],
+        }, {}),
+        ("Modern.Horizontal.TProgressbar", {
+            'background': theme['accent_primary'],
+            'troughcolor': theme['bg_lighter'],
+            'borderwidth': 0,
+            'thickness': 8,
+        }, {}),
+        ("Modern.TCheckbutton", {
+            'background': theme['bg_lighter'],
+            'foreground': theme['text_primary'],
+            'font': normal,
+        }, {}),
+        ("Modern.TRadiobutton", {
+            'background': theme['bg_lighter'],
+            'foreground': theme['text_primary'],
+            'font': normal,
+        }, {}),
+        ("Modern.TLabelframe", {
+            'background': theme['bg_lighter'],
+            'foreground': theme['text_primary'],
+            'borderwidth': 1,
+            'relief': "flat",
+        }, {}),
+        ("Modern.TLabelframe.Label", {
+            'background': theme['bg_lighter'],
+            'foreground': theme['accent_primary'],
+            'font': (family, ThemeManager.FONT_SIZE_NORMAL, "bold"),
+        }, {}),
+        ("Modern.Treeview", {
+            'background': theme['bg_lighter'],
+            'foreground': theme['text_primary'],
+            'fieldbackground': theme['bg_lighter'],
+            'font': (family, 9),
+        }, {}),
+        ("Modern.Treeview.Heading", {
+            'background': theme['bg_hover'],
+            'foreground': theme['text_bright'],
+            'font': (family, 10, "bold"),
+        }, {}),
+    ]
+ROLE_OPTIONS: Dict[str, Callable[[Dict[str, str]], Dict[str, str]]] = {
+    'window': lambda t: {'bg': t['bg_dark']},
+    'canvas': lambda t: {'bg': t['bg_dark']},
+    'list_canvas': lambda t: {'bg': t['bg_darker']},
+    'image': lambda t: {'bg': t['bg_darker']},
+    'scrollbar': lambda t: {
+        'bg': t['bg_lighter'],
+        'troughcolor': t['bg_darker'],
+        'activebackground': t['accent_primary'],
+    },
+    'entry': lambda t: {
+        'bg': t['bg_darker'],
+        'fg': t['text_primary'],
+        'insertbackground': t['text_bright'],
+        'highlightbackground': t['border'],
+        'highlightcolor': t['border_focus'],
+    },
+    'text': lambda t: {
+        'bg': t['bg_darker'],
+        'fg': t['text_primary'],
+        'insertbackground': t['text_bright'],
+    },
+}
+class ThemeEngine:
+    def __init__(self, theme: Dict[str, str], style: Optional[ttk.Style] = None):
+        self.style = style or ttk.Style()
+        self.style.theme_use('clam')
+        self.theme = theme
+        self._widgets: Dict[str, Tuple[tk.Misc, str]] = {}
+        self._style_sets: Dict[str, StyleSet] = {}
+        self._role_options: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._apply_styles()
+    def register(self, widget, role: str):
+        key = str(widget)
+        self._widgets[key] = (widget, role)
+        widget.configure(**self._options(role))
+        widget.bind('<Destroy>', lambda event: self._forget(event, key), add='+')
+        return widget
+    def switch(self, theme: Dict[str, str]) -> None:
+        self.theme = theme
+        self._apply_styles()
+        for key, (widget, role) in list(self._widgets.items()):
+            if not widget.winfo_exists():
+                self._widgets.pop(key, None)
+                continue
+            widget.configure(**self._options(role))
+    def registered_count(self) -> int:
+        return len(self._widgets)
+    def _forget(self, event, key: str) -> None:
+        if str(event.widget) == key:
+            self._widgets.pop(key, None)
+    def _options(self, role: str) -> Dict[str, str]:
+        cache_key = (self.theme['name'], role)
+        if cache_key not in self._role_options:
+            self._role_options[cache_key] = ROLE_OPTIONS[role](self.theme)
+        return self._role_options[cache_key]
+    def _apply_styles(self) -> None:
+        name = self.theme['name']
+        if name not in self._style_sets:
+            self._style_sets[name] = build_style_set(self.theme)
+        for style_name, options, mapping in self._style_sets[name]:
+            self.style.configure(style_name, **options)
+            if mapping:
+                self.style.map(style_name, **mapping)
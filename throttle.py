@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+class _StreamState:
+    def __init__(self):
+        self.samples: Deque[Tuple[float, int]] = deque()
+        self.started_at: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.collapsed_since: Optional[float] = None
+        self.reextracts = 0
+class ThrottleMonitor:
+    WINDOW = 5.0
+    WARMUP = 10.0
+    COLLAPSE_RATIO = 0.25
+    SUSTAIN = 8.0
+    BASELINE_RISE = 0.2
+    BASELINE_DECAY = 0.02
+    MAX_REEXTRACTS = 3
+    def __init__(self, window: float = WINDOW, warmup: float = WARMUP,
+                 collapse_ratio: float = COLLAPSE_RATIO, sustain: float = SUSTAIN,
+                 max_reextracts: int = MAX_REEXTRACTS):
+        self.window = window
+        self.warmup = warmup
+        self.collapse_ratio = collapse_ratio
+        self.sustain = sustain
+        self.max_reextracts = max_reextracts
+        self._streams: Dict[str, _StreamState] = {}
+        self._lock = threading.Lock()
+    def update(self, stream_id: str, downloaded_bytes: int, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._streams.setdefault(stream_id, _StreamState())
+            if state.started_at is None:
+                state.started_at = now
+            state.samples.append((now, downloaded_bytes))
+            while len(state.samples) > 2 and now - state.samples[0][0] > self.window:
+                state.samples.popleft()
+            elapsed = now - state.samples[0][0]
+            if elapsed < self.window / 2:
+                return False
+            speed = (downloaded_bytes - state.samples[0][1]) / elapsed
+            if now - state.started_at < self.warmup:
+                state.baseline = max(state.baseline or 0.0, speed)
+                return False
+            if state.baseline is None:
+                state.baseline = speed
+            if speed >= state.baseline * self.collapse_ratio:
+                state.collapsed_since = None
+                factor = self.BASELINE_RISE if speed > state.baseline else self.BASELINE_DECAY
+                state.baseline += (speed - state.baseline) * factor
+                return False
+            if state.collapsed_since is None:
+                state.collapsed_since = now
+                return False
+            if now - state.collapsed_since < self.sustain or state.reextracts >= self.max_reextracts:
+                return False
+            state.reextracts += 1
+            state.samples.clear()
+            state.started_at = None
+            state.collapsed_since = None
+            return True
+    def baseline(self, stream_id: str) -> Optional[float]:
+        with self._lock:
+            state = self._streams.get(stream_id)
+            return state.baseline if state else None
+    def forget(self, stream_id: str) -> None:
+        with self._lock:
+            self._streams.pop(stream_id, None)
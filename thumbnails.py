@@ -0,0 +1,153 @@
+import hashlib
+import io
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from PIL import Image
+Size = Tuple[int, int]
+LIST_SIZE: Size = (96, 54)
+INFO_SIZE: Size = (320, 180)
+def thumbnail_url(entry: Dict[str, Any], min_width: int = LIST_SIZE[0]) -> Optional[str]:
+    thumbnails = [t for t in entry.get('thumbnails') or [] if t.get('url')]
+    wide_enough = sorted(
+        (t for t in thumbnails if (t.get('width') or 0) >= min_width),
+        key=lambda t: t.get('width') or 0)
+    if wide_enough:
+        return wide_enough[0]['url']
+    if thumbnails:
+        return thumbnails[-1]['url']
+    if entry.get('thumbnail'):
+        return entry['thumbnail']
+    if entry.get('ie_key') == 'Youtube' and entry.get('id'):
+        return f"https://i.ytimg.com/vi/{entry['id']}/mqdefault.jpg"
+    return None
+class ThumbnailCache:
+    MAX_ITEMS = 512
+    MAX_BYTES = 64 * 1024 * 1024
+    MAX_DISK_BYTES = 256 * 1024 * 1024
+    MAX_WORKERS = 6
+    TIMEOUT = 10
+    def __init__(self, cache_dir: str, max_items: int = MAX_ITEMS, max_bytes: int = MAX_BYTES,
+                 max_workers: int = MAX_WORKERS, proxy: Optional[str] = None,
+                 max_disk_bytes: int = MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._disk_bytes = 0
+        self._prune_lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[str, Size], Image.Image]" = OrderedDict()
+        self._memory_bytes = 0
+        self._pending: Dict[Tuple[str, Size], List[Callable[[Optional[Image.Image]], None]]] = {}
+        self._futures: Dict[Tuple[str, Size], Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytgrab-thumb")
+        handlers = [urllib.request.ProxyHandler({'http': proxy, 'https': proxy})] if proxy else []
+        self._opener = urllib.request.build_opener(*handlers)
+        self._executor.submit(self._prune_disk)
+    def get(self, url: str, size: Size = LIST_SIZE) -> Optional[Image.Image]:
+        key = (url, size)
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+            return image
+    def request(self, url: str, callback: Callable[[Optional[Image.Image]], None],
+                size: Size = LIST_SIZE) -> None:
+        image = self.get(url, size)
+        if image is not None:
+            callback(image)
+            return
+        key = (url, size)
+        with self._lock:
+            if key in self._pending:
+                self._pending[key].append(callback)
+                return
+            self._pending[key] = [callback]
+            self._futures[key] = self._executor.submit(self._load, url, size)
+    def cancel_pending(self) -> None:
+        with self._lock:
+            for key, future in list(self._futures.items()):
+                if future.cancel():
+                    del self._futures[key]
+                    self._pending.pop(key, None)
+    def shutdown(self) -> None:
+        self.cancel_pending()
+        self._executor.shutdown(wait=False)
+    def _disk_path(self, url: str, size: Size) -> str:
+        digest = hashlib.sha1(f"{url}|{size[0]}x{size[1]}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.jpg")
+    def _load(self, url: str, size: Size) -> None:
+        key = (url, size)
+        image = None
+        try:
+            disk_path = self._disk_path(url, size)
+            if os.path.exists(disk_path):
+                with Image.open(disk_path) as cached:
+                    image = cached.convert('RGB')
+                os.utime(disk_path)
+            else:
+                with self._opener.open(url, timeout=self.TIMEOUT) as response:
+                    data = response.read()
+                with Image.open(io.BytesIO(data)) as source:
+                    source.draft('RGB', size)
+                    image = source.convert('RGB')
+                image.thumbnail(size, Image.LANCZOS)
+                temp_path = f"{disk_path}.tmp"
+                image.save(temp_path, 'JPEG', quality=85)
+                os.replace(temp_path, disk_path)
+                with self._lock:
+                    self._disk_bytes += os.path.getsize(disk_path)
+                    over_budget = self._disk_bytes > self.max_disk_bytes
+                if over_budget:
+                    self._prune_disk()
+        except Exception:
+            image = None
+        with self._lock:
+            callbacks = self._pending.pop(key, [])
+            self._futures.pop(key, None)
+            if image is not None:
+                self._store(key, image)
+        for callback in callbacks:
+            callback(image)
+    def _store(self, key: Tuple[str, Size], image: Image.Image) -> None:
+        if key in self._memory:
+            self._memory_bytes -= self._image_bytes(self._memory.pop(key))
+        self._memory[key] = image
+        self._memory_bytes += self._image_bytes(image)
+        while self._memory and (len(self._memory) > self.max_items or self._memory_bytes > self.max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= self._image_bytes(evicted)
+    def _prune_disk(self) -> None:
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            files = []
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith('.tmp'):
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            if total > self.max_disk_bytes:
+                for _, size, path in sorted(files):
+                    if total <= self.max_disk_bytes * 0.8:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+            with self._lock:
+                self._disk_bytes = total
+        finally:
+            self._prune_lock.release()
+    @staticmethod
+    def _image_bytes(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
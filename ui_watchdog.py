@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+def _handler(frames: List[traceback.FrameSummary]) -> str:
+    for frame in reversed(frames):
+        if os.path.abspath(frame.filename).startswith(APP_DIR):
+            return f"{os.path.basename(frame.filename)}:{frame.name}:{frame.lineno}"
+    if frames:
+        return f"{os.path.basename(frames[-1].filename)}:{frames[-1].name}:{frames[-1].lineno}"
+    return "unknown"
+class UiWatchdog:
+    INTERVAL_MS = 100
+    STALL_THRESHOLD = 0.25
+    MAX_SAMPLES = 3000
+    MAX_STALLS = 100
+    def __init__(self, root, interval_ms: int = INTERVAL_MS, threshold: float = STALL_THRESHOLD):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.interval_ms = interval_ms
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=self.MAX_SAMPLES)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=self.MAX_STALLS)
+        self.stall_count = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._tk_thread = threading.get_ident()
+        self._expected = 0.0
+        self._last_beat = 0.0
+        self._current: Optional[Dict[str, Any]] = None
+        self._job = None
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+    def start(self) -> None:
+        now = time.monotonic()
+        self._last_beat = now
+        self._expected = now + self.interval
+        self._job = self.root.after(self.interval_ms, self._beat)
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._watch, name="ytgrab-ui-watchdog", daemon=True)
+        self._monitor.start()
+    def stop(self) -> None:
+        self._stop.set()
+        if self._job:
+            try:
+                self.root.after_cancel(self._job)
+            except Exception:
+                pass
+            self._job = None
+    def _beat(self) -> None:
+        now = time.monotonic()
+        lag = max(0.0, now - self._expected)
+        with self._lock:
+            self.lags.append(lag)
+            current, self._current = self._current, None
+            self._last_beat = now
+            if current is not None:
+                current['duration_ms'] = round(lag * 1000, 1)
+            elif lag >= self.threshold:
+                self._record_stall(lag, [])
+        self._expected = now + self.interval
+        if not self._stop.is_set():
+            self._job = self.root.after(self.interval_ms, self._beat)
+    def _watch(self) -> None:
+        poll = min(self.interval / 2, self.threshold / 4)
+        while not self._stop.wait(poll):
+            with self._lock:
+                overdue = time.monotonic() - self._last_beat - self.interval
+                if overdue < self.threshold or self._current is not None:
+                    continue
+            frame = sys._current_frames().get(self._tk_thread)
+            frames = traceback.extract_stack(frame) if frame is not None else []
+            with self._lock:
+                if time.monotonic() - self._last_beat - self.interval >= self.threshold and self._current is None:
+                    self._current = self._record_stall(overdue, frames)
+    def _record_stall(self, lag: float, frames: List[traceback.FrameSummary]) -> Dict[str, Any]:
+        stall = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(lag * 1000, 1),
+            'handler': _handler(frames) if frames else "unknown",
+            'stack': traceback.format_list(frames),
+        }
+        self.stalls.append(stall)
+        self.stall_count += 1
+        return stall
+    def percentiles(self) -> Dict[str, float]:
+        with self._lock:
+            lags = list(self.lags)
+        return {
+            'p50': round(_percentile(lags, 0.50) * 1000, 1),
+            'p90': round(_percentile(lags, 0.90) * 1000, 1),
+            'p99': round(_percentile(lags, 0.99) * 1000, 1),
+            'max': round(max(lags, default=0.0) * 1000, 1),
+        }
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = len(self.lags)
+            stalls = [dict(stall) for stall in self.stalls]
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'interval_ms': self.interval_ms,
+            'threshold_ms': round(self.threshold * 1000, 1),
+            'samples': samples,
+            'lag_ms': self.percentiles(),
+            'stall_count': self.stall_count,
+            'stalls': stalls,
+        }
+    def export(self, path: str) -> None:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.metrics(), f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
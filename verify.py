@@ -0,0 +1,199 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+MANIFEST_FIELDS = ('id', 'path', 'size', 'algorithm', 'hash', 'duration', 'expected_duration',
+                   'video_streams', 'audio_streams', 'ok', 'errors')
+_verify_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="ytgrab-verify")
+def _has_codec(codec: Optional[str]) -> Optional[bool]:
+    if codec is None:
+        return None
+    return codec != 'none'
+def expectations(info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    info = info or {}
+    if info.get('section_end') is not None:
+        duration = info['section_end'] - (info.get('section_start') or 0)
+    else:
+        duration = info.get('duration')
+    requested = info.get('requested_formats') or []
+    video = _has_codec(info.get('vcodec'))
+    audio = _has_codec(info.get('acodec'))
+    if requested:
+        video = any(_has_codec(f.get('vcodec')) for f in requested)
+        audio = any(_has_codec(f.get('acodec')) for f in requested)
+    if info.get('ext') in ('mp3', 'm4a', 'opus', 'ogg', 'flac', 'wav', 'aac', 'mka'):
+        video = False
+    return {'duration': duration, 'video': video, 'audio': audio}
+def file_hash(path: str, algorithm: str = 'sha256', buffer_size: int = HASH_BUFFER_SIZE) -> str:
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+def probe(path: str, ffprobe: Optional[str] = None) -> Dict[str, Any]:
+    ffprobe = ffprobe or shutil.which('ffprobe')
+    if not ffprobe:
+        raise FileNotFoundError("ffprobeが見つかりません")
+    process = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+        capture_output=True, timeout=120,
+        creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+    if process.returncode != 0:
+        message = process.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise Exception(message[-1] if message else f"ffprobe終了コード {process.returncode}")
+    return json.loads(process.stdout or b'{}')
+def verify_file(path: str, expected: Optional[Dict[str, Any]] = None, algorithm: str = 'sha256',
+                tolerance: float = 2.0) -> Dict[str, Any]:
+    expected = expected or {}
+    record: Dict[str, Any] = {
+        'path': os.path.abspath(path),
+        'size': None,
+        'algorithm': algorithm,
+        'hash': None,
+        'duration': None,
+        'expected_duration': expected.get('duration'),
+        'video_streams': None,
+        'audio_streams': None,
+        'ok': False,
+        'errors': [],
+    }
+    errors = record['errors']
+    try:
+        record['size'] = os.path.getsize(path)
+    except OSError as e:
+        errors.append(f"ファイルがありません: {e}")
+        return record
+    if not record['size']:
+        errors.append("ファイルが空です")
+    record['hash'] = file_hash(path, algorithm)
+    try:
+        metadata = probe(path)
+    except FileNotFoundError as e:
+        record['warnings'] = [str(e)]
+        metadata = None
+    except Exception as e:
+        errors.append(f"ffprobeで読み込めません: {e}")
+        metadata = None
+    if metadata is not None:
+        streams = metadata.get('streams') or []
+        record['video_streams'] = sum(
+            1 for s in streams
+            if s.get('codec_type') == 'video' and not (s.get('disposition') or {}).get('attached_pic'))
+        record['audio_streams'] = sum(1 for s in streams if s.get('codec_type') == 'audio')
+        if not streams:
+            errors.append("ストリームがありません")
+        if expected.get('video') and not record['video_streams']:
+            errors.append("映像ストリームがありません")
+        if expected.get('audio') and not record['audio_streams']:
+            errors.append("音声ストリームがありません")
+        try:
+            record['duration'] = round(float((metadata.get('format') or {})['duration']), 3)
+        except (KeyError, TypeError, ValueError):
+            if expected.get('duration'):
+                errors.append("再生時間を取得できません")
+        want = expected.get('duration')
+        if want and record['duration'] is not None:
+            if abs(record['duration'] - want) > max(tolerance, want * 0.02):
+                errors.append(f"再生時間が一致しません: {record['duration']:.1f}秒 (期待値 {want:.1f}秒)")
+    record['ok'] = not errors
+    return record
+def write_manifest(records: List[Dict[str, Any]], path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    if path.lower().endswith('.csv'):
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for record in records:
+                writer.writerow(dict(record, errors="; ".join(record['errors'])))
+    else:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'files': records,
+            }, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    return path
+class VerificationBatch:
+    def __init__(self, algorithm: str = 'sha256', executor: Optional[ThreadPoolExecutor] = None):
+        self.algorithm = algorithm
+        self._executor = executor or _verify_executor
+        self._futures: Dict[str, Future] = {}
+        self._ids: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+    def submit(self, path: str, info: Optional[Dict[str, Any]] = None) -> Future:
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._futures:
+                self._ids[path] = (info or {}).get('id')
+                self._futures[path] = self._executor.submit(verify_file, path, expectations(info), self.algorithm)
+            return self._futures[path]
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._futures)
+    def results(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            futures = dict(self._futures)
+        records = []
+        for path, future in futures.items():
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {'path': path, 'size': None, 'algorithm': self.algorithm, 'hash': None,
+                          'duration': None, 'expected_duration': None, 'video_streams': None,
+                          'audio_streams': None, 'ok': False, 'errors': [f"検証に失敗しました: {e}"]}
+            records.append(dict(record, id=self._ids.get(path)))
+        return records
+    def finish(self, manifest_dir: Optional[str], manifest_format: str = 'json') -> Dict[str, Any]:
+        records = self.results()
+        manifest = None
+        if records and manifest_dir:
+            name = f"manifest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{'csv' if manifest_format == 'csv' else 'json'}"
+            manifest = write_manifest(records, os.path.join(manifest_dir, name))
+        return {
+            'manifest': manifest,
+            'files': len(records),
+            'failed': [record for record in records if not record['ok']],
+        }
+def mark_verified(entries: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
+    failed_ids = {record['id']: record['errors'] for record in summary['failed'] if record.get('id')}
+    failed_paths = {record['path']: record['errors'] for record in summary['failed']}
+    for entry in entries:
+        path = os.path.abspath(entry['file_path']) if entry.get('file_path') else None
+        errors = failed_paths.get(path) or failed_ids.get(entry.get('id'))
+        entry['verified'] = not errors
+        if errors:
+            entry['verification_errors'] = errors
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="verify", description="ダウンロード済みファイルを検証してマニフェストを作成")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('-o', '--output', help="マニフェストの出力先 (.json / .csv)")
+    parser.add_argument('--algorithm', default='sha256')
+    args = parser.parse_args(argv)
+    batch = VerificationBatch(args.algorithm)
+    for path in args.files:
+        batch.submit(path)
+    records = batch.results()
+    for record in records:
+        status = "✅" if record['ok'] else "❌"
+        print(f"{status} {record['path']} {record['duration'] or '-'}秒 {record['hash'] or ''}"
+              + (f"  {'; '.join(record['errors'])}" if record['errors'] else ""))
+    if args.output:
+        print(f"🗂️ マニフェスト: {write_manifest(records, args.output)}")
+    return 0 if all(record['ok'] for record in records) else 1
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+import argparse
+import queue
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError
+from cookies import cookie_cache
+from proxy_pool import proxy_lease
+from output_store import output_store
+FEED_URL = "https://www.youtube.com/feeds/videos.xml"
+FEED_NS = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+}
+Entry = Dict[str, Any]
+def _feed_query(info: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    if info.get('extractor_key') != 'YoutubeTab' or not info.get('id'):
+        return None
+    list_id = info['id']
+    if list_id.startswith('UC') and len(list_id) == 24:
+        return {'channel_id': list_id}
+    return {'playlist_id': list_id}
+def _parse_feed(data: bytes) -> List[Entry]:
+    entries = []
+    for node in ET.fromstring(data).findall('atom:entry', FEED_NS):
+        video_id = node.findtext('yt:videoId', namespaces=FEED_NS)
+        if not video_id:
+            continue
+        published = node.findtext('atom:published', namespaces=FEED_NS) or ''
+        entries.append({
+            'id': video_id,
+            'url': f"https://www.youtube.com/watch?v={video_id}",
+            'title': node.findtext('atom:title', namespaces=FEED_NS),
+            'upload_date': published[:10].replace('-', '') or None,
+        })
+    return entries
+class ChannelWatcher:
+    DEFAULT_INTERVAL = 60 * 60
+    DEFAULT_JITTER = 5 * 60
+    MAX_SEEN = 200
+    MAX_SCAN = 300
+    FEED_SIZE = 15
+    MAX_WORKERS = 4
+    def __init__(self, config, on_new: Callable[[Dict[str, Any], List[Entry]], None],
+                 max_workers: int = MAX_WORKERS):
+        self.config = config
+        self.on_new = on_new
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._due: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    def sources(self) -> List[Dict[str, Any]]:
+        return list(self.config.get("watch_sources", []))
+    def add_source(self, url: str, interval: Optional[float] = None, jitter: Optional[float] = None,
+                   backfill: int = 0, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        source = {
+            'url': url,
+            'interval': interval or self.DEFAULT_INTERVAL,
+            'jitter': self.DEFAULT_JITTER if jitter is None else jitter,
+            'backfill': backfill,
+            'options': options or {},
+        }
+        with self._lock:
+            sources = [s for s in self.sources() if s['url'] != url]
+            sources.append(source)
+            self.config.set("watch_sources", sources)
+        self.config.save_config()
+        return source
+    def remove_source(self, url: str) -> None:
+        with self._lock:
+            self.config.set("watch_sources", [s for s in self.sources() if s['url'] != url])
+            cursors = dict(self.config.get("watch_cursors", {}))
+            cursors.pop(url, None)
+            self.config.set("watch_cursors", cursors)
+            self._due.pop(url, None)
+        self.config.save_config()
+    def cursor(self, url: str) -> Dict[str, Any]:
+        return dict(self.config.get("watch_cursors", {}).get(url) or {})
+    def _save_cursor(self, url: str, cursor: Dict[str, Any]) -> None:
+        with self._lock:
+            cursors = dict(self.config.get("watch_cursors", {}))
+            cursors[url] = cursor
+            self.config.set("watch_cursors", cursors)
+        self.config.save_config()
+    def _client(self) -> yt_dlp.YoutubeDL:
+        if not hasattr(self._local, 'clients'):
+            self._local.clients = {}
+        proxy = getattr(self._local, 'proxy', None)
+        ydl = self._local.clients.get(proxy)
+        if ydl is None:
+            ydl_opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'extract_flat': 'in_playlist',
+                'lazy_playlist': True,
+            }
+            browser = self.config.get("cookies_from_browser")
+            if browser and browser != 'なし':
+                ydl_opts['cookiesfrombrowser'] = (browser,)
+            if proxy:
+                ydl_opts['proxy'] = proxy
+            ydl = cookie_cache.attach(yt_dlp.YoutubeDL(ydl_opts))
+            self._local.clients[proxy] = ydl
+        return ydl
+    def poll(self, source: Dict[str, Any]) -> List[Entry]:
+        url = source['url']
+        cursor = self.cursor(url)
+        seen = cursor.get('seen_ids') or []
+        found = None
+        with proxy_lease(self.config.get("proxy")) as lease:
+            self._local.proxy = lease.url
+            if cursor.get('feed') and seen:
+                found = self._poll_feed(cursor, set(seen))
+            if found is None:
+                limit = self.MAX_SCAN if seen else max(source.get('backfill') or 0, self.FEED_SIZE)
+                found = self._poll_listing(url, cursor, set(seen), limit)
+        new_entries = found if seen else found[:source.get('backfill') or 0]
+        cursor['seen_ids'] = ([e['id'] for e in found] + seen)[:self.MAX_SEEN]
+        dates = [e['upload_date'] for e in found if e.get('upload_date')]
+        if dates:
+            cursor['last_upload_date'] = max(dates + [cursor.get('last_upload_date') or ''])
+        cursor['last_polled'] = time.time()
+        self._save_cursor(url, cursor)
+        if new_entries:
+            self.on_new(source, list(reversed(new_entries)))
+        return new_entries
+    def _poll_feed(self, cursor: Dict[str, Any], seen: set) -> Optional[List[Entry]]:
+        headers = {}
+        if cursor.get('etag'):
+            headers['If-None-Match'] = cursor['etag']
+        if cursor.get('last_modified'):
+            headers['If-Modified-Since'] = cursor['last_modified']
+        try:
+            with self._client().urlopen(Request(FEED_URL, query=cursor['feed'], headers=headers)) as response:
+                data = response.read()
+                cursor['etag'] = response.headers.get('ETag')
+                cursor['last_modified'] = response.headers.get('Last-Modified')
+        except HTTPError as e:
+            if e.status == 304:
+                return []
+            return None
+        except Exception:
+            return None
+        try:
+            entries = _parse_feed(data)
+        except ET.ParseError:
+            return None
+        new_entries = self._take_new(entries, cursor, seen, self.FEED_SIZE)
+        if len(new_entries) >= self.FEED_SIZE:
+            return None
+        return new_entries
+    def _poll_listing(self, url: str, cursor: Dict[str, Any], seen: set, limit: int) -> List[Entry]:
+        ydl = self._client()
+        info = ydl.extract_info(url, download=False, process=False)
+        for _ in range(3):
+            if info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        cursor['feed'] = _feed_query(info)
+        if 'entries' not in info:
+            entries = [{'id': info.get('id'), 'url': info.get('webpage_url') or url,
+                        'title': info.get('title'), 'upload_date': info.get('upload_date')}]
+        else:
+            entries = (
+                {
+                    'id': entry.get('id'),
+                    'url': entry.get('url') or entry.get('webpage_url'),
+                    'title': entry.get('title'),
+                    'upload_date': entry.get('upload_date'),
+                }
+                for entry in info['entries'] if entry and entry.get('id')
+            )
+        return self._take_new(entries, cursor, seen, limit)
+    def _take_new(self, entries: Iterable[Entry], cursor: Dict[str, Any], seen: set, limit: int) -> List[Entry]:
+        last_date = cursor.get('last_upload_date')
+        by_date = 'playlist_id' not in (cursor.get('feed') or {})
+        new_entries = []
+        for scanned, entry in enumerate(entries):
+            if entry['id'] in seen or scanned >= limit:
+                break
+            if by_date and last_date and entry.get('upload_date') and entry['upload_date'] < last_date:
+                break
+            new_entries.append(entry)
+        return new_entries
+    def _next_due(self, source: Dict[str, Any]) -> float:
+        last_polled = self.cursor(source['url']).get('last_polled') or 0
+        return last_polled + source.get('interval', self.DEFAULT_INTERVAL) + random.uniform(
+            0, source.get('jitter', self.DEFAULT_JITTER))
+    def due_sources(self, force: bool = False) -> List[Dict[str, Any]]:
+        now = time.time()
+        due = []
+        with self._lock:
+            for source in self.sources():
+                if source['url'] not in self._due:
+                    self._due[source['url']] = self._next_due(source)
+                if force or self._due[source['url']] <= now:
+                    due.append(source)
+        return due
+    def poll_due(self, executor: Optional[ThreadPoolExecutor] = None, force: bool = False) -> int:
+        due = self.due_sources(force)
+        if not due:
+            return 0
+        owned = executor is None
+        executor = executor or ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ytgrab-watch")
+        try:
+            futures = [(source, executor.submit(self.poll, source)) for source in due]
+            for source, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"監視エラー ({source['url']}): {e}")
+                with self._lock:
+                    self._due[source['url']] = self._next_due(source)
+        finally:
+            if owned:
+                executor.shutdown()
+        return len(due)
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ytgrab-watcher", daemon=True)
+        self._thread.start()
+    def stop(self) -> None:
+        self._stop.set()
+    def _run(self) -> None:
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ytgrab-watch") as executor:
+            while not self._stop.is_set():
+                self.poll_due(executor)
+                with self._lock:
+                    next_due = min(self._due.values(), default=time.time() + 60)
+                self._stop.wait(min(max(next_due - time.time(), 1), 60))
+def _download_options(config, source: Dict[str, Any]) -> Dict[str, Any]:
+    options = {
+        key: value for key, value in config.settings.items()
+        if key not in ('download_history', 'watch_sources', 'watch_cursors')
+    }
+    options['playlist_mode'] = False
+    options.update(source.get('options') or {})
+    return options
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import Config
+    from downloader import YouTubeDownloader
+    parser = argparse.ArgumentParser(prog="watcher", description="チャンネル/プレイリストの新着動画を監視してダウンロード")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="監視対象を追加")
+    add.add_argument('url')
+    add.add_argument('--interval', type=float, default=ChannelWatcher.DEFAULT_INTERVAL, help="ポーリング間隔（秒）")
+    add.add_argument('--jitter', type=float, default=ChannelWatcher.DEFAULT_JITTER, help="間隔に加えるランダムな揺らぎ（秒）")
+    add.add_argument('--backfill', type=int, default=0, help="初回に取得する最新動画の数")
+    remove = commands.add_parser('remove', help="監視対象を削除")
+    remove.add_argument('url')
+    commands.add_parser('list', help="監視対象を表示")
+    run = commands.add_parser('run', help="監視を開始")
+    run.add_argument('--once', action='store_true', help="期限の来たソースを1回だけ確認して終了")
+    args = parser.parse_args(argv)
+    config = Config()
+    cookie_cache.configure(config.cipher, config.data_dir)
+    output_store.configure(config.data_dir)
+    jobs: "queue.Queue" = queue.Queue()
+    watcher = ChannelWatcher(config, lambda source, entries: [jobs.put((source, e)) for e in entries])
+    if args.command == 'add':
+        watcher.add_source(args.url, args.interval, args.jitter, args.backfill)
+    elif args.command == 'remove':
+        watcher.remove_source(args.url)
+    elif args.command == 'list':
+        for source in watcher.sources():
+            cursor = watcher.cursor(source['url'])
+            print(f"{source['url']}  間隔={source['interval']:.0f}s±{source['jitter']:.0f}s  "
+                  f"既知={len(cursor.get('seen_ids') or [])}件  feed={'あり' if cursor.get('feed') else 'なし'}")
+    else:
+        if args.once:
+            watcher.poll_due(force=True)
+        else:
+            watcher.start()
+        try:
+            while True:
+                try:
+                    source, entry = jobs.get(timeout=1)
+                except queue.Empty:
+                    if args.once:
+                        break
+                    continue
+                print(f"📥 {entry.get('title') or entry['url']}")
+                result = YouTubeDownloader().download(entry['url'], _download_options(config, source))
+                if result['success'] and result['type'] == 'skipped':
+                    print(f"⏭️ {result['skipped']}: {result['title']}")
+                elif result['success']:
+                    config.add_to_history(entry['url'], result.get('title', ''), result.get('file_path', ''),
+                                          source.get('options', {}).get('download_type', config.get('download_type')),
+                                          config.get('video_quality'))
+                else:
+                    print(f"❌ {result.get('error')}")
+        except KeyboardInterrupt:
+            watcher.stop()
+    config.flush()
+    return 0
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+from downloader import YouTubeDownloader
+from job_store import JobStore
+class Worker:
+    POLL_INTERVAL = 2.0
+    def __init__(self, store: JobStore, concurrency: int = 1, worker_id: Optional[str] = None,
+                 defaults: Optional[Dict[str, Any]] = None):
+        self.store = store
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.defaults = defaults or {}
+        self._stop = threading.Event()
+    def stop(self) -> None:
+        self._stop.set()
+    def run(self, drain: bool = False) -> None:
+        threads = [
+            threading.Thread(target=self._loop, args=(drain,), name=f"ytgrab-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+    def _loop(self, drain: bool) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim(self.worker_id)
+            if job is None:
+                if drain:
+                    return
+                self._stop.wait(self.POLL_INTERVAL)
+                continue
+            self.run_job(job)
+    def run_job(self, job: Dict[str, Any]) -> bool:
+        downloader = YouTubeDownloader()
+        lost = threading.Event()
+        finished = threading.Event()
+        def heartbeat() -> None:
+            while not finished.wait(self.store.lease_seconds / 3):
+                if not self.store.heartbeat(job['id'], job['lease_token']):
+                    lost.set()
+                    downloader.cancel()
+                    return
+        beater = threading.Thread(target=heartbeat, name=f"ytgrab-lease-{job['id']}", daemon=True)
+        beater.start()
+        options = dict(self.defaults)
+        options.update(job['options'])
+        print(f"▶️ [{self.worker_id}] #{job['id']} {job['url']} (試行 {job['attempts']})")
+        error = None
+        try:
+            result = downloader.download(job['url'], options)
+        except Exception as e:
+            result = None
+            error = str(e)
+        finally:
+            finished.set()
+            beater.join()
+        if lost.is_set():
+            print(f"⚠️ [{self.worker_id}] #{job['id']} リースを失ったため結果を破棄しました")
+            return False
+        if result is None:
+            accepted = self.store.release(job['id'], job['lease_token'], error)
+        elif not result.get('success') and (result.get('retry_after') or result.get('retryable')):
+            accepted = self.store.release(job['id'], job['lease_token'], result.get('error'),
+                                          result.get('retry_after') or 0.0)
+        else:
+            accepted = self.store.complete(job['id'], job['lease_token'], result)
+        status = "✅" if result and result.get('success') else "❌"
+        print(f"{status} [{self.worker_id}] #{job['id']} {(result or {}).get('title') or (result or {}).get('error') or error}"
+              + ("" if accepted else " (他のワーカーが既に結果を記録済み)"))
+        return accepted
+def _parse_options(values: List[str]) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    for value in values:
+        if value.startswith('{'):
+            options.update(json.loads(value))
+            continue
+        key, sep, raw = value.partition('=')
+        if not sep:
+            raise SystemExit(f"オプションは key=value 形式で指定してください: {value}")
+        try:
+            options[key] = json.loads(raw)
+        except ValueError:
+            options[key] = raw
+    return options
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="worker", description="共有ジョブストアからダウンロードジョブを取得して実行")
+    parser.add_argument('--db', default=os.environ.get('YTGRAB_JOB_DB', 'ytgrab-jobs.sqlite3'),
+                        help="ジョブストア (SQLite) のパス。複数ホストで共有する場合は共有ファイルシステム上に置く")
+    parser.add_argument('--lease', type=float, default=JobStore.LEASE_SECONDS, help="リース期間（秒）")
+    parser.add_argument('--wal', action='store_true', help="WALモードを使う（同一ホスト内のワーカーのみの場合）")
+    commands = parser.add_subparsers(dest='command', required=True)
+    enqueue = commands.add_parser('enqueue', help="ジョブを追加")
+    enqueue.add_argument('urls', nargs='+')
+    enqueue.add_argument('-o', '--option', action='append', default=[], help="key=value または JSON")
+    enqueue.add_argument('--max-attempts', type=int, default=3)
+    run = commands.add_parser('run', help="ワーカーを起動")
+    run.add_argument('-j', '--concurrency', type=int, default=1)
+    run.add_argument('--worker-id')
+    run.add_argument('--drain', action='store_true', help="キューが空になったら終了")
+    run.add_argument('-o', '--option', action='append', default=[], help="全ジョブに適用する既定値")
+    commands.add_parser('status', help="ジョブの状態を表示")
+    args = parser.parse_args(argv)
+    store = JobStore(args.db, lease_seconds=args.lease, wal=args.wal)
+    if args.command == 'enqueue':
+        options = _parse_options(args.option)
+        for url in args.urls:
+            print(f"#{store.enqueue(url, options, args.max_attempts)} {url}")
+    elif args.command == 'run':
+        Worker(store, args.concurrency, args.worker_id, _parse_options(args.option)).run(drain=args.drain)
+    else:
+        print("  ".join(f"{status}: {count}" for status, count in sorted(store.counts().items())) or "ジョブなし")
+        for job in store.recent():
+            print(f"#{job['id']} {job['status']:<7} 試行{job['attempts']} {job['lease_owner'] or '-'} {job['url']}"
+                  + (f"  {job['error']}" if job['error'] else ""))
+    return 0
+if __name__ == "__main__":
+    raise SystemExit(main())